@@ -29,8 +29,26 @@ control_structure = {
         # "state_input_container": "csv",  # Only relevant with fdm state_format. Options: pickle, json
         # "state_output_container": "csv",  # options: pickle, json, csv, null
         # "derived_data_output_container": "pickle",  # options: pickle, json, null
-        "formation_strategy": "partial",
-        "evaluation_strategy": "depth",
+        "formation_strategy": "partial",  # options: partial, full, beam
+        "evaluation_strategy": "depth",  # options: depth, chains, breadth
+        # "multiprocessing": True,  # run stands in parallel worker processes
+        # "multiprocessing_workers": 4,  # defaults to the number of CPUs
+        # "streaming": True,  # simulate, post-process and export one stand at a time
+        # "merge_duplicate_states": True,  # simulate identical states as one between time points (partial, beam)
+        # "merge_collected_data": ["report_state"],  # collected data compared when merging, defaults to all
+        # "beam_width": 10,  # alternatives kept after each time point with the beam formation strategy
+        # "beam_objective": "net_present_value.value[(net_present_value.interest_rate == 3) & "
+        # "(net_present_value.time_point == time)]",  # ranks alternatives for the beam, higher is better
+        # "instrumentation": True,  # log time spent in each treatment and its conditions
+        # "instrumentation_trace": True,  # with instrumentation, write Chrome traces per stand to target/traces
+        # "journal": True,  # record finished stands in the target directory for continuing with --resume
+        # "block_size": 100,  # stands simulated together, batching treatments with the breadth evaluation strategy
+        # "cost_scheduling": True,  # simulate the most expensive stands first, recording cost statistics to target
+        # "dry_run": True,  # print estimated alternatives, memory and run time per stand instead of simulating
+        # "alternatives_budget": 10000,  # alternatives per stand kept in memory, the rest are spilled to disk
+        # "memory_budget": 1024,  # MiB of alternatives per stand kept in memory, the rest are spilled to disk
+        # "alternatives_limit": 100000,  # abort stands with more alternatives, leaving them out of the results
+        # "failure_statistics": True,  # count failed branches per event, time point and phase to target/failures
         "run_modes": ["preprocess", "export_prepro", "simulate", "postprocess", "export"]
     },
     "preprocessing_operations": [
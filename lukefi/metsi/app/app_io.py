@@ -28,13 +28,30 @@ class MetsiConfiguration(SimpleNamespace):
     state_format = StateFormat.FDM
     state_input_container = StateInputFormat.CSV
     state_output_container: Optional[StateOutputFormat] = None
-    derived_data_output_container: Optional[str] = None
+    derived_data_output_container: Optional[DerivedDataOutputFormat] = None
     formation_strategy = FormationStrategy.PARTIAL
     evaluation_strategy = EvaluationStrategy.DEPTH
     measured_trees = False
     strata = True
     strata_origin = StrataOrigin.INVENTORY
     multiprocessing = False
+    multiprocessing_workers: Optional[int] = None
+    streaming = False
+    merge_duplicate_states = False
+    merge_collected_data: Optional[list[str]] = None
+    beam_width: Optional[int] = None
+    beam_objective: Optional[str] = None
+    instrumentation = False
+    instrumentation_trace = False
+    journal = False
+    resume = False
+    block_size: Optional[int] = None
+    cost_scheduling = False
+    dry_run = False
+    alternatives_budget: Optional[int] = None
+    memory_budget: Optional[int] = None
+    alternatives_limit: Optional[int] = None
+    failure_statistics = False
 
     def __init__(self, **kwargs):
         """Initialize the configuration with defaults and user-provided values."""
@@ -52,13 +69,30 @@ class MetsiConfiguration(SimpleNamespace):
     def _convert_to_config(self, **kwargs):
         """Convert input values to their appropriate types or enums."""
 
-        config_types: dict[str, type[str] | type[bool]] = {
+        config_types: dict[str, type[str] | type[bool] | type[int] | type[list]] = {
             'control_file': str,
             'input_path': str,
             'target_directory': str,
             'measured_trees': bool,
             'strata': bool,
-            'multiprocessing': bool
+            'multiprocessing': bool,
+            'multiprocessing_workers': int,
+            'streaming': bool,
+            'merge_duplicate_states': bool,
+            'merge_collected_data': list,
+            'beam_width': int,
+            'beam_objective': str,
+            'instrumentation': bool,
+            'instrumentation_trace': bool,
+            'journal': bool,
+            'resume': bool,
+            'block_size': int,
+            'cost_scheduling': bool,
+            'dry_run': bool,
+            'alternatives_budget': int,
+            'memory_budget': int,
+            'alternatives_limit': int,
+            'failure_statistics': bool
         }
         config_enums: dict[str, type[StringConfigEnum] | type[IntConfigEnum]] = {
             'run_modes': RunMode,
@@ -133,6 +167,10 @@ def parse_cli_arguments(args: list[str]) -> dict:
     parser.add_argument('input_path', help='Application input file or directory')
     parser.add_argument('target_directory', help='Directory path for program output')
     parser.add_argument('control_file', nargs='?', help='Application control declaration file')
+    parser.add_argument('--resume', action='store_true', default=None,
+                        help='Continue an interrupted simulation from the simulation journal in the target directory')
+    parser.add_argument('--dry-run', action='store_true', default=None,
+                        help='Report the expected alternatives and memory of each stand instead of simulating them')
     return parser.parse_args(args).__dict__
 
 
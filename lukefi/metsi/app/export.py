@@ -15,6 +15,16 @@ from lukefi.metsi.sim.runners import evaluate_sequence
 
 
 def export_files(config: MetsiConfiguration, decl: list[dict], data: SimResults):
+    for export_module, handler in export_handlers(config, decl, data):
+        print_logline(f"Exporting {export_module}...")
+        handler()
+
+
+def export_handlers(config: MetsiConfiguration,
+                    decl: list[dict],
+                    data: SimResults) -> list[tuple[str, Callable[[], None]]]:
+    """Prepare the output handlers for the declared export formats. All handlers append to their target files, so
+    they can be invoked repeatedly for consecutive portions of the simulation results."""
     output_handlers: list[tuple[str, Callable[[], None]]] = []
     for export_module_declaration in decl:
         export_module = export_module_declaration.get("format", None)
@@ -31,9 +41,7 @@ def export_files(config: MetsiConfiguration, decl: list[dict], data: SimResults)
             output_handlers.append((export_module, partial(rm_schedules_events_trees, target_path2, data)))
         else:
             print_logline(f"Unknown output format for export: '{export_module}'")
-    for export_module, handler in output_handlers:
-        print_logline(f"Exporting {export_module}...")
-        handler()
+    return output_handlers
 
 
 def export_preprocessed(target_directory: str, decl: dict[str, Any], stands: StandList) -> None:
@@ -1,6 +1,8 @@
 import csv
+import json
 import os
 import pickle
+import struct
 import importlib.util
 from collections.abc import Iterator, Callable
 from pathlib import Path
@@ -265,9 +267,93 @@ def write_full_simulation_result_dirtree(result: SimResults, app_arguments: Mets
                                      app_arguments.state_output_container.value)
             if app_arguments.derived_data_output_container is not None:
                 schedule_dir = prepare_target_directory(f"{app_arguments.target_directory}/{stand_id}/{i}")
-                filepath = determine_file_path(schedule_dir, app_arguments.derived_data_output_container)
+                filepath = determine_file_path(schedule_dir,
+                                               f"derived_data.{app_arguments.derived_data_output_container.value}")
                 write_derived_data_to_file(schedule.collected_data, filepath,
-                                           app_arguments.derived_data_output_container)
+                                           app_arguments.derived_data_output_container.value)
+
+
+SIMULATION_JOURNAL = "simulation_journal.bin"
+_JOURNAL_HEADER = struct.Struct("<IQ")
+
+
+def simulation_journal_path(target_directory: str | Path) -> Path:
+    return Path(target_directory, SIMULATION_JOURNAL)
+
+
+def append_to_simulation_journal(journal_path: str | Path, stand_id: str, schedules: list[ForestOpPayload]):
+    """
+    Append the simulation results of a single stand to the simulation journal. Each record consists of a header with
+    the lengths of the stand identifier and the pickled results, followed by the identifier and the results. The file
+    is flushed to disk before returning, so that the record survives the process crashing afterwards.
+
+    :param journal_path: path of the journal file
+    :param stand_id: identifier of the stand
+    :param schedules: simulation results of the stand
+    """
+    identifier = stand_id.encode("utf-8")
+    data = pickle.dumps(schedules, protocol=5)
+    with open(journal_path, "ab") as f:
+        f.write(_JOURNAL_HEADER.pack(len(identifier), len(data)))
+        f.write(identifier)
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def read_simulation_journal(journal_path: str | Path, stand_ids: Optional[set[str]] = None) -> SimResults:
+    """
+    Read the simulation results recorded in the simulation journal. A partially written record at the end of the
+    journal, left by an interrupted run, is cut off from the file so that new records can be appended after the
+    complete ones.
+
+    :param journal_path: path of the journal file
+    :param stand_ids: identifiers of the stands to read the results of, all if None
+    :return: simulation results keyed by stand identifiers, empty if the journal does not exist
+    """
+    result: SimResults = {}
+    if not os.path.exists(journal_path):
+        return result
+    complete_length = 0
+    with open(journal_path, "rb") as f:
+        while True:
+            header = f.read(_JOURNAL_HEADER.size)
+            if len(header) < _JOURNAL_HEADER.size:
+                break
+            identifier_length, data_length = _JOURNAL_HEADER.unpack(header)
+            identifier = f.read(identifier_length)
+            if len(identifier) < identifier_length:
+                break
+            stand_id = identifier.decode("utf-8")
+            if stand_ids is None or stand_id in stand_ids:
+                data = f.read(data_length)
+                if len(data) < data_length:
+                    break
+                result[stand_id] = pickle.loads(data)
+            elif f.seek(data_length, os.SEEK_CUR) > os.fstat(f.fileno()).st_size:
+                break
+            complete_length = f.tell()
+    if complete_length < os.path.getsize(journal_path):
+        os.truncate(journal_path, complete_length)
+    return result
+
+
+COST_STATISTICS = "cost_statistics.json"
+
+
+def read_cost_statistics(target_directory: str | Path) -> Optional[dict[str, Any]]:
+    """Read the simulation cost statistics recorded in the target directory by previous runs, if any."""
+    path = Path(target_directory, COST_STATISTICS)
+    if not path.exists():
+        return None
+    with open(path, "r", encoding="utf-8") as file:
+        return json.load(file)
+
+
+def write_cost_statistics(target_directory: str | Path, statistics: dict[str, Any]):
+    with open(Path(prepare_target_directory(str(target_directory)), COST_STATISTICS), "w",
+              encoding="utf-8") as file:
+        json.dump(statistics, file)
 
 
 def read_control_module(control_path: str, control: str = "control_structure") -> dict[str, Any]:
@@ -12,14 +12,17 @@ from lukefi.metsi.app.preprocessor import (
 from lukefi.metsi.app.app_io import parse_cli_arguments, MetsiConfiguration, generate_application_configuration, RunMode
 from lukefi.metsi.domain.forestry_types import SimResults
 from lukefi.metsi.domain.forestry_types import StandList
-from lukefi.metsi.app.export import export_files, export_preprocessed
+from lukefi.metsi.app.export import export_files, export_handlers, export_preprocessed
 from lukefi.metsi.app.file_io import prepare_target_directory, read_stands_from_file, \
-    read_full_simulation_result_dirtree, write_full_simulation_result_dirtree, read_control_module
+    read_full_simulation_result_dirtree, write_full_simulation_result_dirtree, read_control_module, \
+    simulation_journal_path, append_to_simulation_journal, read_simulation_journal
 from lukefi.metsi.app.post_processing import post_process_alternatives
-from lukefi.metsi.domain.stand_runner import run_stands
-from lukefi.metsi.sim.simulator import simulate_alternatives
+from lukefi.metsi.app.stand_costs import cpu_seconds, estimate_stand_costs, print_cost_report, record_stand_costs
+from lukefi.metsi.domain.stand_runner import run_stands, stream_stands
+from lukefi.metsi.sim.simulator import simulate_alternatives, stream_alternatives
 from lukefi.metsi.app.console_logging import print_logline
 from lukefi.metsi.app.utils import MetsiException
+from lukefi.metsi.sim.cost_model import longest_first
 
 
 def preprocess(config: MetsiConfiguration, control: dict, stands: StandList) -> StandList:
@@ -31,13 +34,70 @@ def preprocess(config: MetsiConfiguration, control: dict, stands: StandList) ->
 
 def simulate(config: MetsiConfiguration, control: dict, stands: StandList) -> SimResults:
     print_logline("Simulating alternatives...")
-    result = simulate_alternatives(config, control, stands, run_stands)
+    cost_model, estimates = estimate_stand_costs(config, control, stands) if config.cost_scheduling else (None, [])
+    scheduled = [stands[i] for i in longest_first(estimates)] if cost_model is not None else stands
+    start = cpu_seconds()
+    if config.journal or config.resume:
+        result = simulate_journaled(config, control, scheduled)
+    else:
+        result = simulate_alternatives(config, control, scheduled, run_stands)
+    if cost_model is not None:
+        record_stand_costs(config, cost_model, estimates,
+                           {stand_id: len(schedules) for stand_id, schedules in result.items()},
+                           cpu_seconds() - start)
+        # restore the input order of the stands, leaving out the aborted ones
+        result = {stand.identifier: result[stand.identifier] for stand in stands if stand.identifier in result}
     if config.state_output_container is not None or config.derived_data_output_container is not None:
         print_logline(f"Writing simulation results to '{config.target_directory}'")
         write_full_simulation_result_dirtree(result, config)
     return result
 
 
+def simulate_journaled(config: MetsiConfiguration, control: dict, stands: StandList) -> SimResults:
+    """Simulate the stands, recording the results of each stand into the simulation journal in the target directory as
+    soon as the stand is finished. When resuming, stands found in the journal are not simulated again and their
+    recorded results are used instead. Stands whose simulation is aborted are left out of the results."""
+    journal = simulation_journal_path(prepare_target_directory(config.target_directory))
+    completed: SimResults = {}
+    if config.resume:
+        completed = read_simulation_journal(journal, {stand.identifier for stand in stands})
+        print_logline(f"Resuming with results for {len(completed)} stands from '{journal}'")
+    remaining = [stand for stand in stands if stand.identifier not in completed]
+    for stand_id, schedules in stream_alternatives(config, control, remaining, stream_stands):
+        append_to_simulation_journal(journal, stand_id, schedules)
+        completed[stand_id] = schedules
+    # in the input order of the stands, leaving out the aborted ones
+    return {stand.identifier: completed[stand.identifier] for stand in stands if stand.identifier in completed}
+
+
+def simulate_streaming(config: MetsiConfiguration, control: dict, stands: StandList) -> None:
+    """Simulate, post-process and export the results one stand at a time, releasing each stand's results before
+    moving on to the next one. Covers all run modes from simulate onwards. Unlike simulate, the results are written
+    and exported in the scheduled order of the stands with cost_scheduling, as restoring the input order would require
+    holding the results of the stands finished ahead of their turn."""
+    if config.resume:
+        raise MetsiException("Resuming from the simulation journal is not supported in streaming mode")
+    print_logline("Simulating, post-processing and exporting alternatives stand by stand...")
+    write_results = config.state_output_container is not None or config.derived_data_output_container is not None
+    cost_model, estimates = estimate_stand_costs(config, control, stands) if config.cost_scheduling else (None, [])
+    scheduled = [stands[i] for i in longest_first(estimates)] if cost_model is not None else stands
+    alternatives: dict[str, int] = {}
+    start = cpu_seconds()
+    for stand_id, schedules in stream_alternatives(config, control, scheduled, stream_stands):
+        alternatives[stand_id] = len(schedules)
+        result: SimResults = {stand_id: schedules}
+        if RunMode.POSTPROCESS in config.run_modes:
+            result = post_process_alternatives(config, control['post_processing'], result)
+        if write_results:
+            write_full_simulation_result_dirtree(result, config)
+        if RunMode.EXPORT in config.run_modes and control['export']:
+            for _, handler in export_handlers(config, control['export'], result):
+                handler()
+    if cost_model is not None:
+        # the CPU time includes post-processing and exporting, which scale similarly with the alternatives
+        record_stand_costs(config, cost_model, estimates, alternatives, cpu_seconds() - start)
+
+
 def post_process(config: MetsiConfiguration, control: dict, data: SimResults) -> SimResults:
     print_logline("Post-processing alternatives...")
     result = post_process_alternatives(config, control['post_processing'], data)
@@ -120,6 +180,8 @@ def main() -> int:
 
         # deleting old target files
         remove_existing_export_files(app_config, control_structure)
+        if app_config.journal and not app_config.resume:
+            simulation_journal_path(app_config.target_directory).unlink(missing_ok=True)
 
         if app_config.run_modes[0] in [RunMode.PREPROCESS, RunMode.SIMULATE]:
             # 1) read full stand list
@@ -162,6 +224,14 @@ def main() -> int:
         # feed this sub‐list of stands through the normal run_modes
         current = stands
         for mode in cfg.run_modes:
+            # dry runs and streaming replace the simulation and the run modes after it, given the stands to simulate
+            if mode == RunMode.SIMULATE and isinstance(current, list):
+                if cfg.dry_run:
+                    print_cost_report(cfg, control_structure, current)
+                    break
+                if cfg.streaming:
+                    simulate_streaming(cfg, control_structure, current)
+                    break
             runner = mode_runners[mode]
             current = runner(cfg, control_structure, current)
 
@@ -79,11 +79,13 @@ class StrataOrigin(IntConfigEnum):
 class FormationStrategy(StringConfigEnum):
     PARTIAL = 'partial'
     FULL = 'full'
+    BEAM = 'beam'
 
 
 class EvaluationStrategy(StringConfigEnum):
     DEPTH = 'depth'
     CHAINS = 'chains'
+    BREADTH = 'breadth'
 
 
 class StateFormat(StringConfigEnum):
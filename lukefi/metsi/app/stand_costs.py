@@ -0,0 +1,74 @@
+import os
+import pickle
+from typing import Any, Optional
+
+from lukefi.metsi.app.app_io import MetsiConfiguration
+from lukefi.metsi.app.console_logging import print_logline
+from lukefi.metsi.app.file_io import read_cost_statistics, write_cost_statistics
+from lukefi.metsi.domain.forestry_types import StandList
+from lukefi.metsi.data.model import ForestStand
+from lukefi.metsi.sim.cost_model import CostEstimate, CostModel
+from lukefi.metsi.sim.simulator import simulation_alternatives
+
+
+def stand_size(stand: ForestStand) -> int:
+    """Amount of reference trees of the stand, vectorized or not."""
+    if stand.reference_trees_soa is not None:
+        return stand.reference_trees_soa.size
+    return len(stand.reference_trees)
+
+
+def estimate_stand_costs(config: MetsiConfiguration,
+                         control: dict[str, Any],
+                         stands: StandList) -> tuple[CostModel, list[CostEstimate]]:
+    """
+    Estimate the cost of simulating each stand, using the cost statistics recorded in the target directory by previous
+    runs, if any. The memory of a single state is estimated by the pickled size of the stand.
+
+    :return: the CostModel used and the estimates in the order of the stands
+    """
+    model = CostModel(simulation_alternatives(config, control), read_cost_statistics(config.target_directory))
+    estimates = [model.estimate(stand.identifier, stand_size(stand), len(pickle.dumps(stand))) for stand in stands]
+    return model, estimates
+
+
+def cpu_seconds() -> float:
+    """CPU time of this process and its finished child processes. The worker processes of multiprocessing are included
+    once their pool is closed, so that the time of a parallel run is comparable to running the stands one by one."""
+    times = os.times()
+    return times.user + times.system + times.children_user + times.children_system
+
+
+def record_stand_costs(config: MetsiConfiguration,
+                       model: CostModel,
+                       estimates: list[CostEstimate],
+                       alternatives: dict[str, int],
+                       seconds: Optional[float] = None):
+    """Add the alternatives produced for each stand and the CPU time of the run to the cost statistics in the target
+    directory, see cpu_seconds."""
+    model.record(estimates, alternatives, seconds)
+    write_cost_statistics(config.target_directory, model.statistics())
+
+
+def cost_report(estimates: list[CostEstimate]) -> list[str]:
+    """Report lines of the expected alternatives, memory and time of each stand, and their totals."""
+    def line(label: str, alternatives: float, memory_bytes: int, seconds: Optional[float]) -> str:
+        time = "" if seconds is None else f", {seconds:.1f} s"
+        return f"{label}: {alternatives:.0f} alternatives, {memory_bytes / 2**20:.1f} MiB{time}"
+
+    lines = [line(f"Stand {estimate.identifier} ({estimate.size} trees)",
+                  estimate.alternatives, estimate.memory_bytes, estimate.seconds)
+             for estimate in estimates]
+    total_seconds = None if any(estimate.seconds is None for estimate in estimates) \
+        else sum(estimate.seconds or 0.0 for estimate in estimates)
+    lines.append(line(f"Total for {len(estimates)} stands",
+                      sum(estimate.alternatives for estimate in estimates),
+                      sum(estimate.memory_bytes for estimate in estimates),
+                      total_seconds))
+    return lines
+
+
+def print_cost_report(config: MetsiConfiguration, control: dict[str, Any], stands: StandList):
+    _, estimates = estimate_stand_costs(config, control, stands)
+    for line in cost_report(estimates):
+        print_logline(line)
@@ -11,3 +11,15 @@ class ConfigurationException(MetsiException):
 
 class ConditionFailed(MetsiException):
     """ Pre- or postcondition failed """
+
+
+class SimulationAborted(MetsiException):
+    """ Simulation of a computational unit aborted, such as for exceeding its alternatives limit """
+
+    def __init__(self, message: str, unit: int = 0):
+        """
+        :param message: the reason for aborting
+        :param unit: index of the aborted unit among the units simulated together
+        """
+        super().__init__(message)
+        self.unit = unit
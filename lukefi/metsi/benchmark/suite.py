@@ -0,0 +1,246 @@
+import argparse
+import contextlib
+import io
+import itertools
+import json
+import multiprocessing
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Optional
+
+from lukefi.metsi.app.metsi_enum import EvaluationStrategy, FormationStrategy
+from lukefi.metsi.benchmark.synthetic import synthetic_instructions, synthetic_stands
+from lukefi.metsi.data.model import ForestStand
+from lukefi.metsi.domain.stand_runner import run_stands
+from lukefi.metsi.sim.runners import Evaluator, TreeRunner, chain_evaluator, depth_first_evaluator, \
+    breadth_first_evaluator, run_full_tree_strategy, run_partial_tree_strategy
+from lukefi.metsi.sim.sim_configuration import SimConfiguration
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None  # type: ignore[assignment]
+
+FORMATION_STRATEGIES: dict[FormationStrategy, TreeRunner] = {
+    FormationStrategy.FULL: run_full_tree_strategy,
+    FormationStrategy.PARTIAL: run_partial_tree_strategy
+}
+
+EVALUATION_STRATEGIES: dict[EvaluationStrategy, Evaluator] = {
+    EvaluationStrategy.DEPTH: depth_first_evaluator,
+    EvaluationStrategy.CHAINS: chain_evaluator,
+    EvaluationStrategy.BREADTH: breadth_first_evaluator
+}
+
+
+class BenchmarkCase:
+    """A simulation of synthetic stands with synthetic instructions, see synthetic_stands and synthetic_instructions."""
+
+    __slots__ = ('stands', 'trees', 'depth', 'width', 'vectorized', 'formation', 'evaluation')
+
+    def __init__(self, stands: int, trees: int, depth: int, width: int, vectorized: bool,
+                 formation: FormationStrategy, evaluation: EvaluationStrategy):
+        self.stands = stands
+        self.trees = trees
+        self.depth = depth
+        self.width = width
+        self.vectorized = vectorized
+        self.formation = formation
+        self.evaluation = evaluation
+
+    @property
+    def name(self) -> str:
+        """Identifier of the case, for comparing results between runs."""
+        representation = "soa" if self.vectorized else "aos"
+        return (f"{self.formation.value}-{self.evaluation.value}-{representation}"
+                f"-s{self.stands}-t{self.trees}-d{self.depth}-w{self.width}")
+
+    def parameters(self) -> dict[str, Any]:
+        return {
+            "stands": self.stands,
+            "trees": self.trees,
+            "depth": self.depth,
+            "width": self.width,
+            "representation": "soa" if self.vectorized else "aos",
+            "formation_strategy": self.formation.value,
+            "evaluation_strategy": self.evaluation.value
+        }
+
+    def simulate(self) -> dict[str, list]:
+        """Simulate the case once, returning the results by stand."""
+        stands = synthetic_stands(self.stands, self.trees, self.vectorized)
+        config: SimConfiguration[ForestStand] = SimConfiguration(
+            simulation_instructions=synthetic_instructions(self.depth, self.width, self.vectorized))
+        with contextlib.redirect_stdout(io.StringIO()):
+            return run_stands(stands, config, FORMATION_STRATEGIES[self.formation],
+                              EVALUATION_STRATEGIES[self.evaluation])
+
+
+def benchmark_cases(stands: list[int], trees: list[int], depths: list[int], widths: list[int],
+                    representations: list[str], formations: list[FormationStrategy],
+                    evaluations: list[EvaluationStrategy]) -> list[BenchmarkCase]:
+    """All combinations of the given case parameters."""
+    return [BenchmarkCase(s, t, d, w, r == "soa", f, e)
+            for s, t, d, w, r, f, e in itertools.product(stands, trees, depths, widths, representations,
+                                                          formations, evaluations)]
+
+
+def peak_rss_bytes() -> Optional[int]:
+    """Peak resident set size of this process, if available on the platform."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kibibytes on Linux, bytes on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def run_case(case: BenchmarkCase, repeat: int = 3) -> dict[str, Any]:
+    """
+    Measure a case. The wall time is the best of the repeated simulations. The allocations are measured with
+    tracemalloc on a separate simulation, as tracing slows it down: the peak of the allocated bytes during the
+    simulation, and the bytes and blocks still allocated for its results after it.
+
+    :param case: the case to measure
+    :param repeat: amount of timed simulations
+    :return: the parameters and measurements of the case
+    """
+    seconds = []
+    alternatives = 0
+    for _ in range(max(repeat, 1)):
+        start = time.perf_counter()
+        result = case.simulate()
+        seconds.append(time.perf_counter() - start)
+        alternatives = sum(len(schedules) for schedules in result.values())
+        del result
+    tracemalloc.start()
+    try:
+        result = case.simulate()
+        retained_bytes, peak_bytes = tracemalloc.get_traced_memory()
+        retained_blocks = sum(statistic.count for statistic in tracemalloc.take_snapshot().statistics("filename"))
+        del result
+    finally:
+        tracemalloc.stop()
+    best = min(seconds)
+    return {
+        "name": case.name,
+        "parameters": case.parameters(),
+        "alternatives": alternatives,
+        "seconds": best,
+        "alternatives_per_second": alternatives / best if best > 0 else None,
+        "peak_rss_bytes": peak_rss_bytes(),
+        "peak_allocated_bytes": peak_bytes,
+        "retained_allocated_bytes": retained_bytes,
+        "retained_allocated_blocks": retained_blocks
+    }
+
+
+def run_suite(cases: list[BenchmarkCase], repeat: int = 3, isolated: bool = True) -> list[dict[str, Any]]:
+    """
+    Measure the given cases. If isolated, each case is measured in a fresh process, so that its peak resident set
+    size is not affected by the preceding cases.
+    """
+    results = []
+    for case in cases:
+        if isolated:
+            with multiprocessing.get_context("spawn").Pool(1) as pool:
+                result = pool.apply(run_case, (case, repeat))
+        else:
+            result = run_case(case, repeat)
+        print(format_result(result))
+        results.append(result)
+    return results
+
+
+def format_result(result: dict[str, Any]) -> str:
+    rss = result["peak_rss_bytes"]
+    rss_text = "" if rss is None else f", peak RSS {rss / 2**20:.1f} MiB"
+    return (f"{result['name']}: {result['seconds']:.3f} s, {result['alternatives']} alternatives, "
+            f"{result['alternatives_per_second'] or 0:.1f} alternatives/s{rss_text}, "
+            f"peak allocated {result['peak_allocated_bytes'] / 2**20:.1f} MiB, "
+            f"retained {result['retained_allocated_bytes'] / 2**20:.1f} MiB "
+            f"in {result['retained_allocated_blocks']} blocks")
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True,
+                              cwd=Path(__file__).parent).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def write_results(path: str | Path, results: list[dict[str, Any]]):
+    """Write the results with the commit and environment they were measured in as JSON."""
+    document = {
+        "commit": _git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results
+    }
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(document, file, indent=2)
+
+
+def read_results(path: str | Path) -> list[dict[str, Any]]:
+    with open(path, "r", encoding="utf-8") as file:
+        return json.load(file)["results"]
+
+
+def compare_results(baseline: list[dict[str, Any]], results: list[dict[str, Any]]) -> list[str]:
+    """Lines comparing the wall time, peak allocated memory and retained result memory of the cases found in both
+    result sets. Ratios below 1 are improvements over the baseline."""
+    baseline_by_name = {result["name"]: result for result in baseline}
+    lines = []
+    for result in results:
+        previous = baseline_by_name.get(result["name"])
+        if previous is None:
+            continue
+        ratios = [f"{label} x{result[key] / previous[key]:.2f}"
+                  for key, label in [("seconds", "time"), ("peak_allocated_bytes", "peak memory"),
+                                     ("retained_allocated_bytes", "result memory")]
+                  if previous.get(key) and result.get(key) is not None]
+        lines.append(f"{result['name']}: {', '.join(ratios)}")
+    return lines
+
+
+def parse_arguments(args: list[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark the simulation engine with synthetic stands.")
+    parser.add_argument("--stands", type=int, nargs="+", default=[10], help="amounts of stands")
+    parser.add_argument("--trees", type=int, nargs="+", default=[10, 100], help="amounts of trees per stand")
+    parser.add_argument("--depth", type=int, nargs="+", default=[3], help="amounts of time points")
+    parser.add_argument("--width", type=int, nargs="+", default=[3], help="amounts of alternatives per time point")
+    parser.add_argument("--representation", nargs="+", choices=["aos", "soa"], default=["aos", "soa"])
+    parser.add_argument("--formation", nargs="+", choices=[s.value for s in FORMATION_STRATEGIES],
+                        default=[s.value for s in FORMATION_STRATEGIES])
+    parser.add_argument("--evaluation", nargs="+", choices=[s.value for s in EVALUATION_STRATEGIES],
+                        default=[EvaluationStrategy.DEPTH.value, EvaluationStrategy.CHAINS.value])
+    parser.add_argument("--repeat", type=int, default=3, help="timed simulations per case, the best is reported")
+    parser.add_argument("--output", help="JSON file to write the results to")
+    parser.add_argument("--compare", help="JSON file of earlier results to compare the results to")
+    parser.add_argument("--in-process", action="store_true", help="measure all cases in this process")
+    return parser.parse_args(args)
+
+
+def main(args: Optional[list[str]] = None) -> int:
+    arguments = parse_arguments(sys.argv[1:] if args is None else args)
+    cases = benchmark_cases(arguments.stands, arguments.trees, arguments.depth, arguments.width,
+                            arguments.representation,
+                            [FormationStrategy(value) for value in arguments.formation],
+                            [EvaluationStrategy(value) for value in arguments.evaluation])
+    results = run_suite(cases, arguments.repeat, not arguments.in_process)
+    if arguments.output is not None:
+        write_results(arguments.output, results)
+    if arguments.compare is not None:
+        for line in compare_results(read_results(arguments.compare), results):
+            print(line)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
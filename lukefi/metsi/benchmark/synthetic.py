@@ -0,0 +1,96 @@
+import random
+from typing import Any
+
+from lukefi.metsi.data.enums.internal import LandUseCategory, SiteType, SoilPeatlandCategory, TreeSpecies
+from lukefi.metsi.data.model import ForestStand, ReferenceTree
+from lukefi.metsi.data.vectorize import vectorize
+from lukefi.metsi.domain.forestry_types import StandList
+from lukefi.metsi.domain.natural_processes.grow_acta import grow_acta, grow_acta_vectorized
+from lukefi.metsi.sim.collected_data import OpTuple
+from lukefi.metsi.sim.generators import Alternatives, Event, Sequence
+from lukefi.metsi.sim.operations import do_nothing
+from lukefi.metsi.sim.simulation_instruction import SimulationInstruction
+
+SPECIES = [TreeSpecies.PINE, TreeSpecies.SPRUCE, TreeSpecies.SILVER_BIRCH]
+
+
+def synthetic_stand(identifier: str, trees: int, rng: random.Random) -> ForestStand:
+    """A ForestStand with the given amount of randomized mature reference trees, growable with grow_acta."""
+    stand = ForestStand(
+        identifier=identifier,
+        area=1.0,
+        year=2025,
+        soil_peatland_category=SoilPeatlandCategory.MINERAL_SOIL,
+        site_type_category=SiteType.DAMP_SITE,
+        tax_class_reduction=1,
+        land_use_category=LandUseCategory.FOREST,
+        geo_location=(6900000.0, 3400000.0, 100.0, "EPSG:3067"))
+    for i in range(trees):
+        diameter = rng.uniform(5.0, 40.0)
+        stand.reference_trees.append(ReferenceTree(
+            identifier=f"{identifier}-{i + 1}-tree",
+            tree_number=i + 1,
+            species=rng.choice(SPECIES),
+            stems_per_ha=rng.uniform(20.0, 200.0),
+            breast_height_diameter=diameter,
+            height=1.3 + diameter * rng.uniform(0.5, 0.8),
+            biological_age=rng.uniform(20.0, 80.0),
+            breast_height_age=rng.uniform(10.0, 60.0),
+            sapling=False,
+            stand=stand))
+    return stand
+
+
+def synthetic_stands(stands: int, trees: int, vectorized: bool = False, seed: int = 0) -> StandList:
+    """
+    Generate reproducible synthetic stands.
+
+    :param stands: amount of stands
+    :param trees: amount of reference trees in each stand
+    :param vectorized: convert the stands into the struct-of-arrays form with vectorize
+    :param seed: seed of the random tree attributes
+    :return: the stands
+    """
+    rng = random.Random(seed)
+    result = [synthetic_stand(f"{i + 1}", trees, rng) for i in range(stands)]
+    return vectorize(result) if vectorized else result
+
+
+def thin_stems(input_: OpTuple[ForestStand], /, **operation_parameters) -> OpTuple[ForestStand]:
+    """Synthetic thinning removing the share of the stems of each reference tree given as the fraction parameter."""
+    stand, collected_data = input_
+    remaining = 1.0 - operation_parameters.get('fraction', 0.2)
+    if stand.reference_trees_soa is not None:
+        stand.reference_trees_soa.stems_per_ha = stand.reference_trees_soa.stems_per_ha * remaining
+    else:
+        for tree in stand.reference_trees:
+            tree.stems_per_ha = tree.stems_per_ha * remaining
+    collected_data.store('thin_stems', operation_parameters.get('fraction', 0.2))
+    return stand, collected_data
+
+
+def synthetic_instructions(depth: int, width: int, vectorized: bool = False,
+                           step: int = 5) -> list[SimulationInstruction[ForestStand]]:
+    """
+    Simulation instructions branching into width alternatives at each of depth time points: leaving the stand be or
+    thinning it with width - 1 different intensities, followed by growing it. A stand produces width ** depth
+    alternatives.
+
+    :param depth: amount of time points
+    :param width: amount of alternatives at each time point
+    :param vectorized: grow with grow_acta_vectorized instead of grow_acta
+    :param step: years between time points
+    :return: the simulation instructions
+    """
+    alternatives: list[Any] = [Event(do_nothing)]
+    alternatives.extend(Event(thin_stems, parameters={"fraction": 0.1 * (i + 1)}) for i in range(width - 1))
+    grow = grow_acta_vectorized if vectorized else grow_acta
+    return [
+        SimulationInstruction(
+            time_points=[2025 + step * i for i in range(depth)],
+            events=Sequence([
+                Alternatives(alternatives),
+                Event(grow, parameters={"step": step})
+            ])
+        )
+    ]
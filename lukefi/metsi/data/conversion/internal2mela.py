@@ -257,7 +257,7 @@ def mela_stand(stand: ForestStand) -> ForestStand:
         s.storey = 0 if s.storey is None else s.storey.value
         # all None values to -1
         rsts_default = -1
-        for k, v in s.__dict__.items():
+        for k, v in s.field_values().items():
             if v is None:
                 setattr(s, k, rsts_default)
     return result
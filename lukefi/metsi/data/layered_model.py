@@ -1,34 +1,124 @@
-from typing import Any, TypeVar, Union
+from typing import TYPE_CHECKING, Any, Optional, TypeVar, Union
 
 
 class LayeredObject[T]:
+    """
+    Overlay of attribute values on a base object. Attributes assigned to a layer are stored in the layer, and the
+    other attributes are read through the previous layers from the base object. Attributes of the layer itself are
+    found by the regular attribute lookup, and only the attributes missing from it are looked up with __getattr__,
+    from the attribute dicts of the previous layers collected at construction and then from the base object.
+
+    To keep the cost of reading attributes independent of the amount of layers, new_layer flattens the layers between
+    the base object and the new layer into the new layer when the new layer would be deeper than max_depth.
+    """
+
+    # __orig_class__ is set by constructing through a subscripted alias such as LayeredObject[ForestStand], and is kept
+    # in a slot to leave it out of the attribute values of the layer
+    __slots__ = ('_previous', '_lower', '_base', '__orig_class__', '__dict__')
+
+    # maximum amount of layers on a base object before new_layer flattens them, or None for no limit
+    max_depth: Optional[int] = 8
+
     _previous: "PossiblyLayered[T]"
+    # attribute dicts of the previous layers, the nearest first
+    _lower: tuple[dict[str, Any], ...]
+    _base: T
 
     def __init__(self, base: "PossiblyLayered[T]"):
-        self._previous = base
+        _link(self, base)
+
+    def __getattr__(self, key: str) -> Any:
+        for attributes in object.__getattribute__(self, '_lower'):
+            if key in attributes:
+                return attributes[key]
+        return getattr(object.__getattribute__(self, '_base'), key)
+
+    if TYPE_CHECKING:
+        # any attribute of the base object can be assigned to a layer, declared for type checking only to keep the
+        # default attribute assignment
+        def __setattr__(self, name: str, value: Any) -> None:
+            ...
+
+    @property  # type: ignore[override]
+    def __class__(self) -> type:
+        # isinstance checks against the type of the base object hold for its layers
+        return type(self.base_object())
+
+    @__class__.setter
+    def __class__(self, value: type):
+        raise TypeError(f"Layers take their class from the base object, cannot set it to {value.__name__}")
 
-    def __getattribute__(self, key):
-        local_keys = object.__getattribute__(self, '__dict__').keys()
-        builtins = ('__dict__', '__getattribute__', 'new_layer', 'fixate')
-        if key in local_keys or key in builtins:
-            return object.__getattribute__(self, key)
-        return object.__getattribute__(self, '_previous').__getattribute__(key)
+    def __reduce__(self):
+        # Pickle the layer itself rather than the attribute lookup result from the base object. Shared base layers are
+        # serialized once per pickling call through the pickle memo.
+        return _restore_layer, (dict(object.__getattribute__(self, '__dict__')),
+                                object.__getattribute__(self, '_previous'))
 
-    def __setattr__(self, name: str, value: Any) -> None:
-        object.__setattr__(self, name, value)
+    def __reduce_ex__(self, protocol):
+        _ = protocol
+        return self.__reduce__()
+
+    def base_object(self) -> T:
+        """The object under all layers."""
+        return object.__getattribute__(self, '_base')
 
     def new_layer(self) -> "LayeredObject[T]":
-        return LayeredObject(self)
+        """A new empty layer on top of this one. If it would be deeper than max_depth, the attribute values of this
+        layer and the layers below it are copied into the new layer instead, which is put directly on the base
+        object. The new layer does not see later changes to the flattened layers, which branching simulation states
+        do not make."""
+        if LayeredObject.max_depth is None or len(self._lower) + 1 < LayeredObject.max_depth:
+            return LayeredObject(self)
+        layer: LayeredObject[T] = LayeredObject(self._base)
+        object.__getattribute__(layer, '__dict__').update(self._layer_attributes())
+        return layer
+
+    def _layer_attributes(self) -> dict[str, Any]:
+        """The attribute values of this layer and the layers below it, excluding the base object."""
+        attributes: dict[str, Any] = {}
+        for values in reversed(self._lower):
+            attributes.update(values)
+        attributes.update(object.__getattribute__(self, '__dict__'))
+        return attributes
+
+    def flattened_attributes(self) -> dict[str, Any]:
+        """Collect the effective attribute values of all layers into a new dict without modifying any of the
+        layers."""
+        base = self.base_object()
+        # slotted models such as ReferenceTree have no __dict__, and give their attribute values with field_values
+        field_values = getattr(base, 'field_values', None)
+        attributes = field_values() if field_values is not None else dict(vars(base))
+        attributes.update(self._layer_attributes())
+        return attributes
 
     def fixate(self) -> "PossiblyLayered[T]":
-        root: PossiblyLayered[T]
-        if isinstance(self._previous, LayeredObject):
-            root = self._previous.fixate()
-        else:
-            root = self._previous
-        root.__dict__.update(self.__dict__)
+        """Apply the attribute values of all layers to the base object and return it."""
+        root = self.base_object()
+        for key, value in self._layer_attributes().items():
+            setattr(root, key, value)
         return root
 
 
+def _restore_layer(state: dict[str, Any], previous: Any = None) -> LayeredObject:
+    layer = object.__new__(LayeredObject)
+    if previous is None:
+        # layers pickled before the previous layer was kept in a slot
+        previous = state.pop('_previous')
+    object.__getattribute__(layer, '__dict__').update(state)
+    _link(layer, previous)
+    return layer
+
+
+def _link(layer: LayeredObject, previous: Any):
+    object.__setattr__(layer, '_previous', previous)
+    if isinstance(previous, LayeredObject):
+        object.__setattr__(layer, '_lower', (object.__getattribute__(previous, '__dict__'),
+                                             *object.__getattribute__(previous, '_lower')))
+        object.__setattr__(layer, '_base', object.__getattribute__(previous, '_base'))
+    else:
+        object.__setattr__(layer, '_lower', ())
+        object.__setattr__(layer, '_base', previous)
+
+
 T = TypeVar("T")
 PossiblyLayered = Union[T, LayeredObject[T]]
@@ -1,5 +1,5 @@
 import dataclasses
-from typing import Optional, override
+from typing import Any, Optional, override
 from dataclasses import dataclass
 from lukefi.metsi.app.utils import MetsiException
 from lukefi.metsi.data.enums.internal import (LandUseCategory, OwnerCategory, SiteType, SoilPeatlandCategory,
@@ -11,20 +11,61 @@ from lukefi.metsi.data.vector_model import ReferenceTrees, Strata
 from lukefi.metsi.sim.finalizable import Finalizable
 
 # NOTE:
-# * the deepcopy methods here are roughly equivalent to
+# * ReferenceTree and TreeStratum are slotted dataclasses, as stands have many of them in every branch: the attribute
+#   values are kept in slots instead of an instance dict, and assigning an attribute which is not declared as a field
+#   raises AttributeError. They have no __dict__: field_values gives the values of the fields which are set (not
+#   deleted, as vectorize does) as a new dict. Fields of older pickles which are no longer declared are dropped when
+#   unpickling.
+# * ForestStand keeps an instance dict, and its deepcopy method is roughly equivalent to
 #       def __deepcopy__(self, memo):
 #           return cls(**self.__dict__)
 #   but __new__ + update() is ~25% faster (tested on Python 3.10).
 #   dict.copy() vs dict(other) vs dict.update(other) are all equally fast.
+# * the deepcopy methods of the slotted classes, _copy_stratum and _copy_tree, assign each field with straight-line
+#   code. this is ~2x faster than __new__ + __dict__.update() of a dict based class and ~5x faster than a loop over
+#   the slots (tested on Python 3.12). if you add a field to either class, add it to its copy function too.
 # * none of the ForestStand / ReferenceTree / TreeStratum have their __init__
 #   methods run when copied. don't add a (non-trivial) __init__ method to any class here.
 # * if you add any containers on any class here, you need to add a manual copy
 #   in the __deepcopy__ method. see ForestStand.__deepcopy__ for an example.
 
 
+_UNSET = object()
+
+
+class SlottedModel:
+    """Base of the slotted model classes, see the note above."""
+
+    __slots__: tuple[str, ...] = ()
+
+    def field_values(self) -> dict[str, Any]:
+        """The values of the fields which are set, as a new dict."""
+        values: dict[str, Any] = {}
+        for name in self.__slots__:
+            value = getattr(self, name, _UNSET)
+            if value is not _UNSET:
+                values[name] = value
+        return values
+
+    def __getstate__(self) -> dict[str, Any]:
+        return self.field_values()
+
+    def __setstate__(self, state: dict[str, Any]):
+        for name in self.__slots__:
+            if name in state:
+                setattr(self, name, state[name])
+
+
+def _copy_set_fields[M: SlottedModel](source: M) -> M:
+    """Copy the fields which are set into a new instance without running __init__."""
+    target = object.__new__(type(source))
+    target.__setstate__(source.field_values())
+    return target
+
+
 @dataclass(init=True, repr=False, order=False, unsafe_hash=False, frozen=False, match_args=False, kw_only=False,
-           slots=False, weakref_slot=False, eq=False)
-class TreeStratum():
+           slots=True, weakref_slot=False, eq=False)
+class TreeStratum(SlottedModel):
     # VMI data type 2
     # SMK data type TreeStratum
 
@@ -63,9 +104,7 @@ class TreeStratum():
         return id(self) == id(other)
 
     def __deepcopy__(self, memo: dict) -> 'TreeStratum':
-        s = TreeStratum.__new__(TreeStratum)
-        s.__dict__.update(self.__dict__)
-        return s
+        return _copy_stratum(self)
 
     def has_height(self):
         if self.mean_height is None:
@@ -211,8 +250,8 @@ class TreeStratum():
 
 
 @dataclass(init=True, repr=False, order=False, unsafe_hash=False, frozen=False, match_args=False, kw_only=False,
-           slots=False, weakref_slot=False, eq=False)
-class ReferenceTree():
+           slots=True, weakref_slot=False, eq=False)
+class ReferenceTree(SlottedModel):
     # VMI data type 3
     # No SMK equivalent
 
@@ -256,9 +295,7 @@ class ReferenceTree():
         return id(self) == id(other)
 
     def __deepcopy__(self, memo: dict) -> 'ReferenceTree':
-        t = ReferenceTree.__new__(ReferenceTree)
-        t.__dict__.update(self.__dict__)
-        return t
+        return _copy_tree(self)
 
     def __hash__(self):
         return id(self)
@@ -527,6 +564,67 @@ class ForestStand(Finalizable):
             self.tree_strata_soa = self.tree_strata_soa.finalize()
 
 
+def _copy_stratum(source: TreeStratum) -> TreeStratum:
+    target = object.__new__(TreeStratum)
+    try:
+        target.stand = source.stand
+        target.identifier = source.identifier
+        target.species = source.species
+        target.origin = source.origin
+        target.stems_per_ha = source.stems_per_ha
+        target.mean_diameter = source.mean_diameter
+        target.mean_height = source.mean_height
+        target.breast_height_age = source.breast_height_age
+        target.biological_age = source.biological_age
+        target.basal_area = source.basal_area
+        target.saw_log_volume_reduction_factor = source.saw_log_volume_reduction_factor
+        target.cutting_year = source.cutting_year
+        target.age_when_10cm_diameter_at_breast_height = source.age_when_10cm_diameter_at_breast_height
+        target.tree_number = source.tree_number
+        target.stand_origin_relative_position = source.stand_origin_relative_position
+        target.lowest_living_branch_height = source.lowest_living_branch_height
+        target.management_category = source.management_category
+        target.sapling_stems_per_ha = source.sapling_stems_per_ha
+        target.sapling_stratum = source.sapling_stratum
+        target.storey = source.storey
+        target.number_of_generated_trees = source.number_of_generated_trees
+    except AttributeError:
+        # some fields are deleted
+        return _copy_set_fields(source)
+    return target
+
+
+def _copy_tree(source: ReferenceTree) -> ReferenceTree:
+    target = object.__new__(ReferenceTree)
+    try:
+        target.stand = source.stand
+        target.identifier = source.identifier
+        target.stems_per_ha = source.stems_per_ha
+        target.species = source.species
+        target.breast_height_diameter = source.breast_height_diameter
+        target.height = source.height
+        target.measured_height = source.measured_height
+        target.breast_height_age = source.breast_height_age
+        target.biological_age = source.biological_age
+        target.saw_log_volume_reduction_factor = source.saw_log_volume_reduction_factor
+        target.pruning_year = source.pruning_year
+        target.age_when_10cm_diameter_at_breast_height = source.age_when_10cm_diameter_at_breast_height
+        target.origin = source.origin
+        target.tree_number = source.tree_number
+        target.stand_origin_relative_position = source.stand_origin_relative_position
+        target.lowest_living_branch_height = source.lowest_living_branch_height
+        target.management_category = source.management_category
+        target.tree_category = source.tree_category
+        target.sapling = source.sapling
+        target.storey = source.storey
+        target.tree_type = source.tree_type
+        target.tuhon_ilmiasu = source.tuhon_ilmiasu
+    except AttributeError:
+        # some fields are deleted
+        return _copy_set_fields(source)
+    return target
+
+
 def create_layered_tree(**kwargs) -> LayeredObject[ReferenceTree]:
     prototype = ReferenceTree()
     layered = LayeredObject(prototype)
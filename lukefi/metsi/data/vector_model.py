@@ -1,12 +1,20 @@
-from copy import copy
+from collections.abc import Iterable
+from copy import copy, deepcopy
+import math
+from functools import cache
 from typing import Any, Optional, overload
 import numpy as np
 import numpy.typing as npt
 
 from lukefi.metsi.app.utils import MetsiException
 
+# String columns, see StringColumn, are stored as np.int32 codes to a StringTable
+
+# byte alignment of the columns in the block of packed VectorData
+BLOCK_ALIGNMENT = 16
+
 DTYPES_TREE: dict[str, npt.DTypeLike] = {
-    "identifier": np.dtype("U20"),
+    "identifier": np.int32,
     "tree_number": np.int32,
     "species": np.int32,
     "breast_height_diameter": np.float64,
@@ -22,15 +30,15 @@ DTYPES_TREE: dict[str, npt.DTypeLike] = {
     "age_when_10cm_diameter_at_breast_height": np.int16,
     "stand_origin_relative_position": np.dtype((np.float64, (3,))),
     "lowest_living_branch_height": np.float64,
-    "tree_category": np.str_,
+    "tree_category": np.int32,
     "storey": np.int32,
     "sapling": np.bool_,
-    "tree_type": np.dtype("U20"),
-    "tuhon_ilmiasu": np.dtype("U20"),
+    "tree_type": np.int32,
+    "tuhon_ilmiasu": np.int32,
 }
 
 DTYPES_STRATA: dict[str, npt.DTypeLike] = {
-    "identifier": np.dtype("U20"),
+    "identifier": np.int32,
     "species": np.int32,
     "mean_diameter": np.float64,
     "mean_height": np.float64,
@@ -53,20 +61,185 @@ DTYPES_STRATA: dict[str, npt.DTypeLike] = {
 }
 
 
+class StringTable:
+    """
+    Append-only table of distinct strings, encoding them as integer codes for the string columns of VectorData. A
+    table is shared by the VectorData of a stand and their copies, and codes stay valid as strings are added to it.
+    """
+
+    __slots__ = ('strings', 'codes', '_decoded')
+
+    strings: list[str]
+    codes: dict[str, int]
+    _decoded: Optional[npt.NDArray[np.str_]]
+
+    def __init__(self, strings: Iterable[str] = ()):
+        self.strings = []
+        self.codes = {}
+        self._decoded = None
+        for value in strings:
+            self.encode(value)
+
+    def __getstate__(self) -> list[str]:
+        return self.strings
+
+    def __setstate__(self, state: list[str]):
+        self.strings = list(state)
+        self.codes = {value: code for code, value in enumerate(self.strings)}
+        self._decoded = None
+
+    def __deepcopy__(self, memo: dict) -> 'StringTable':
+        # the strings are immutable, and the cached decoding array is never modified
+        table = StringTable.__new__(StringTable)
+        table.strings = list(self.strings)
+        table.codes = dict(self.codes)
+        table._decoded = self._decoded
+        memo[id(self)] = table
+        return table
+
+    def __len__(self) -> int:
+        return len(self.strings)
+
+    def encode(self, value: Optional[str]) -> int:
+        """The code of the given string, adding it to the table if needed. None is encoded as an empty string."""
+        value = "" if value is None else str(value)
+        code = self.codes.get(value)
+        if code is None:
+            code = len(self.strings)
+            self.strings.append(value)
+            self.codes[value] = code
+        return code
+
+    def encode_all(self, values: Iterable[Optional[str]]) -> npt.NDArray[np.int32]:
+        return np.fromiter((self.encode(value) for value in values), dtype=np.int32)
+
+    def decode(self, codes: npt.NDArray[np.integer]) -> npt.NDArray[np.str_]:
+        """The strings of the given codes as a new array."""
+        if self._decoded is None or len(self._decoded) != len(self.strings):
+            self._decoded = np.array(self.strings, dtype=np.str_)
+        return self._decoded[codes]
+
+
+class StringColumn:
+    """
+    A string column of VectorData, stored as an array of codes to the StringTable of the object. Reading the column
+    decodes it into a new read-only array of strings, and assigning strings to it encodes them. Assigned integer
+    arrays are stored as codes.
+    """
+
+    name: str
+
+    def __set_name__(self, owner: type, name: str):
+        self.name = name
+
+    def __get__(self, obj: Optional["VectorData"], objtype: Optional[type] = None) -> Any:
+        if obj is None:
+            return self
+        try:
+            codes = obj.__dict__[self.name]
+        except KeyError as e:
+            raise AttributeError(self.name) from e
+        decoded = obj.strings.decode(codes)
+        decoded.flags.writeable = False
+        return decoded
+
+    def __set__(self, obj: "VectorData", value: Any):
+        codes = np.asarray(value)
+        if codes.dtype.kind not in 'iu':
+            codes = obj.strings.encode_all(codes.tolist())
+        obj.__dict__[self.name] = codes
+
+
 class VectorData():
     """
     Base class for generic SoA data.
+
+    Rows are added and removed in place of spare capacity: the columns modified with create and delete are exact-size
+    views to larger buffers owned by the object, so that adding rows one at a time does not copy the columns on every
+    call. finalize releases the buffers, after which the columns are copied before they are modified again.
+
+    String columns are declared with StringColumn, and store codes to the StringTable of the object, which its
+    finalized copies share.
+
+    Optionally the columns are packed into a single contiguous block, see pack.
     """
     dtypes: dict[str, npt.DTypeLike]
     size: int
+    strings: StringTable
 
-    def __init__(self, dtypes: dict[str, npt.DTypeLike]):
+    # names of the StringColumn attributes of the class
+    string_columns: frozenset[str] = frozenset()
+
+    # the buffers the columns modified since the last finalize are views of, by column name
+    _buffers: dict[str, npt.NDArray]
+
+    # the block of packed columns and the name, byte offset, dtype and shape of each column in it
+    _block: npt.NDArray[np.uint8]
+    _layout: tuple[tuple[str, int, np.dtype, tuple[int, ...]], ...]
+
+    def __init__(self, dtypes: dict[str, npt.DTypeLike], strings: Optional[StringTable] = None):
         self.dtypes = dtypes
         self.size = 0
+        self.strings = StringTable() if strings is None else strings
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.string_columns = frozenset(name for klass in cls.__mro__ for name, attribute in vars(klass).items()
+                                       if isinstance(attribute, StringColumn))
+
+    def __getstate__(self) -> dict[str, Any]:
+        # the columns are pickled as exact-size arrays without the spare capacity of their buffers
+        state = dict(self.__dict__)
+        state.pop('_buffers', None)
+        state.pop('_block', None)
+        layout = state.pop('_layout', None)
+        if layout is not None and self.is_packed():
+            # the columns are pickled as the single block and restored as views of it
+            for key, _, _, _ in layout:
+                del state[key]
+            state['_block'] = self._block
+            state['_layout'] = layout
+        return state
+
+    def __copy__(self) -> 'VectorData':
+        # the columns are shared with the copy, so neither of them may modify the buffers in place afterwards
+        self.__dict__.pop('_buffers', None)
+        result = object.__new__(type(self))
+        result.__dict__.update(self.__dict__)
+        return result
+
+    def __deepcopy__(self, memo: dict) -> 'VectorData':
+        state = self.__getstate__()
+        block = state.pop('_block', None)
+        layout = state.pop('_layout', None)
+        result = object.__new__(type(self))
+        memo[id(self)] = result
+        state = deepcopy(state, memo)
+        if block is not None:
+            # a single copy of the packed columns, the layout is immutable
+            state['_block'] = block.copy()
+            state['_layout'] = layout
+        result.__setstate__(state)
+        return result
+
+    def __setstate__(self, state: dict[str, Any]):
+        self.__dict__.update(state)
+        if '_block' in state:
+            for key, offset, dtype, shape in self._layout:
+                self.__dict__[key] = _block_view(self._block, offset, dtype, shape)
+        if 'strings' not in state:
+            # pickled before string columns were encoded
+            self.strings = StringTable()
+            for key in self.string_columns & state.keys():
+                setattr(self, key, state[key])
 
     def vectorize(self, attr_dict: dict[str, list[Any]]):
         self.set_size(attr_dict)
         for attribute_name, data_type in self.dtypes.items():
+            if attribute_name in self.string_columns:
+                self.__dict__[attribute_name] = self.strings.encode_all(attr_dict.get(attribute_name,
+                                                                                      [None] * self.size))
+                continue
             setattr(
                 self,
                 attribute_name,
@@ -82,8 +255,42 @@ class VectorData():
                 raise MetsiException("Vectorized data is not contiguous")
         return self
 
+    def pack(self):
+        """
+        Copies the columns into a single contiguous block, keeping each column contiguous as a view of the block
+        under its name. Packed columns are pickled and deep copied as one buffer. Columns which are replaced or
+        resized afterwards are no longer part of the block, and the block is then pickled column by column.
+
+        Returns:
+            VectorData: self
+        """
+        layout = []
+        offset = 0
+        for key in self.dtypes:
+            vector: npt.NDArray = self.__dict__[key]
+            if vector.dtype.hasobject:
+                raise MetsiException(f"Column {key} of object dtype can not be packed")
+            offset = -(-offset // BLOCK_ALIGNMENT) * BLOCK_ALIGNMENT
+            layout.append((key, offset, vector.dtype, vector.shape))
+            offset += vector.nbytes
+        block = np.empty(offset, dtype=np.uint8)
+        for key, start, dtype, shape in layout:
+            column = _block_view(block, start, dtype, shape)
+            column[...] = self.__dict__[key]
+            self.__dict__[key] = column
+        self.__dict__.pop('_buffers', None)
+        self._block = block
+        self._layout = tuple(layout)
+        return self
+
+    def is_packed(self) -> bool:
+        """Whether all columns are views of the block created by pack."""
+        block = self.__dict__.get('_block')
+        return block is not None and all(self.__dict__.get(key) is not None and self.__dict__[key].base is block
+                                         for key, _, _, _ in self._layout)
+
     def is_contiguous(self, name: str):
-        arr: npt.NDArray = getattr(self, name)
+        arr: npt.NDArray = self.__dict__[name]
         return bool(arr.flags['CONTIGUOUS']) and bool(arr.flags['C_CONTIGUOUS'])
 
     def set_size(self, attr_dict: dict[str, list[Any]]):
@@ -95,28 +302,8 @@ class VectorData():
 
     def to_default(self, value: Optional[Any], field_type: npt.DTypeLike) -> Any:
         """ Replace None with appropriate defaults based on field type. """
-        int_default = -1
-        str_default = ""
-        float_default = np.nan
-        bool_default = False
-        tuple_default = (np.nan, np.nan, np.nan)
-        object_default = None
-        retval: Any
-
         if value is None:
-            if np.issubdtype(field_type, np.integer):
-                retval = int_default
-            elif np.issubdtype(field_type, np.floating):
-                retval = float_default
-            elif np.issubdtype(field_type, np.str_):
-                retval = str_default
-            elif np.issubdtype(field_type, np.bool_):
-                retval = bool_default
-            elif np.issubdtype(field_type, np.void):
-                retval = tuple_default
-            else:
-                retval = object_default
-            return retval
+            return _default_value(np.dtype(field_type))
         return value
 
     @overload
@@ -139,25 +326,59 @@ class VectorData():
                                                       If not given, values are appended to the ends of the arrays.
                                                       Defaults to None.
         """
-        if isinstance(new, list):
-            for key, dtype in self.dtypes.items():
-                values = [self.to_default(new_item.get(key), dtype) for new_item in new]
-                vector: npt.NDArray = getattr(self, key)
-                if index is not None:
-                    setattr(self, key, np.insert(vector, index, values))  # insert always creates a copy
-                else:
-                    setattr(self, key, np.append(vector, values))  # append always creates a copy
-        else:
-            for key, dtype in self.dtypes.items():
-                value = self.to_default(new.get(key), dtype)
-                vector = getattr(self, key)
-                if index is not None:
-                    setattr(self, key, np.insert(vector, index, value))  # insert always creates a copy
-                else:
-                    setattr(self, key, np.append(vector, value))  # append always creates a copy
+        rows = new if isinstance(new, list) else [new]
+        if len(rows) == 0:
+            return
+        for key, dtype in self.dtypes.items():
+            if key in self.string_columns:
+                values = [self.strings.encode(row.get(key)) for row in rows]
+            else:
+                values = [self.to_default(row.get(key), dtype) for row in rows]
+            self._insert_rows(key, values, index)
 
         self._recompute_size()
 
+    def _insert_rows(self, key: str, values: list[Any], index: int | list[int] | None):
+        vector: npt.NDArray = self.__dict__[key]
+        size = len(vector)
+        count = len(values)
+        buffer = self._owned_buffer(key, vector)
+        if buffer is None or len(buffer) < size + count or _needs_widening(vector, values):
+            buffer = self._grow(key, vector, size + count, values)
+        if index is None:
+            if count == 1:
+                buffer[size] = values[0]
+            else:
+                buffer[size:size + count] = values
+        elif isinstance(index, (int, np.integer)) and count == 1:
+            position = index + size if index < 0 else index
+            buffer[position + 1:size + 1] = buffer[position:size]
+            buffer[position] = values[0]
+        else:
+            buffer[:size + count] = np.insert(buffer[:size], index, values, axis=0)
+        self.__dict__[key] = buffer[:size + count]
+
+    def _grow(self, key: str, vector: npt.NDArray, rows: int, values: list[Any]) -> npt.NDArray:
+        """Allocate a new buffer for the column with spare capacity beyond the given amount of rows, starting with the
+        current rows of the column. String columns are widened to fit the given values, as np.append did."""
+        dtype = vector.dtype
+        if _needs_widening(vector, values):
+            dtype = np.asarray(values, dtype=np.str_).dtype
+        buffer = np.empty((max(rows, len(vector) * 3 // 2 + 4),) + vector.shape[1:], dtype)
+        buffer[:len(vector)] = vector
+        self.__dict__.setdefault('_buffers', {})[key] = buffer
+        return buffer
+
+    def _owned_buffer(self, key: str, vector: npt.NDArray) -> Optional[npt.NDArray]:
+        """The buffer of this object the column is a writable view of, if any."""
+        buffers = self.__dict__.get('_buffers')
+        if buffers is None:
+            return None
+        buffer = buffers.get(key)
+        if buffer is not None and vector.base is buffer and vector.flags.writeable:
+            return buffer
+        return None
+
     def read(self, index: int) -> dict[str, Any]:
         """
         Reads all contained data at given index.
@@ -168,7 +389,12 @@ class VectorData():
         Returns:
             dict[str, Any]: Dictionary with attribute names as keys and vector elements at given index as values
         """
-        return {key: getattr(self, key)[index] for key in self.dtypes}
+        return {key: self.string_value(key, index) if key in self.string_columns else self.__dict__[key][index]
+                for key in self.dtypes}
+
+    def string_value(self, name: str, index: int) -> str:
+        """The value of a string column at given index, without decoding the whole column."""
+        return self.strings.strings[self.__dict__[name][index]]
 
     def update(self, new: dict[str, Any], index: int):
         """
@@ -181,13 +407,13 @@ class VectorData():
         """
         for key, value in new.items():
             if key in self.dtypes:
-                vector: npt.NDArray = getattr(self, key)
+                vector: npt.NDArray = self.__dict__[key]
                 if not vector.flags.writeable:
                     # Vector is read-only, must copy first.
                     vector = vector.copy()
-                    setattr(self, key, vector)
+                    self.__dict__[key] = vector
                     vector.flags.writeable = True
-                vector[index] = value
+                vector[index] = self.strings.encode(value) if key in self.string_columns else value
 
     def delete(self, index: int | list[int]):
         """
@@ -196,38 +422,119 @@ class VectorData():
         Args:
             index (int | list[int]): Index of row to remove
         """
+        keep: Optional[npt.NDArray[np.bool_]] = None
         for key in self.dtypes:
-            vector: npt.NDArray = getattr(self, key)
-            setattr(self, key, np.delete(vector, index, axis=0))  # delete always creates a copy
+            vector: npt.NDArray = self.__dict__[key]
+            size = len(vector)
+            buffer = self._owned_buffer(key, vector)
+            if buffer is None:
+                # the remaining rows are a new array, which becomes the buffer of the column
+                buffer = np.delete(vector, index, axis=0)
+                self.__dict__.setdefault('_buffers', {})[key] = buffer
+                self.__dict__[key] = buffer[:]
+            elif isinstance(index, (int, np.integer)):
+                position = index + size if index < 0 else index
+                if not 0 <= position < size:
+                    raise IndexError(f"index {index} is out of bounds for size {size}")
+                buffer[position:size - 1] = buffer[position + 1:size]
+                self.__dict__[key] = buffer[:size - 1]
+            else:
+                if keep is None or len(keep) != size:
+                    keep = np.ones(size, dtype=np.bool_)
+                    keep[index] = False
+                remaining = vector[keep]
+                buffer[:len(remaining)] = remaining
+                self.__dict__[key] = buffer[:len(remaining)]
 
         self._recompute_size()
 
     def finalize(self):
         """
-        Sets all arrays to read-only and returns a shallow copy of self.
+        Sets all arrays to read-only and returns a shallow copy of self. The buffers of the columns are released, so
+        the columns stay exact-size read-only views which neither self nor the copy modifies in place.
 
         Returns:
             VectorData: Shallow copy of self
         """
         for key in self.dtypes:
             attr: Optional[npt.NDArray]
-            attr = getattr(self, key, None)
+            attr = self.__dict__.get(key)
             if attr is not None:
                 attr.flags.writeable = False
+        if '_block' in self.__dict__:
+            self._block.flags.writeable = False
+        self.__dict__.pop('_buffers', None)
         return copy(self)
 
     def _recompute_size(self) -> None:
         # Find the first present ndarray among declared fields
         for key in self.dtypes:
-            arr = getattr(self, key, None)
+            arr = self.__dict__.get(key)
             if isinstance(arr, np.ndarray):
                 self.size = len(arr)
                 return
         self.size = 0
 
 
+def _block_view(block: npt.NDArray[np.uint8], offset: int, dtype: np.dtype,
+                shape: tuple[int, ...]) -> npt.NDArray:
+    return block[offset:offset + dtype.itemsize * math.prod(shape)].view(dtype).reshape(shape)
+
+
+@cache
+def _default_value(field_type: np.dtype) -> Any:
+    int_default = -1
+    str_default = ""
+    float_default = np.nan
+    bool_default = False
+    tuple_default = (np.nan, np.nan, np.nan)
+    object_default = None
+    retval: Any
+
+    if np.issubdtype(field_type, np.integer):
+        retval = int_default
+    elif np.issubdtype(field_type, np.floating):
+        retval = float_default
+    elif np.issubdtype(field_type, np.str_):
+        retval = str_default
+    elif np.issubdtype(field_type, np.bool_):
+        retval = bool_default
+    elif np.issubdtype(field_type, np.void):
+        retval = tuple_default
+    else:
+        retval = object_default
+    return retval
+
+
+def _needs_widening(vector: npt.NDArray, values: list[Any]) -> bool:
+    if vector.dtype.kind != 'U':
+        return False
+    width = vector.dtype.itemsize // 4
+    return any(len(value) > width for value in values if isinstance(value, str))
+
+
+def concatenate_columns(vectors: list[VectorData],
+                        attributes: list[str]) -> tuple[dict[str, npt.NDArray], npt.NDArray[np.intp]]:
+    """
+    Concatenate the given columns of several VectorData objects of the same type, so that the rows of all of them can
+    be processed with single array operations.
+
+    Args:
+        vectors (list[VectorData]): VectorData objects to concatenate
+        attributes (list[str]): names of the columns to concatenate
+
+    Returns:
+        tuple[dict[str, NDArray], NDArray]: the concatenated columns by name, and the sizes of the given objects in
+        them. Per object results can be split with np.split(result, np.cumsum(sizes)[:-1]).
+    """
+    sizes = np.array([vector.size for vector in vectors], dtype=np.intp)
+    columns = {attribute: np.concatenate([getattr(vector, attribute) for vector in vectors])
+               for attribute in attributes}
+    return columns, sizes
+
+
 class ReferenceTrees(VectorData):
-    identifier: npt.NDArray[np.str_]
+    identifier = StringColumn()
     tree_number: npt.NDArray[np.int32]
     species: npt.NDArray[np.int32]
     breast_height_diameter: npt.NDArray[np.float64]
@@ -243,15 +550,15 @@ class ReferenceTrees(VectorData):
     age_when_10cm_diameter_at_breast_height: npt.NDArray[np.int16]
     stand_origin_relative_position: npt.NDArray[np.float64]
     lowest_living_branch_height: npt.NDArray[np.float64]
-    tree_category: npt.NDArray[np.str_]
+    tree_category = StringColumn()
     storey: npt.NDArray[np.int32]
     sapling: npt.NDArray[np.bool_]
-    tree_type: npt.NDArray[np.str_]
-    tuhon_ilmiasu: npt.NDArray[np.str_]
+    tree_type = StringColumn()
+    tuhon_ilmiasu = StringColumn()
     latvuskerros: npt.NDArray[np.float64]
 
-    def __init__(self):
-        super().__init__(DTYPES_TREE)
+    def __init__(self, strings: Optional[StringTable] = None):
+        super().__init__(DTYPES_TREE, strings)
 
     def as_rst_row(self, i: int) -> list:
         return [
@@ -277,7 +584,7 @@ class ReferenceTrees(VectorData):
     def as_internal_csv_row(self, i) -> list[str]:
         return [
             "tree",
-            str(self.identifier[i]),
+            self.string_value("identifier", i),
             str(self.species[i]),
             str(self.origin[i]),
             str(self.stems_per_ha[i]),
@@ -295,16 +602,16 @@ class ReferenceTrees(VectorData):
             str(self.stand_origin_relative_position[i, 2]),
             str(self.lowest_living_branch_height[i]),
             str(self.management_category[i]),
-            str(self.tree_category[i]),
+            self.string_value("tree_category", i),
             str(self.sapling[i]),
             str(self.storey[i]),
-            str(self.tree_type[i]),
-            str(self.tuhon_ilmiasu[i])
+            self.string_value("tree_type", i),
+            self.string_value("tuhon_ilmiasu", i)
         ]
 
 
 class Strata(VectorData):
-    identifier: npt.NDArray[np.str_]
+    identifier = StringColumn()
     species: npt.NDArray[np.int32]
     mean_diameter: npt.NDArray[np.float64]
     mean_height: npt.NDArray[np.float64]
@@ -325,13 +632,13 @@ class Strata(VectorData):
     sapling_stratum: npt.NDArray[np.bool_]
     number_of_generated_trees: npt.NDArray[np.int32]
 
-    def __init__(self):
-        super().__init__(DTYPES_STRATA)
+    def __init__(self, strings: Optional[StringTable] = None):
+        super().__init__(DTYPES_STRATA, strings)
 
     def as_internal_csv_row(self, i) -> list[str]:
         return [
             "stratum",
-            str(self.identifier[i]),
+            self.string_value("identifier", i),
             str(self.species[i]),
             str(self.origin[i]),
             str(self.stems_per_ha[i]),
@@ -1,5 +1,5 @@
 from typing import Any
-from lukefi.metsi.data.vector_model import ReferenceTrees, Strata
+from lukefi.metsi.data.vector_model import ReferenceTrees, Strata, StringTable
 from lukefi.metsi.app.utils import MetsiException
 from lukefi.metsi.domain.forestry_types import StandList
 
@@ -14,38 +14,43 @@ def vectorize(stands: StandList, **operation_params) -> StandList:
     """
     Modifies a list of ForestStand objects' reference_trees and tree_strata into a struct-of-arrays style.
     The lists of ReferenceTree and TreeStratum are converted into ReferenceTrees and Strata with numpy arrays for
-    each attribute.
+    each attribute. The string attributes of the trees and strata of a stand are encoded with a shared StringTable.
 
     Note that this should be the default representation in the future and the conversion from array-of-structs
     should no longer be necessary.
 
     Args:
         stands (StandList): List of ForestStand objects in standard AoS format
+        packed (bool, optional): Pack the columns of each ReferenceTrees and Strata into a single contiguous block,
+                                 see VectorData.pack. Defaults to False.
 
     Returns:
         StandList: A reference to the same list is returned after the objects are modified in-place
     """
 
     target = operation_params.get('target', None)
+    packed = operation_params.get('packed', False)
     if target is None:
         target = ['reference_trees', 'tree_strata']
     else:
         target = [target]
 
     for stand in stands:
+        strings = StringTable()
         for t in target:
             attr_dict: dict[str, Any] = {}
 
             for data in getattr(stand, t, []):
                 delattr(data, "stand")
-                for k, v in data.__dict__.items():
+                for k, v in data.field_values().items():
                     attr_dict.setdefault(k, []).append(v)
 
             # Overwrite old forestry data
             container_obj = CONTAINERS.get(t)
             if not container_obj:
                 raise MetsiException(f"Unknown target type '{t}'")
-            setattr(stand, f"{t}_soa", container_obj().vectorize(attr_dict))
+            vectors = container_obj(strings).vectorize(attr_dict)
+            setattr(stand, f"{t}_soa", vectors.pack() if packed else vectors)
             delattr(stand, t)
     return stands
 
@@ -1,7 +1,7 @@
 from typing import Optional
 from lukefi.metsi.sim.condition import Condition
 from lukefi.metsi.sim.generators import TreatmentFn
-from lukefi.metsi.sim.simulation_payload import SimulationPayload
+from lukefi.metsi.sim.simulation_payload import OperationHistory, SimulationPayload
 
 
 class MinimumTimeInterval[T](Condition[SimulationPayload[T]]):
@@ -9,8 +9,10 @@ class MinimumTimeInterval[T](Condition[SimulationPayload[T]]):
         super().__init__(lambda t, x: _check_eligible_to_run(t, x, treatment, minimum_time))
 
 
-def _get_operation_last_run[T](operation_history: list[tuple[int, TreatmentFn[T], dict[str, dict]]],
+def _get_operation_last_run[T](operation_history: list[tuple[int, TreatmentFn[T], dict[str, dict]]] | OperationHistory,
                                operation_tag: TreatmentFn[T]) -> Optional[int]:
+    if isinstance(operation_history, OperationHistory):
+        return operation_history.last_run(operation_tag)
     return next((t for t, o, _ in reversed(operation_history) if o == operation_tag), None)
 
 
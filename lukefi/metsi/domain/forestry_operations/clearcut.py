@@ -3,6 +3,7 @@ from lukefi.metsi.domain.forestry_operations.clearcutting_limits import get_clea
 from lukefi.metsi.forestry import forestry_utils as futil
 from lukefi.metsi.domain.collected_types import CrossCuttableTree
 from lukefi.metsi.sim.collected_data import CollectedData, OpTuple
+from lukefi.metsi.sim.failures import BranchFailure, infeasible
 
 
 def _clearcut_with_output(
@@ -30,7 +31,8 @@ def _clearcut_with_output(
     return stand, collected_data
 
 
-def clearcutting(input_: OpTuple[ForestStand], /, **operation_parameters) -> OpTuple[ForestStand]:
+def clearcutting(input_: OpTuple[ForestStand], /,
+                 **operation_parameters) -> OpTuple[ForestStand] | BranchFailure:
     """checks if either stand mean age or stand basal area weighted mean
     diameter is over limits given in separate files.
     If yes, function clearcut is called
@@ -50,5 +52,5 @@ def clearcutting(input_: OpTuple[ForestStand], /, **operation_parameters) -> OpT
         if age_limit_reached or diameter_limit_reached:
             stand, collected_data = _clearcut_with_output(stand, collected_data, 'clearcutting')
             return (stand, collected_data)
-        raise UserWarning("Unable to perform clearcutting")
-    raise UserWarning("Unable to perform clearcutting")
+        return infeasible("Unable to perform clearcutting")
+    return infeasible("Unable to perform clearcutting")
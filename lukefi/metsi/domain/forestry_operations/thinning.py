@@ -6,6 +6,7 @@ from lukefi.metsi.domain.forestry_operations.thinning_limits import (
 from lukefi.metsi.forestry.harvest import thinning
 from lukefi.metsi.forestry import forestry_utils as futil
 from lukefi.metsi.sim.collected_data import CollectedData, OpTuple
+from lukefi.metsi.sim.failures import BranchFailure, infeasible
 
 
 def evaluate_thinning_conditions(predicates):
@@ -44,10 +45,11 @@ def iterative_thinning_with_output(
     return stand, collected_data
 
 
-def first_thinning(input_: OpTuple[ForestStand], /, **operation_parameters) -> OpTuple[ForestStand]:
+def first_thinning(input_: OpTuple[ForestStand], /,
+                   **operation_parameters) -> OpTuple[ForestStand] | BranchFailure:
     stand, collected_data = input_
     if len(stand.reference_trees) == 0:
-        raise UserWarning("Unable to perform first thinning. No trees exist.")
+        return infeasible("Unable to perform first thinning. No trees exist.")
     epsilon = operation_parameters['e']
     hdom_0 = operation_parameters['dominant_height_lower_bound']
     hdom_n = operation_parameters['dominant_height_upper_bound']
@@ -74,13 +76,14 @@ def first_thinning(input_: OpTuple[ForestStand], /, **operation_parameters) -> O
             extra_factor_solver=lambda i, n, c: (1.0 - c) * i / n,
             tag='first_thinning',
         )
-    raise UserWarning("Unable to perform first thinning")
+    return infeasible("Unable to perform first thinning")
 
 
-def thinning_from_above(input_: OpTuple[ForestStand], /, **operation_parameters) -> OpTuple[ForestStand]:
+def thinning_from_above(input_: OpTuple[ForestStand], /,
+                        **operation_parameters) -> OpTuple[ForestStand] | BranchFailure:
     stand, collected_data = input_
     if len(stand.reference_trees) == 0:
-        raise UserWarning("Unable to perform thinning from above. No trees exist.")
+        return infeasible("Unable to perform thinning from above. No trees exist.")
     epsilon = operation_parameters['e']
     thinning_limits = operation_parameters.get('thinning_limits', None)
 
@@ -102,13 +105,14 @@ def thinning_from_above(input_: OpTuple[ForestStand], /, **operation_parameters)
             extra_factor_solver=lambda i, n, c: (1.0 - c) * i / n,
             tag='thinning_from_above',
         )
-    raise UserWarning("Unable to perform thinning from above")
+    return infeasible("Unable to perform thinning from above")
 
 
-def thinning_from_below(input_: OpTuple[ForestStand], /, **operation_parameters) -> OpTuple[ForestStand]:
+def thinning_from_below(input_: OpTuple[ForestStand], /,
+                        **operation_parameters) -> OpTuple[ForestStand] | BranchFailure:
     stand, collected_data = input_
     if len(stand.reference_trees) == 0:
-        raise UserWarning("Unable to perform thinning from below. No trees exist.")
+        return infeasible("Unable to perform thinning from below. No trees exist.")
     epsilon = operation_parameters['e']
     thinning_limits = operation_parameters.get('thinning_limits', None)
 
@@ -130,13 +134,14 @@ def thinning_from_below(input_: OpTuple[ForestStand], /, **operation_parameters)
             extra_factor_solver=lambda i, n, c: (1.0 - c) * i / n,
             tag='thinning_from_below',
         )
-    raise UserWarning("Unable to perform thinning from below")
+    return infeasible("Unable to perform thinning from below")
 
 
-def even_thinning(input_: OpTuple[ForestStand], /, **operation_parameters) -> OpTuple[ForestStand]:
+def even_thinning(input_: OpTuple[ForestStand], /,
+                  **operation_parameters) -> OpTuple[ForestStand] | BranchFailure:
     stand, collected_data = input_
     if len(stand.reference_trees) == 0:
-        raise UserWarning("Unable to perform even thinning. No trees exist.")
+        return infeasible("Unable to perform even thinning. No trees exist.")
     epsilon = operation_parameters['e']
     thinning_limits = operation_parameters.get('thinning_limits', None)
 
@@ -156,7 +161,7 @@ def even_thinning(input_: OpTuple[ForestStand], /, **operation_parameters) -> Op
             extra_factor_solver=lambda i, n, c: 0,
             tag='even_thinning',
         )
-    raise UserWarning("Unable to perform even thinning")
+    return infeasible("Unable to perform even thinning")
 
 
 def report_overall_removal(payload: OpTuple, **operation_parameters) -> OpTuple:
@@ -1,9 +1,13 @@
 from lukefi.metsi.app.utils import MetsiException
-from lukefi.metsi.forestry.naturalprocess.grow_acta import grow_diameter_and_height, grow_diameter_and_height_vectorized
+from lukefi.metsi.forestry.naturalprocess.grow_acta import grow_diameter_and_height, \
+    grow_diameter_and_height_vectorized, grow_diameter_and_height_vectorized_batch
+from lukefi.metsi.data.layered_model import PossiblyLayered
 from lukefi.metsi.data.model import ForestStand, ReferenceTree
+from lukefi.metsi.data.vector_model import ReferenceTrees
 
 from lukefi.metsi.domain.natural_processes.util import update_stand_growth, update_stand_growth_vectorized
 from lukefi.metsi.sim.collected_data import OpTuple
+from lukefi.metsi.sim.operations import with_batch_entrypoint
 
 
 def split_sapling_trees(trees: list[ReferenceTree]) -> tuple[list[ReferenceTree], list[ReferenceTree]]:
@@ -27,7 +31,23 @@ def grow_acta(input_: OpTuple[ForestStand], /, **operation_parameters) -> OpTupl
     return stand, input_[1]
 
 
-
+def grow_acta_vectorized_batch(inputs: list[OpTuple[ForestStand]], /,
+                               **operation_parameters) -> list[OpTuple[ForestStand]]:
+    """Batch entry point of grow_acta_vectorized, growing the trees of all given stands with a single model call."""
+    step = operation_parameters.get('step', 5)
+    growing: list[tuple[PossiblyLayered[ForestStand], ReferenceTrees]] = []
+    for stand, _ in inputs:
+        if stand.reference_trees_soa is None:
+            raise MetsiException("Reference trees not vectorized")
+        if stand.reference_trees_soa.size > 0:
+            growing.append((stand, stand.reference_trees_soa))
+    growth = grow_diameter_and_height_vectorized_batch([trees for _, trees in growing], step)
+    for (stand, trees), (diameters, heights) in zip(growing, growth):
+        update_stand_growth_vectorized(stand, diameters, heights, trees.stems_per_ha, step)
+    return inputs
+
+
+@with_batch_entrypoint(grow_acta_vectorized_batch)
 def grow_acta_vectorized(input_: OpTuple[ForestStand], /, **operation_parameters) -> OpTuple[ForestStand]:
     step = operation_parameters.get('step', 5)
     stand, collected_data = input_
@@ -1,6 +1,6 @@
 import traceback
 from typing import Any
-from lukefi.metsi.data.model import ReferenceTree
+from lukefi.metsi.data.model import ReferenceTree, TreeStratum
 from lukefi.metsi.data.enums.internal import LandUseCategory
 from lukefi.metsi.domain.forestry_types import StandList
 from lukefi.metsi.domain.utils.filter import applyfilter
@@ -85,6 +85,8 @@ def generate_reference_trees(stands: StandList, **operation_params) -> StandList
     debug_tree_rows = []
     stratum_association_diameter_threshold = operation_params.get('stratum_association_diameter_threshold', 2.5)
     for i, stand in enumerate(stands):
+        # measured trees of the stand by their matching stratum, the source trees of the lm_trees strategy
+        trees_by_stratum: dict[TreeStratum, list[ReferenceTree]] = {}
         print(f"\rGenerating trees for stand {stand.identifier}    {i}/{len(stands)}", end="")
         stand_trees = sorted(stand.reference_trees, key=lambda tree: tree.identifier if
                              tree.identifier is not None else "")
@@ -93,10 +95,7 @@ def generate_reference_trees(stands: StandList, **operation_params) -> StandList
                 tree, stand.tree_strata, stratum_association_diameter_threshold)
             if stratum is None:
                 continue
-            if stratum.__dict__.get('_trees') is not None:
-                getattr(stratum, "_trees").append(tree)
-            else:
-                setattr(stratum, "_trees", [tree])
+            trees_by_stratum.setdefault(stratum, []).append(tree)
             if debug:
                 debug_tree_rows.append([
                     stratum.identifier,
@@ -109,7 +108,8 @@ def generate_reference_trees(stands: StandList, **operation_params) -> StandList
         for stratum in stand.tree_strata:
             stratum_trees: list[ReferenceTree] = []
             try:
-                stratum_trees = tree_generation.reference_trees_from_tree_stratum(stratum, **operation_params)
+                stratum_trees = tree_generation.reference_trees_from_tree_stratum(
+                    stratum, **operation_params, source_trees=trees_by_stratum.get(stratum, []))
             except Exception as e:
                 print(
                     f"\nError generating trees for stratum {stratum.identifier} with diameter {stratum.mean_diameter}, "
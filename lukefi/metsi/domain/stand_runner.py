@@ -1,41 +1,62 @@
+from collections.abc import Iterator
+from functools import partial
 from lukefi.metsi.app.console_logging import print_logline
+from lukefi.metsi.app.utils import SimulationAborted
 from lukefi.metsi.data.layered_model import LayeredObject, PossiblyLayered
 from lukefi.metsi.data.model import ForestStand, ReferenceTree, TreeStratum
 from lukefi.metsi.domain.forestry_types import ForestOpPayload, StandList
 from lukefi.metsi.sim.collected_data import CollectedData
-from lukefi.metsi.sim.runners import Evaluator, TreeRunner
+from lukefi.metsi.sim.runners import Evaluator, TreeRunner, run_in_blocks
 from lukefi.metsi.sim.sim_configuration import SimConfiguration
+from lukefi.metsi.sim.simulation_payload import OperationHistory
 
 
 def run_stands(stands: StandList,
                config: SimConfiguration[ForestStand],
                formation_strategy: TreeRunner[ForestStand],
-               evaluation_strategy: Evaluator[ForestStand]) -> dict[str, list[ForestOpPayload]]:
+               evaluation_strategy: Evaluator[ForestStand],
+               offset: int = 0) -> dict[str, list[ForestOpPayload]]:
     """Run the simulation for all given stands, from the given declaration, using the given runner. Return the
     results organized into a dict keyed with stand identifiers."""
+    return dict(stream_stands(stands, config, formation_strategy, evaluation_strategy, offset))
 
-    retval: dict[str, list[ForestOpPayload]] = {}
-    for stand in stands:
-        overlaid_stand: PossiblyLayered[ForestStand]
-        if stand.reference_trees_soa is None or stand.tree_strata_soa is None:
-            # If the state is not vectorized, wrap it as a LayeredObject so that new nodes in the EventTree don't have
-            # to copy the entire state in memory and can just store the data that has actually changed instead.
-            # This is not necessary for vectorized data since similar functionality is provided by the finalize method.
-            overlaid_stand = LayeredObject[ForestStand](stand)
-            overlaid_stand.reference_trees = [LayeredObject[ReferenceTree]
-                                              (tree) for tree in overlaid_stand.reference_trees]
-            overlaid_stand.tree_strata = [LayeredObject[TreeStratum](stratum) for stratum in overlaid_stand.tree_strata]
-        else:
-            overlaid_stand = stand
 
-        payload = ForestOpPayload(
-            computational_unit=overlaid_stand,
-            collected_data=CollectedData(initial_time_point=config.time_points[0]),
-            operation_history=[],
-        )
-
-        schedule_payloads = formation_strategy(payload, config, evaluation_strategy)
+def stream_stands(stands: StandList,
+                  config: SimConfiguration[ForestStand],
+                  formation_strategy: TreeRunner[ForestStand],
+                  evaluation_strategy: Evaluator[ForestStand],
+                  offset: int = 0) -> Iterator[tuple[str, list[ForestOpPayload]]]:
+    """Run the simulation for all given stands, from the given declaration, using the given runner. Yield the
+    results of each stand paired with the stand identifier as soon as the stand is finished. With config.block_size,
+    the stands are simulated in blocks, see run_in_blocks. Stands whose simulation is aborted are left out of the
+    results. The offset of the stands in all stands of the run is not needed, as the results are keyed with the stand
+    identifiers."""
+    _ = offset
+    blocks = run_in_blocks(stands, config, formation_strategy, evaluation_strategy, partial(_initial_payload, config))
+    for stand, schedule_payloads in zip(stands, blocks):
         identifier = stand.identifier
+        if isinstance(schedule_payloads, SimulationAborted):
+            print_logline(f"Simulation of stand {identifier} aborted: {schedule_payloads}")
+            continue
         print_logline(f"Alternatives for stand {identifier}: {len(schedule_payloads)}")
-        retval[identifier] = schedule_payloads
-    return retval
+        yield identifier, schedule_payloads
+
+
+def _initial_payload(config: SimConfiguration[ForestStand], stand: ForestStand) -> ForestOpPayload:
+    overlaid_stand: PossiblyLayered[ForestStand]
+    if stand.reference_trees_soa is None or stand.tree_strata_soa is None:
+        # If the state is not vectorized, wrap it as a LayeredObject so that new nodes in the EventTree don't have
+        # to copy the entire state in memory and can just store the data that has actually changed instead.
+        # This is not necessary for vectorized data since similar functionality is provided by the finalize method.
+        overlaid_stand = LayeredObject[ForestStand](stand)
+        overlaid_stand.reference_trees = [LayeredObject[ReferenceTree]
+                                          (tree) for tree in overlaid_stand.reference_trees]
+        overlaid_stand.tree_strata = [LayeredObject[TreeStratum](stratum) for stratum in overlaid_stand.tree_strata]
+    else:
+        overlaid_stand = stand
+
+    return ForestOpPayload(
+        computational_unit=overlaid_stand,
+        collected_data=CollectedData(initial_time_point=config.time_points[0]),
+        operation_history=OperationHistory(),
+    )
@@ -6,6 +6,7 @@ from typing import Any, Optional
 from collections.abc import Iterator, Callable
 import numpy as np
 from lukefi.metsi.app.utils import MetsiException
+from lukefi.metsi.sim.collected_data import AppendOnlyList
 
 GetVarFn = Callable[[str], Any]
 """A function that returns the value of a global variable given its name."""
@@ -126,7 +127,7 @@ def autocollective(x: Any, **list_filters) -> Any:
     :list_filters: define key-value pairs where the key is the filtered attribute,
         and the value is a list of values that correspond the accepted value of that attribute.
     """
-    if isinstance(x, list):
+    if isinstance(x, (list, AppendOnlyList)):
         if list_filters:
             for key, values in list_filters.items():
                 x = [item for item in x if getattr(item, key) in values]
@@ -139,6 +140,31 @@ def _collector_wrapper(operation_parameters, *aliases, **named_aliases) -> dict[
     return collect_all(operation_parameters, getvar=getvar)
 
 
+def collective_objective(expr: str) -> Callable[[Any], float]:
+    """Compile a collective expression `expr` into an objective function for simulation payloads. The expression is
+    evaluated with the same variables as in `report_collectives`. Payloads for which the expression refers to variables,
+    keys or attributes not present (yet) get the lowest possible value.
+
+    :param expr: A python expression that evaluates to a single number.
+    :return: A function that evaluates the expression for a simulation payload."""
+    collector = compile_collector(expr)
+
+    def objective(payload: Any) -> float:
+        state, collected_data = payload.computational_unit, payload.collected_data
+        getvar = cache(getvarfn(
+            lambda name: autocollective(getattr(state, name)),
+            lambda name: autocollective(collected_data.operation_results[name]),
+            state=state,
+            collected_data=collected_data.operation_results,
+            time=collected_data.current_time_point
+        ))
+        try:
+            return float(collector(getvar))
+        except (NameError, KeyError, AttributeError):
+            return float("-inf")
+    return objective
+
+
 def property_collector(objects: list[object], properties: list[str]) -> list[list]:
     result_rows = []
     for o in objects:
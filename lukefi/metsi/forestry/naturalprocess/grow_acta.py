@@ -5,7 +5,7 @@ import numpy as np
 import numpy.typing as npt
 
 from lukefi.metsi.data.model import ReferenceTree, TreeSpecies
-from lukefi.metsi.data.vector_model import ReferenceTrees
+from lukefi.metsi.data.vector_model import ReferenceTrees, concatenate_columns
 
 
 def yearly_diameter_growth_by_species(
@@ -153,3 +153,70 @@ def grow_diameter_and_height_vectorized(trees: ReferenceTrees,
         hs[hs < 1.3] += 0.3
         ds[(ds == 0) & (hs >= 1.3)] = 1.0
     return ds, hs
+
+
+def grow_diameter_and_height_vectorized_batch(trees_list: list[ReferenceTrees],
+                                              step: int = 5) -> list[tuple[npt.NDArray[np.float64],
+                                                                           npt.NDArray[np.float64]]]:
+    """
+    grow_diameter_and_height_vectorized for the trees of several stands at once. The trees are concatenated and the
+    stand level aggregates are computed per stand with segmented reductions, so that the growth models are evaluated
+    with a single call for the trees of all stands.
+    """
+    if not trees_list:
+        return []
+    stand_count = len(trees_list)
+    columns, sizes = concatenate_columns(
+        trees_list, ["species", "biological_age", "stems_per_ha", "breast_height_diameter", "height"])
+    offsets = np.cumsum(sizes)[:-1]
+    starts = np.concatenate(([0], offsets))
+    segments = np.repeat(np.arange(stand_count), sizes)
+
+    species = columns["species"]
+    ages = columns["biological_age"]
+    stems = columns["stems_per_ha"]
+    ds = columns["breast_height_diameter"].astype(np.float64)
+    hs = columns["height"].astype(np.float64)
+
+    species_codes, species_index = np.unique(species, return_inverse=True)
+    groups = segments * len(species_codes) + species_index
+    group_count = stand_count * len(species_codes)
+
+    for s in range(step):
+        big = hs >= 1.3
+        if big.any():
+            hdom = np.full(stand_count, np.nan)
+            for i in np.flatnonzero(np.bincount(segments, weights=big, minlength=stand_count)):
+                stand_hs = hs[starts[i]:starts[i] + sizes[i]]
+                hdom[i] = np.median(stand_hs[stand_hs >= 1.3])
+            gs = stems * np.pi * (0.01 * 0.5 * ds)**2
+            g = np.bincount(segments, weights=gs, minlength=stand_count)
+            # species absent from a stand make empty groups, which are never indexed below
+            with np.errstate(divide='ignore', invalid='ignore'):
+                gg = np.bincount(groups, weights=gs, minlength=group_count)
+                ag = np.bincount(groups, weights=(ages + s) * gs, minlength=group_count) / gg
+                dg = np.bincount(groups, weights=ds * gs, minlength=group_count) / gg
+                hg = np.bincount(groups, weights=hs * gs, minlength=group_count) / gg
+
+            tree_groups = groups[big]
+            tree_segments = segments[big]
+            pd = yearly_diameter_growth_by_species_vectorized(species[big],
+                                                              ds[big],
+                                                              hs[big],
+                                                              ag[tree_groups],
+                                                              dg[tree_groups],
+                                                              hg[tree_groups],
+                                                              hdom[tree_segments],
+                                                              g[tree_segments]) / 100
+            ph = yearly_height_growth_by_species_vectorized(species[big],
+                                                            ds[big],
+                                                            hs[big],
+                                                            ag[tree_groups],
+                                                            dg[tree_groups],
+                                                            hg[tree_groups],
+                                                            g[tree_segments]) / 100
+            ds[big] *= (1 + pd)
+            hs[big] *= (1 + ph)
+        hs[hs < 1.3] += 0.3
+        ds[(ds == 0) & (hs >= 1.3)] = 1.0
+    return list(zip(np.split(ds, offsets), np.split(hs, offsets)))
@@ -103,6 +103,7 @@ def reference_trees_from_tree_stratum(stratum: TreeStratum, **params) -> list[Re
     All other cases are skipped.
 
     :param stratum: Single stratum instance.
+    :param source_trees: measured reference trees matching the stratum, used by the lm_trees strategy.
     :return: list of reference trees derived from given stratum.
     """
     strategy = solve_tree_generation_strategy(stratum, params.get('method', 'weibull'))
@@ -39,7 +39,7 @@ def tree_generation_lm(
         'Nos': robjects.FloatVector([stratum.stems_per_ha])
     }
 
-    source_trees = stratum.__dict__.get('_trees', [])
+    source_trees = params.get('source_trees', [])
 
     tree_data = {
         'lpm': robjects.FloatVector([tree.breast_height_diameter or robjects.NA_Real for tree in source_trees]),
@@ -1,10 +1,113 @@
 from collections import OrderedDict
-from copy import deepcopy
-from typing import Any, Optional, TypeVar
+from collections.abc import Iterable, Iterator, Sequence
+from copy import copy, deepcopy
+from typing import Any, Optional, Self, TypeVar, overload
 
 from lukefi.metsi.data.layered_model import PossiblyLayered
 
 
+class _Chunk:
+    """Immutable run of list result items, linked to the chunk of the items preceding it."""
+
+    __slots__ = ('previous', 'items', 'length')
+
+    previous: Optional["_Chunk"]
+    items: tuple
+    length: int
+
+    def __init__(self, previous: Optional["_Chunk"], items: tuple):
+        self.previous = previous
+        self.items = items
+        self.length = len(items) + (previous.length if previous is not None else 0)
+
+
+class AppendOnlyList[V](Sequence[V]):
+    """
+    List result container sharing its items with its copies. The items are kept in a linked sequence of immutable
+    chunks, followed by a list of items appended since the last copy. Copying moves the appended items into a new
+    chunk shared by both the original and the copy, so that the cost of copying does not depend on the amount of items
+    and copies only allocate for the items appended to them.
+
+    Pickles as a plain list.
+    """
+
+    __slots__ = ('_chunks', '_tail')
+
+    _chunks: Optional[_Chunk]
+    _tail: list[V]
+
+    def __init__(self, items: Iterable[V] = ()):
+        self._chunks = None
+        self._tail = list(items)
+
+    def append(self, item: V):
+        self._tail.append(item)
+
+    def extend(self, items: Iterable[V]):
+        self._tail.extend(items)
+
+    def __copy__(self) -> Self:
+        copied = type(self)()
+        copied._chunks = self._shared_chunks()
+        return copied
+
+    def _shared_chunks(self) -> Optional[_Chunk]:
+        """Move the items appended since the last copy into a new chunk, and return the chunks to share with a copy."""
+        if self._tail:
+            self._chunks = _Chunk(self._chunks, tuple(self._tail))
+            self._tail = []
+        return self._chunks
+
+    def __len__(self) -> int:
+        return (self._chunks.length if self._chunks is not None else 0) + len(self._tail)
+
+    def __iter__(self) -> Iterator[V]:
+        chunks: list[tuple] = []
+        chunk = self._chunks
+        while chunk is not None:
+            chunks.append(chunk.items)
+            chunk = chunk.previous
+        for items in reversed(chunks):
+            yield from items
+        yield from self._tail
+
+    @overload
+    def __getitem__(self, index: int) -> V:
+        ...
+
+    @overload
+    def __getitem__(self, index: slice) -> list[V]:
+        ...
+
+    def __getitem__(self, index: int | slice) -> V | list[V]:
+        if isinstance(index, slice):
+            return list(self)[index]
+        offset = len(self) - len(self._tail)
+        if index < 0:
+            index += offset + len(self._tail)
+        if index >= offset:
+            return self._tail[index - offset]
+        # walk the chunks backwards from the most recent one, as the latest items are the most commonly accessed
+        chunk = self._chunks
+        while chunk is not None and index >= 0:
+            start = chunk.length - len(chunk.items)
+            if index >= start:
+                return chunk.items[index - start]
+            chunk = chunk.previous
+        raise IndexError("AppendOnlyList index out of range")
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, (list, AppendOnlyList)):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return repr(list(self))
+
+    def __reduce__(self):
+        return list, (list(self),)
+
+
 class CollectedData:
 
     def __init__(
@@ -16,24 +119,38 @@ class CollectedData:
         self.operation_results: dict[str, Any] = treatment_results or {}
         self.current_time_point: int = current_time_point or initial_time_point or 0
         self.initial_time_point: int = initial_time_point or 0
+        # tags of dict results shared with copies of this object, to be copied before modifying
+        self._shared_tags: set[str] = set()
 
-    def _copy_op_results(self, value: Any) -> dict | list:
+    def _copy_op_results(self, tag: str, value: Any) -> Any:
         """
-        optimises the deepcopy of self by shallow copying dict and list type operation_results.
+        optimises the deepcopy of self by sharing dict and list type operation_results with the copy. List results are
+        shared through AppendOnlyList chunks and dict results are copied on the first store after copying.
         This relies on the assumption that an operation result is not modified after it's stored.
         """
         if isinstance(value, dict):
-            return OrderedDict(value.items())
+            self._shared_tags.add(tag)
+            return value
         if isinstance(value, list):
-            return list(value)
+            value = AppendOnlyList(value)
+            self.operation_results[tag] = value
+        if isinstance(value, AppendOnlyList):
+            return copy(value)
         return deepcopy(value)
 
     def __copy__(self) -> "CollectedData":
-        return CollectedData(
-            treatment_results={k: self._copy_op_results(v) for k, v in self.operation_results.items()},
+        copied = CollectedData(
+            treatment_results={k: self._copy_op_results(k, v) for k, v in self.operation_results.items()},
             current_time_point=self.current_time_point,
             initial_time_point=self.initial_time_point
         )
+        copied._shared_tags = {k for k, v in copied.operation_results.items() if isinstance(v, dict)}
+        return copied
+
+    def __deepcopy__(self, memo: dict) -> "CollectedData":
+        # stored operation results are not modified, so they are shared as in a shallow copy
+        _ = memo
+        return self.__copy__()
 
     def prev(self, tag: str) -> Any:
         try:
@@ -49,18 +166,32 @@ class CollectedData:
             return self.operation_results[tag]
 
     def store(self, tag: str, collected_data: Any):
+        if tag in self._shared_tags:
+            self.operation_results[tag] = OrderedDict(self.operation_results[tag].items())
+            self._shared_tags.discard(tag)
         self.get(tag)[self.current_time_point] = collected_data
 
-    def get_list_result(self, tag: str) -> list[Any]:
+    def get_list_result(self, tag: str) -> list[Any] | AppendOnlyList[Any]:
         try:
             return self.operation_results[tag]
         except KeyError:
-            self.operation_results[tag] = []
+            self.operation_results[tag] = AppendOnlyList()
             return self.operation_results[tag]
 
     def extend_list_result(self, tag: str, collected_data: list[Any]):
         self.get_list_result(tag).extend(collected_data)
 
+    def __getstate__(self) -> dict[str, Any]:
+        # serialized with plain list results
+        state = {k: v for k, v in self.__dict__.items() if k != "_shared_tags"}
+        state["operation_results"] = {k: list(v) if isinstance(v, AppendOnlyList) else v
+                                      for k, v in self.operation_results.items()}
+        return state
+
+    def __setstate__(self, state: dict[str, Any]):
+        self.__dict__.update(state)
+        self._shared_tags = set()
+
 
 T = TypeVar("T")
 OpTuple = tuple[PossiblyLayered[T], CollectedData]
@@ -0,0 +1,156 @@
+from typing import Any, Optional
+
+from lukefi.metsi.sim.event_tree import EventTree
+from lukefi.metsi.sim.sim_configuration import SimConfiguration
+
+
+def event_tree_leaves[T](root: EventTree[T]) -> int:
+    """Count the leaf nodes of the given EventTree, which is the amount of operation chains it represents."""
+    leaves = 0
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        if len(node.branches) == 0:
+            leaves += 1
+        stack.extend(node.branches)
+    return leaves
+
+
+def static_alternatives[T](config: SimConfiguration[T], beam_width: Optional[int] = None) -> int:
+    """
+    Upper bound of the amount of alternatives a computational unit can produce with the given simulation
+    configuration, assuming that no event is aborted by its conditions. The alternatives of each time point multiply
+    the alternatives of the preceding time points, unless a beam search keeps at most beam_width of them.
+
+    :param config: a prepared SimConfiguration object
+    :param beam_width: the beam width of a beam search formation strategy, if used
+    :return: the amount of alternatives
+    """
+    alternatives = 1
+    for root in config.partial_event_trees_by_time_point().values():
+        alternatives *= event_tree_leaves(root)
+        if beam_width is not None:
+            alternatives = min(alternatives, beam_width)
+    return alternatives
+
+
+class CostEstimate:
+    """Expected cost of simulating a computational unit. The cost is measured in units of size times alternatives,
+    which the time and memory estimates scale."""
+
+    __slots__ = ('identifier', 'size', 'alternatives', 'cost', 'seconds', 'memory_bytes')
+
+    identifier: str
+    size: int
+    alternatives: float
+    cost: float
+    seconds: Optional[float]
+    memory_bytes: int
+
+    def __init__(self, identifier: str, size: int, alternatives: float, seconds_per_cost: Optional[float],
+                 state_bytes: int):
+        self.identifier = identifier
+        self.size = size
+        self.alternatives = alternatives
+        self.cost = max(size, 1) * alternatives
+        self.seconds = None if seconds_per_cost is None else self.cost * seconds_per_cost
+        self.memory_bytes = int(state_bytes * alternatives)
+
+
+class CostModel:
+    """
+    Estimates the cost of simulating computational units, combining the static amount of alternatives of the simulation
+    configuration with statistics recorded from previous runs: the alternatives actually produced by each unit, the
+    share of the static alternatives produced by all recorded units, and the CPU time per unit of cost. The shares and
+    times are accumulated over all recorded runs.
+
+    The statistics are a JSON serializable dict, see statistics.
+    """
+
+    static_alternatives: int
+    observed_alternatives: dict[str, int]
+    produced_alternatives: int
+    possible_alternatives: int
+    seconds: float
+    simulated_cost: float
+
+    def __init__(self, alternatives: int, statistics: Optional[dict[str, Any]] = None):
+        """
+        :param alternatives: the static amount of alternatives of the simulation, see static_alternatives
+        :param statistics: statistics recorded from previous runs, if any
+        """
+        statistics = statistics or {}
+        self.static_alternatives = alternatives
+        self.observed_alternatives = dict(statistics.get("alternatives", {}))
+        self.produced_alternatives = statistics.get("produced_alternatives", 0)
+        self.possible_alternatives = statistics.get("possible_alternatives", 0)
+        self.seconds = statistics.get("seconds", 0.0)
+        self.simulated_cost = statistics.get("simulated_cost", 0.0)
+
+    @property
+    def survival(self) -> Optional[float]:
+        """Share of the static alternatives produced by the recorded units, or None if none have been recorded."""
+        if self.possible_alternatives == 0:
+            return None
+        return self.produced_alternatives / self.possible_alternatives
+
+    @property
+    def seconds_per_cost(self) -> Optional[float]:
+        """CPU time per unit of cost of the recorded units, or None if no times have been recorded."""
+        if self.simulated_cost == 0:
+            return None
+        return self.seconds / self.simulated_cost
+
+    def expected_alternatives(self, identifier: str) -> float:
+        observed = self.observed_alternatives.get(identifier)
+        if observed is not None:
+            return observed
+        survival = self.survival
+        if survival is not None:
+            return max(1.0, self.static_alternatives * survival)
+        return self.static_alternatives
+
+    def estimate(self, identifier: str, size: int, state_bytes: int) -> CostEstimate:
+        """
+        Estimate the cost of simulating a computational unit.
+
+        :param identifier: identifier of the unit, for finding its statistics from previous runs
+        :param size: size of the unit, such as its amount of reference trees
+        :param state_bytes: memory taken by a single state of the unit
+        :return: a CostEstimate
+        """
+        return CostEstimate(identifier, size, self.expected_alternatives(identifier), self.seconds_per_cost,
+                            state_bytes)
+
+    def record(self, estimates: list[CostEstimate], alternatives: dict[str, int], seconds: Optional[float] = None):
+        """
+        Add the results of a run to the statistics.
+
+        :param estimates: the estimates of the simulated units
+        :param alternatives: amount of alternatives produced by each simulated unit
+        :param seconds: CPU time of the run, including the time of worker processes, if measured
+        """
+        self.observed_alternatives.update(alternatives)
+        if self.static_alternatives > 0:
+            self.produced_alternatives += sum(alternatives.values())
+            self.possible_alternatives += len(alternatives) * self.static_alternatives
+        total_cost = sum(max(estimate.size, 1) * alternatives.get(estimate.identifier, 0) for estimate in estimates)
+        if seconds is not None and total_cost > 0:
+            self.seconds += seconds
+            self.simulated_cost += total_cost
+
+    def statistics(self) -> dict[str, Any]:
+        return {
+            "alternatives": self.observed_alternatives,
+            "produced_alternatives": self.produced_alternatives,
+            "possible_alternatives": self.possible_alternatives,
+            "seconds": self.seconds,
+            "simulated_cost": self.simulated_cost,
+            "survival": self.survival,
+            "seconds_per_cost": self.seconds_per_cost
+        }
+
+
+def longest_first(estimates: list[CostEstimate]) -> list[int]:
+    """Indices of the given estimates in descending order of cost, keeping the original order of equal costs."""
+    return sorted(range(len(estimates)), key=lambda i: -estimates[i].cost)
@@ -1,11 +1,13 @@
 from typing import Optional
-from copy import copy, deepcopy
+from copy import copy
 
 from lukefi.metsi.app.utils import ConditionFailed
 from lukefi.metsi.data.layered_model import PossiblyLayered
+from lukefi.metsi.sim.failures import TREATMENT, BranchFailure, failed_by_raising
 from lukefi.metsi.sim.finalizable import Finalizable
+from lukefi.metsi.sim.processor import FusedTreatment, PreparedTreatment, probe_preconditions
 from lukefi.metsi.sim.simulation_payload import SimulationPayload, ProcessedTreatment
-from lukefi.metsi.sim.state_tree import StateTree
+from lukefi.metsi.sim.state_tree import StateTree, capture_state
 
 
 def identity[T](x: T) -> T:
@@ -44,28 +46,61 @@ class EventTree[T]:
 
     def evaluate(self,
                  payload: SimulationPayload[T],
-                 state_tree: Optional[StateTree[PossiblyLayered[T]]] = None) -> list[SimulationPayload[T]]:
+                 state_tree: Optional[StateTree[PossiblyLayered[T]]] = None,
+                 treatment: Optional[ProcessedTreatment[T]] = None,
+                 parent_state: Optional[PossiblyLayered[T]] = None) -> list[SimulationPayload[T]]:
         """
         Recursive pre-order walkthrough of this event tree to evaluate its treatments with the given payload,
-        copying it for branching. If given a root node, a StateTree is also constructed, containing all complete
-        intermediate states in the simulation.
+        copying it for branching. The preconditions of each branch are probed before copying, so that the payload is
+        copied only for the branches that run. If given a root node, a StateTree is also constructed, containing all
+        intermediate states in the simulation. The states are captured with capture_state, storing only the changes
+        relative to the state of the parent node.
 
         :param payload: the simulation data payload (we don't care what it is here)
         :param state_tree: optional state tree node
+        :param treatment: optional replacement of processed_treatment for this node, see probe_preconditions
+        :param parent_state: the state of the parent state tree node, if any
         :return: list of result payloads from this EventTree or as concatenated from its branches
+        :raises ConditionFailed: if a run condition of this node fails, see BranchFailure.exception
+        :raises UserWarning: if the treatment of this node cannot be performed or all of its branches fail
         """
-        current = self.processed_treatment(payload)
+        result = self.try_evaluate(payload, state_tree, treatment, parent_state)
+        if isinstance(result, BranchFailure):
+            raise result.exception()
+        return result
+
+    def try_evaluate(self,
+                     payload: SimulationPayload[T],
+                     state_tree: Optional[StateTree[PossiblyLayered[T]]],
+                     treatment: Optional[ProcessedTreatment[T]],
+                     parent_state: Optional[PossiblyLayered[T]]) -> list[SimulationPayload[T]] | BranchFailure:
+        """As evaluate, but returning the failure of the node instead of raising it. Failing branches are skipped."""
+        if state_tree is not None and isinstance(self.processed_treatment, FusedTreatment):
+            # the recorded states are the same as without fusing, with a state for each treatment of the run
+            first = self.processed_treatment.treatments[0]
+            return _unfused_run(self.processed_treatment, self.branches).try_evaluate(
+                payload, state_tree, first.process_unchecked if treatment is not None else None, parent_state)
+        processed_treatment = treatment or self.processed_treatment
+        try:
+            current = processed_treatment(payload)
+        except (ConditionFailed, UserWarning) as e:
+            # treatments other than PreparedTreatments signal failures by raising
+            return failed_by_raising(processed_treatment, e)
+        if isinstance(current, BranchFailure):
+            return current
         branching_state: StateTree | None = None
 
+        if isinstance(current.computational_unit, Finalizable):
+            current.computational_unit.finalize()
+
         if state_tree is not None:
-            state_tree.state = deepcopy(current.computational_unit)
+            # captured after finalizing, so that read-only vectors can be shared with the state of the parent node
+            state_tree.state = capture_state(current.computational_unit, parent_state)
             state_tree.done_treatment = current.operation_history[-1][1] if len(current.operation_history) > 0 else None
             state_tree.time_point = current.operation_history[-1][0] if len(current.operation_history) > 0 else None
             state_tree.treatment_params = current.operation_history[-1][2] if len(
                 current.operation_history) > 0 else None
-
-        if isinstance(current.computational_unit, Finalizable):
-            current.computational_unit.finalize()
+            parent_state = state_tree.state
 
         if len(self.branches) == 0:
             return [current]
@@ -74,24 +109,62 @@ class EventTree[T]:
             if state_tree is not None:
                 branching_state = StateTree()
                 state_tree.add_branch(branching_state)
-            return self.branches[0].evaluate(current, branching_state)
+            return self.branches[0].try_evaluate(current, branching_state, None, parent_state)
 
         results: list[SimulationPayload[T]] = []
         for branch in self.branches:
-            try:
-                if state_tree is not None:
-                    branching_state = StateTree()
-                evaluated_branch = branch.evaluate(copy(current), branching_state)
-                results.extend(evaluated_branch)
-                if state_tree is not None and branching_state is not None:
-                    state_tree.add_branch(branching_state)
-            except (ConditionFailed, UserWarning):
-                ...
+            branch_treatment = probe_preconditions(branch.processed_treatment, current)
+            if branch_treatment is None:
+                continue
+            if state_tree is not None:
+                branching_state = StateTree()
+            evaluated_branch = branch.try_evaluate(copy(current), branching_state, branch_treatment, parent_state)
+            if isinstance(evaluated_branch, BranchFailure):
+                continue
+            results.extend(evaluated_branch)
+            if state_tree is not None and branching_state is not None:
+                state_tree.add_branch(branching_state)
 
         if len(results) == 0:
-            raise UserWarning("Branch aborted with all children failing")
+            return BranchFailure(TREATMENT, reason="Branch aborted with all children failing")
 
         return results
 
     def add_branch(self, et: 'EventTree[T]'):
         self.branches.append(et)
+
+
+def fuse_linear_runs[T](root: EventTree[T]) -> EventTree[T]:
+    """
+    Fuse each maximal linear run of prepared treatments in the given EventTree, where every node but the last has a
+    single branch, into a single node processing the run as a FusedTreatment. This spares the node recursion and the
+    intermediate payloads of events that do not branch. The tree is modified in place.
+
+    Evaluating a fused tree with a StateTree unfolds the fused runs, so that the recorded states are the same as
+    without fusing.
+
+    :param root: the root node of an EventTree
+    :return: the same root node
+    """
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        if isinstance(node.processed_treatment, PreparedTreatment) and len(node.branches) == 1 \
+                and isinstance(node.branches[0].processed_treatment, PreparedTreatment):
+            treatments = [node.processed_treatment]
+            while len(node.branches) == 1 and isinstance(node.branches[0].processed_treatment, PreparedTreatment):
+                treatments.append(node.branches[0].processed_treatment)
+                node.branches = node.branches[0].branches
+            node.processed_treatment = FusedTreatment(treatments)
+        stack.extend(node.branches)
+    return root
+
+
+def _unfused_run[T](fused: FusedTreatment[T], branches: list[EventTree[T]]) -> EventTree[T]:
+    """A linear run of new nodes for the treatments of a fused node, followed by the branches of the fused node. The
+    fused node itself is shared by all computational units and is not modified."""
+    nodes = [EventTree[T](treatment) for treatment in fused.treatments]
+    for node, following in zip(nodes, nodes[1:]):
+        node.add_branch(following)
+    nodes[-1].branches = branches
+    return nodes[0]
@@ -0,0 +1,132 @@
+import json
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any, Optional
+
+from lukefi.metsi.app.utils import ConditionFailed
+
+PRECONDITIONS = "preconditions"
+TREATMENT = "treatment"
+POSTCONDITIONS = "postconditions"
+
+
+class BranchFailure:
+    """
+    Record of a simulation branch failing at a phase of a treatment: a failed pre- or postcondition, or a treatment
+    that could not be performed for the state. Processed treatments return it in place of the processed payload, so
+    that infeasible branches are discarded without raising exceptions. The message is formatted only when needed.
+
+    Treatment functions may return a BranchFailure created with infeasible instead of raising a UserWarning.
+    """
+
+    __slots__ = ('phase', 'treatment', 'time_point', 'reason')
+
+    phase: str
+    treatment: Optional[Callable]
+    time_point: Optional[int]
+    reason: Any
+
+    def __init__(self, phase: str, treatment: Optional[Callable] = None, time_point: Optional[int] = None,
+                 reason: Any = None):
+        """
+        :param phase: one of PRECONDITIONS, TREATMENT or POSTCONDITIONS
+        :param treatment: the treatment function of the failed branch
+        :param time_point: the simulation time point of the treatment
+        :param reason: the failed condition, or a description of why the treatment failed
+        """
+        self.phase = phase
+        self.treatment = treatment
+        self.time_point = time_point
+        self.reason = reason
+
+    def __str__(self) -> str:
+        if self.treatment is None:
+            return str(self.reason)
+        name = getattr(self.treatment, '__name__', str(self.treatment))
+        return f"{name} aborted at time point {self.time_point} - {self.phase} failed: {self.reason}"
+
+    def exception(self) -> Exception:
+        """The exception raised for this failure where failures are signalled by raising."""
+        if self.phase == TREATMENT:
+            return UserWarning(str(self))
+        return ConditionFailed(str(self))
+
+
+def infeasible(reason: Any = None) -> BranchFailure:
+    """A BranchFailure for a treatment function to return when it cannot be performed for the given state. The
+    processor fills in the treatment and the time point."""
+    return BranchFailure(TREATMENT, reason=reason)
+
+
+class FailureStatistics:
+    """Counts of branch failures by treatment function, time point and phase, see BranchFailure."""
+
+    counts: dict[tuple[str, int, str], int]
+
+    def __init__(self):
+        self.counts = {}
+
+    def record(self, failure: BranchFailure):
+        name = getattr(failure.treatment, '__name__', str(failure.treatment))
+        key = (name, failure.time_point if failure.time_point is not None else -1, failure.phase)
+        self.counts[key] = self.counts.get(key, 0) + 1
+
+    def merge(self, other: "FailureStatistics"):
+        """Add the counts of another FailureStatistics into this one."""
+        for key, count in other.counts.items():
+            self.counts[key] = self.counts.get(key, 0) + count
+
+    def total(self) -> int:
+        return sum(self.counts.values())
+
+    def as_records(self) -> list[dict[str, Any]]:
+        """The counts as JSON serializable records, ordered by time point, treatment and phase."""
+        return [{"treatment": name, "time_point": time_point, "phase": phase, "failures": count}
+                for (name, time_point, phase), count in sorted(self.counts.items(), key=lambda item: (item[0][1],
+                                                                                                       item[0][0],
+                                                                                                       item[0][2]))]
+
+    def write(self, path: str | Path):
+        """Write the counts as a JSON list of records, see as_records."""
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(self.as_records(), file, indent=2)
+
+    def summary(self) -> list[str]:
+        """Lines of failure counts per treatment function and phase, in descending order of count. Counts for each
+        time point are summed together."""
+        totals: dict[tuple[str, str], int] = {}
+        for (name, _, phase), count in self.counts.items():
+            totals[(name, phase)] = totals.get((name, phase), 0) + count
+        ordered = sorted(totals.items(), key=lambda item: item[1], reverse=True)
+        return [f"{name} {phase}: {count} failed branches" for (name, phase), count in ordered]
+
+
+# The FailureStatistics counting the branch failures in this process, if any. See activate.
+active: Optional[FailureStatistics] = None
+
+
+def activate(statistics: Optional[FailureStatistics]) -> Optional[FailureStatistics]:
+    """Set the given FailureStatistics to count the branch failures in this process, or disable counting with None.
+
+    :param statistics: a FailureStatistics or None
+    :return: the previously active FailureStatistics
+    """
+    global active  # pylint: disable=global-statement
+    previous = active
+    active = statistics
+    return previous
+
+
+def failed(phase: str, treatment: Callable, time_point: Optional[int], reason: Any) -> BranchFailure:
+    """Create a BranchFailure and count it in the active FailureStatistics, if any."""
+    failure = BranchFailure(phase, treatment, time_point, reason)
+    if active is not None:
+        active.record(failure)
+    return failure
+
+
+def failed_by_raising(treatment: Callable, error: ConditionFailed | UserWarning) -> BranchFailure:
+    """Create and count a BranchFailure for a treatment other than a PreparedTreatment, which signals failures by
+    raising ConditionFailed for a failed condition or UserWarning for a failed treatment. The time point of such
+    treatments is not known."""
+    return failed(PRECONDITIONS if isinstance(error, ConditionFailed) else TREATMENT, treatment, None, error)
@@ -5,17 +5,19 @@ from typing import Sequence as Sequence_
 
 from collections.abc import Callable
 from lukefi.metsi.sim.operations import prepared_operation
-from lukefi.metsi.sim.processor import processor
+from lukefi.metsi.sim.processor import PreparedTreatment
 from lukefi.metsi.sim.collected_data import OpTuple
 from lukefi.metsi.sim.condition import Condition
 from lukefi.metsi.sim.event_tree import EventTree
+from lukefi.metsi.sim.failures import BranchFailure
 from lukefi.metsi.sim.simulation_payload import SimulationPayload, ProcessedTreatment
 from lukefi.metsi.app.utils import MetsiException
 
 T = TypeVar("T")
 
 GeneratorFn = Callable[[Optional[list[EventTree[T]]], ProcessedTreatment[T]], list[EventTree[T]]]
-TreatmentFn = Callable[[OpTuple[T]], OpTuple[T]]
+# treatment functions may return a BranchFailure instead of the state, see failures.infeasible
+TreatmentFn = Callable[[OpTuple[T]], OpTuple[T] | BranchFailure]
 ProcessedGenerator = Callable[[Optional[list[EventTree[T]]]], list[EventTree[T]]]
 
 
@@ -117,8 +119,8 @@ class Event[T](GeneratorBase):
         self._check_file_params()
         combined_params = self._merge_params()
         prepared_treatment = prepared_operation(self.treatment, **combined_params)
-        return lambda payload: processor(payload, prepared_treatment, self.treatment, time_point,
-                                         self.preconditions, self.postconditions, **combined_params)
+        return PreparedTreatment(prepared_treatment, self.treatment, time_point,
+                                 self.preconditions, self.postconditions, combined_params)
 
     def _check_file_params(self):
         for _, path in self.file_parameters.items():
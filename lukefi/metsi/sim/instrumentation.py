@@ -0,0 +1,134 @@
+import json
+import os
+from collections.abc import Callable
+from pathlib import Path
+from time import perf_counter_ns
+from typing import Any, Optional
+
+from lukefi.metsi.sim.failures import BranchFailure, POSTCONDITIONS, PRECONDITIONS, TREATMENT
+
+
+class PhaseStatistics:
+    """Accumulated wall time, call count and failure count of one phase of a treatment at a time point."""
+
+    __slots__ = ('calls', 'failures', 'wall_time_ns')
+
+    calls: int
+    failures: int
+    wall_time_ns: int
+
+    def __init__(self):
+        self.calls = 0
+        self.failures = 0
+        self.wall_time_ns = 0
+
+
+class Instrumentation:
+    """
+    Hook for measuring the phases of processed treatments: the precondition check, the treatment call and the
+    postcondition check. Statistics are accumulated per treatment function, time point and phase. If tracing, each
+    measured call is also recorded as a complete event of the Chrome trace event format, which can be opened with
+    Perfetto or chrome://tracing.
+
+    The processor measures the phases only while an Instrumentation is set active with activate. Otherwise the cost is
+    a single module attribute check per phase.
+    """
+
+    statistics: dict[tuple[str, int, str], PhaseStatistics]
+    trace_events: list[dict[str, Any]]
+    tracing: bool
+
+    def __init__(self, tracing: bool = False):
+        self.statistics = {}
+        self.trace_events = []
+        self.tracing = tracing
+
+    def call(self, phase: str, treatment: Callable, time_point: int, func: Callable, *args: Any) -> Any:
+        """
+        Call the given function with the given arguments, recording it as the given phase of the treatment. The phase
+        is counted as failed if the function raises or returns False or a BranchFailure.
+
+        :param phase: one of PRECONDITIONS, TREATMENT or POSTCONDITIONS
+        :param treatment: the treatment function being processed
+        :param time_point: the simulation time point of the treatment
+        :param func: function to call
+        :return: the return value of the function
+        """
+        failed = True
+        start = perf_counter_ns()
+        try:
+            result = func(*args)
+            failed = result is False or isinstance(result, BranchFailure)
+            return result
+        finally:
+            self.record(phase, treatment, time_point, start, perf_counter_ns(), failed)
+
+    def record(self, phase: str, treatment: Callable, time_point: int, start_ns: int, end_ns: int, failed: bool):
+        name = getattr(treatment, '__name__', str(treatment))
+        key = (name, time_point, phase)
+        statistics = self.statistics.get(key)
+        if statistics is None:
+            statistics = PhaseStatistics()
+            self.statistics[key] = statistics
+        statistics.calls += 1
+        statistics.failures += failed
+        statistics.wall_time_ns += end_ns - start_ns
+        if self.tracing:
+            self.trace_events.append({
+                "name": name,
+                "cat": phase,
+                "ph": "X",
+                "ts": start_ns / 1000,
+                "dur": (end_ns - start_ns) / 1000,
+                "pid": os.getpid(),
+                "tid": 0,
+                "args": {"time_point": time_point, "failed": failed}
+            })
+
+    def merge(self, other: "Instrumentation"):
+        """Add the statistics of another Instrumentation into this one. Trace events are not merged."""
+        for key, other_statistics in other.statistics.items():
+            statistics = self.statistics.get(key)
+            if statistics is None:
+                statistics = PhaseStatistics()
+                self.statistics[key] = statistics
+            statistics.calls += other_statistics.calls
+            statistics.failures += other_statistics.failures
+            statistics.wall_time_ns += other_statistics.wall_time_ns
+
+    def write_trace(self, path: str | Path):
+        """Write the recorded trace events as a Chrome trace event JSON file."""
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump({"traceEvents": self.trace_events, "displayTimeUnit": "ms"}, file)
+
+    def summary(self) -> list[str]:
+        """Lines of accumulated statistics per treatment function and phase, in descending order of wall time.
+        Statistics for each time point are summed together."""
+        totals: dict[tuple[str, str], PhaseStatistics] = {}
+        for (name, _, phase), statistics in self.statistics.items():
+            total = totals.setdefault((name, phase), PhaseStatistics())
+            total.calls += statistics.calls
+            total.failures += statistics.failures
+            total.wall_time_ns += statistics.wall_time_ns
+        ordered = sorted(totals.items(), key=lambda item: item[1].wall_time_ns, reverse=True)
+        return [f"{name} {phase}: {total.wall_time_ns / 1e9:.3f} s, {total.calls} calls, {total.failures} failed"
+                for (name, phase), total in ordered]
+
+
+# The Instrumentation measuring the processor in this process, if any. See activate.
+active: Optional[Instrumentation] = None
+
+
+def activate(instrumentation: Optional[Instrumentation]) -> Optional[Instrumentation]:
+    """Set the given Instrumentation to measure the processor in this process, or disable measuring with None.
+
+    :param instrumentation: an Instrumentation or None
+    :return: the previously active Instrumentation
+    """
+    global active  # pylint: disable=global-statement
+    previous = active
+    active = instrumentation
+    return previous
+
+
+__all__ = ["Instrumentation", "PhaseStatistics", "activate", "PRECONDITIONS", "TREATMENT", "POSTCONDITIONS"]
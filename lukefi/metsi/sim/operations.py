@@ -1,4 +1,4 @@
-from typing import Any, Callable, TypeVar
+from typing import Any, Callable, Optional, TypeVar
 
 from lukefi.metsi.app.utils import MetsiException
 
@@ -11,7 +11,28 @@ def do_nothing(data: T, **kwargs) -> T:
     return data
 
 
-def prepared_operation(operation_entrypoint: Callable[[T], T], **operation_parameters) -> Callable[[T], T]:
+BatchFn = Callable[..., list[T]]
+
+
+def with_batch_entrypoint(entrypoint: BatchFn) -> Callable[[Callable[..., T]], Callable[..., T]]:
+    """
+    Decorator declaring a batch entry point for an operation. The batch entry point is called with a list of operation
+    inputs and the operation parameters, and returns the list of operation results in the same order, as if the
+    operation was called for each input separately. Evaluators processing several payloads with the same operation at
+    once, such as the breadth first evaluator, call it instead of the operation itself.
+    """
+    def decorator(operation: Callable[..., T]) -> Callable[..., T]:
+        setattr(operation, "batch_entrypoint", entrypoint)
+        return operation
+    return decorator
+
+
+def batch_entrypoint(operation: Callable[..., T]) -> Optional[BatchFn]:
+    """The batch entry point declared for the operation with with_batch_entrypoint, if any."""
+    return getattr(operation, "batch_entrypoint", None)
+
+
+def prepared_operation(operation_entrypoint: Callable[..., T], **operation_parameters) -> Callable[..., T]:
     """prepares an opertion entrypoint function with configuration parameters"""
     return lambda state: operation_entrypoint(state, **operation_parameters)
 
@@ -0,0 +1,119 @@
+import os
+import pickle
+import tempfile
+from collections.abc import Iterable, Iterator
+from typing import IO, Any, Optional
+
+from lukefi.metsi.sim.simulation_payload import OperationHistory, SimulationPayload
+
+
+class _SharingPickler(pickle.Pickler):
+    """Pickler writing the registered shared objects as references to their index instead of their contents."""
+
+    def __init__(self, file: IO[bytes], shared_ids: dict[int, int]):
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.shared_ids = shared_ids
+
+    def persistent_id(self, obj: Any) -> Optional[int]:
+        return self.shared_ids.get(id(obj))
+
+
+class _SharingUnpickler(pickle.Unpickler):
+    """Unpickler resolving the references written by _SharingPickler into the shared objects in memory."""
+
+    def __init__(self, file: IO[bytes], shared: list[Any]):
+        super().__init__(file)
+        self.shared = shared
+
+    def persistent_load(self, pid: Any) -> Any:
+        return self.shared[pid]
+
+
+def shared_components[T](payload: SimulationPayload[T]) -> list[Any]:
+    """The computational unit of the payload, its attribute values and the items of its list attributes. The states
+    derived from the payload during a simulation typically keep referring to these objects, for example as the base
+    layers of LayeredObjects."""
+    unit = payload.computational_unit
+    components: list[Any] = [unit]
+    for value in getattr(unit, '__dict__', {}).values():
+        if isinstance(value, list):
+            components.extend(value)
+        else:
+            components.append(value)
+    return components
+
+
+class PayloadStore[T]:
+    """
+    Simulation state payloads of a computational unit, kept in memory up to a budget and spilled to a temporary file
+    beyond it. Iterating yields the payloads in the order they were added, reading the spilled ones back one at a time.
+
+    The spilled payloads are pickled one by one. Objects given as shared, such as the initial state of the computational
+    unit, are written as references to the objects in memory, so that the payloads read back keep sharing them instead
+    of each holding a copy. The EventTable of the operation histories, shared by all payloads of a unit, is kept in
+    memory the same way once the first payload referring to it is spilled.
+    """
+
+    __slots__ = ('budget', 'payloads', '_shared', '_shared_ids', '_directory', '_file', '_spilled')
+
+    budget: Optional[int]
+    payloads: list[SimulationPayload[T]]
+
+    def __init__(self, budget: Optional[int] = None, shared: Iterable[Any] = (), directory: Optional[str] = None):
+        """
+        :param budget: the amount of payloads kept in memory, or None for keeping all of them
+        :param shared: objects referred to by the payloads and kept in memory regardless of spilling
+        :param directory: directory of the temporary file, the system default if None
+        """
+        self.budget = budget
+        self.payloads = []
+        self._shared = list(shared)
+        self._shared_ids = {id(obj): i for i, obj in enumerate(self._shared)}
+        self._directory = directory
+        self._file: Optional[IO[bytes]] = None
+        self._spilled = 0
+
+    @property
+    def spilled(self) -> bool:
+        return self._spilled > 0
+
+    def append(self, payload: SimulationPayload[T]):
+        if self._spilled == 0 and (self.budget is None or len(self.payloads) < self.budget):
+            self.payloads.append(payload)
+            return
+        if self._file is None:
+            self._file = tempfile.TemporaryFile(dir=self._directory)
+        history = getattr(payload, 'operation_history', None)
+        if isinstance(history, OperationHistory) and id(history.table) not in self._shared_ids:
+            self._shared_ids[id(history.table)] = len(self._shared)
+            self._shared.append(history.table)
+        self._file.seek(0, os.SEEK_END)
+        _SharingPickler(self._file, self._shared_ids).dump(payload)
+        self._spilled += 1
+
+    def extend(self, payloads: Iterable[SimulationPayload[T]]):
+        for payload in payloads:
+            self.append(payload)
+
+    def empty_like(self) -> "PayloadStore[T]":
+        """A new empty store with the budget, shared objects and directory of this one."""
+        return PayloadStore(self.budget, self._shared, self._directory)
+
+    def close(self):
+        """Release the payloads and delete the temporary file."""
+        self.payloads = []
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self._spilled = 0
+
+    def __len__(self) -> int:
+        return len(self.payloads) + self._spilled
+
+    def __iter__(self) -> Iterator[SimulationPayload[T]]:
+        yield from self.payloads
+        if self._file is not None:
+            self._file.flush()
+            self._file.seek(0)
+            for _ in range(self._spilled):
+                yield _SharingUnpickler(self._file, self._shared).load()
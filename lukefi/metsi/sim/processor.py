@@ -1,7 +1,10 @@
-from typing import TYPE_CHECKING
-from lukefi.metsi.app.utils import ConditionFailed
+from functools import partial
+from typing import TYPE_CHECKING, Any, Optional
+from lukefi.metsi.sim import instrumentation
 from lukefi.metsi.sim.condition import Condition
-from lukefi.metsi.sim.simulation_payload import SimulationPayload
+from lukefi.metsi.sim.failures import BranchFailure, POSTCONDITIONS, PRECONDITIONS, TREATMENT, failed
+from lukefi.metsi.sim.operations import batch_entrypoint
+from lukefi.metsi.sim.simulation_payload import OperationHistory, SimulationPayload, ProcessedTreatment
 if TYPE_CHECKING:
     from lukefi.metsi.sim.generators import TreatmentFn
 
@@ -12,29 +15,243 @@ def processor[T](payload: SimulationPayload[T],
                  time_point: int,
                  preconditions: list[Condition[SimulationPayload[T]]],
                  postconditions: list[Condition[SimulationPayload[T]]],
-                 **operation_parameters: dict[str, dict]) -> SimulationPayload[T]:
-    """Managed run conditions and history of a simulator operation. Evaluates the operation."""
-    for condition in preconditions:
+                 **operation_parameters: dict[str, dict]) -> SimulationPayload[T] | BranchFailure:
+    """Managed run conditions and history of a simulator operation. Evaluates the operation. A BranchFailure is
+    returned instead of the processed payload if a run condition fails or the operation cannot be performed."""
+    failure = _check_preconditions(payload, operation_tag, time_point, preconditions)
+    if failure is not None:
+        return failure
+    return _process_operation(payload, operation, operation_tag, time_point, postconditions, **operation_parameters)
+
+
+def _check_conditions[T](payload: SimulationPayload[T],
+                         operation_tag: "TreatmentFn[T]",
+                         time_point: int,
+                         conditions: list[Condition[SimulationPayload[T]]],
+                         phase: str) -> Optional[BranchFailure]:
+    for condition in conditions:
         if not condition(time_point, payload):
-            raise ConditionFailed(f'{operation_tag} aborted - condition "{condition}" failed')
+            return failed(phase, operation_tag, time_point, condition)
+    return None
 
-    payload.collected_data.current_time_point = time_point
-    try:
-        new_state, new_collected_data = operation((payload.computational_unit, payload.collected_data))
-    except UserWarning as e:
-        raise UserWarning(f"Unable to perform operation {operation_tag}, "
-                          f"at time point {time_point}; reason: {e}") from e
+
+def _check_preconditions[T](payload: SimulationPayload[T],
+                            operation_tag: "TreatmentFn[T]",
+                            time_point: int,
+                            preconditions: list[Condition[SimulationPayload[T]]]) -> Optional[BranchFailure]:
+    hooks = instrumentation.active
+    if hooks is None or not preconditions:
+        return _check_conditions(payload, operation_tag, time_point, preconditions, PRECONDITIONS)
+    return hooks.call(PRECONDITIONS, operation_tag, time_point,
+                      _check_conditions, payload, operation_tag, time_point, preconditions, PRECONDITIONS)
+
+
+def _process_operation[T](payload: SimulationPayload[T],
+                          operation: "TreatmentFn[T]",
+                          operation_tag: "TreatmentFn[T]",
+                          time_point: int,
+                          postconditions: list[Condition[SimulationPayload[T]]],
+                          **operation_parameters: dict[str, dict]) -> SimulationPayload[T] | BranchFailure:
+    if not isinstance(payload.operation_history, OperationHistory):
+        payload.operation_history = OperationHistory(payload.operation_history)
 
     newpayload: SimulationPayload[T] = SimulationPayload(
-        computational_unit=new_state,
-        collected_data=payload.collected_data if new_collected_data is None else new_collected_data,
+        computational_unit=payload.computational_unit,
+        collected_data=payload.collected_data,
         operation_history=payload.operation_history
     )
+    failure = _apply_operation(newpayload, operation, operation_tag, time_point, postconditions, operation_parameters)
+    return newpayload if failure is None else failure
+
+
+def _apply_operation[T](payload: SimulationPayload[T],
+                        operation: "TreatmentFn[T]",
+                        operation_tag: "TreatmentFn[T]",
+                        time_point: int,
+                        postconditions: list[Condition[SimulationPayload[T]]],
+                        operation_parameters: dict[str, Any]) -> Optional[BranchFailure]:
+    """Run the operation and its postconditions, updating the given payload in place. Operations may signal that
+    they cannot be performed by returning a BranchFailure, or by raising a UserWarning."""
+    hooks = instrumentation.active
+    payload.collected_data.current_time_point = time_point
+    try:
+        if hooks is None:
+            result = operation((payload.computational_unit, payload.collected_data))
+        else:
+            result = hooks.call(TREATMENT, operation_tag, time_point,
+                                operation, (payload.computational_unit, payload.collected_data))
+    except UserWarning as e:
+        return failed(TREATMENT, operation_tag, time_point, e)
+    if isinstance(result, BranchFailure):
+        return failed(TREATMENT, operation_tag, time_point, result.reason)
+    new_state, new_collected_data = result
+    return _complete_operation(payload, new_state, new_collected_data, operation_tag, time_point, postconditions,
+                               operation_parameters)
+
 
-    for condition in postconditions:
-        if not condition(time_point, newpayload):
-            raise ConditionFailed(f'{operation_tag} aborted - condition "{condition}" failed')
+def _complete_operation[T](payload: SimulationPayload[T],
+                           new_state: Any,
+                           new_collected_data: Any,
+                           operation_tag: "TreatmentFn[T]",
+                           time_point: int,
+                           postconditions: list[Condition[SimulationPayload[T]]],
+                           operation_parameters: dict[str, Any]) -> Optional[BranchFailure]:
+    hooks = instrumentation.active
+    payload.computational_unit = new_state
+    if new_collected_data is not None:
+        payload.collected_data = new_collected_data
+
+    if hooks is None or not postconditions:
+        failure = _check_conditions(payload, operation_tag, time_point, postconditions, POSTCONDITIONS)
+    else:
+        failure = hooks.call(POSTCONDITIONS, operation_tag, time_point,
+                             _check_conditions, payload, operation_tag, time_point, postconditions, POSTCONDITIONS)
+    if failure is not None:
+        return failure
 
     payload.operation_history.append((time_point, operation_tag, operation_parameters))
+    return None
+
+
+class PreparedTreatment[T]:
+    """A simulator operation prepared with its parameters and run conditions for a time point. Calling it processes
+    a payload with processor, returning the processed payload or a BranchFailure. The preconditions can also be probed
+    separately, see probe_preconditions."""
+
+    __slots__ = ('operation', 'operation_tag', 'time_point', 'preconditions', 'postconditions', 'operation_parameters')
+
+    def __init__(self,
+                 operation: "TreatmentFn[T]",
+                 operation_tag: "TreatmentFn[T]",
+                 time_point: int,
+                 preconditions: list[Condition[SimulationPayload[T]]],
+                 postconditions: list[Condition[SimulationPayload[T]]],
+                 operation_parameters: dict[str, Any]):
+        self.operation = operation
+        self.operation_tag = operation_tag
+        self.time_point = time_point
+        self.preconditions = preconditions
+        self.postconditions = postconditions
+        self.operation_parameters = operation_parameters
+
+    def __call__(self, payload: SimulationPayload[T]) -> SimulationPayload[T] | BranchFailure:
+        return processor(payload, self.operation, self.operation_tag, self.time_point,
+                         self.preconditions, self.postconditions, **self.operation_parameters)
+
+    def check_preconditions(self, payload: SimulationPayload[T]) -> Optional[BranchFailure]:
+        """The failure of the first failing precondition for the payload, or None if they all hold."""
+        return _check_preconditions(payload, self.operation_tag, self.time_point, self.preconditions)
+
+    def preconditions_hold(self, payload: SimulationPayload[T]) -> bool:
+        return self.check_preconditions(payload) is None
+
+    def process_unchecked(self, payload: SimulationPayload[T]) -> SimulationPayload[T] | BranchFailure:
+        """Process the payload without evaluating the preconditions again."""
+        return _process_operation(payload, self.operation, self.operation_tag, self.time_point,
+                                  self.postconditions, **self.operation_parameters)
+
+    def process_in_place(self, payload: SimulationPayload[T]) -> Optional[BranchFailure]:
+        """Process the payload, updating it in place instead of producing a new payload. The payload must not be
+        shared with other branches.
+
+        :return: None if processed, otherwise the BranchFailure
+        """
+        failure = self.check_preconditions(payload)
+        if failure is not None:
+            return failure
+        return _apply_operation(payload, self.operation, self.operation_tag, self.time_point,
+                                self.postconditions, self.operation_parameters)
+
+    def process_batch(self, payloads: list[SimulationPayload[T]]) -> list[Optional[SimulationPayload[T]]]:
+        """
+        Process the payloads in place without evaluating the preconditions, with a single call of the batch entry
+        point of the operation if it declares one (see with_batch_entrypoint), otherwise with a call for each payload.
+        The batch entry point may return a BranchFailure in place of the output of a failing payload. If it raises a
+        UserWarning, the payloads are processed one by one to find the failing ones.
+
+        :param payloads: payloads not shared with other branches
+        :return: the processed payloads, with None in place of those failing the operation or its postconditions
+        """
+        batch = batch_entrypoint(self.operation_tag)
+        if batch is None or len(payloads) < 2:
+            return [self._process_in_place_or_none(payload) for payload in payloads]
+        hooks = instrumentation.active
+        inputs = []
+        for payload in payloads:
+            payload.collected_data.current_time_point = self.time_point
+            inputs.append((payload.computational_unit, payload.collected_data))
+        try:
+            if hooks is None:
+                outputs = batch(inputs, **self.operation_parameters)
+            else:
+                outputs = hooks.call(TREATMENT, self.operation_tag, self.time_point,
+                                     partial(batch, **self.operation_parameters), inputs)
+        except UserWarning:
+            return [self._process_in_place_or_none(payload) for payload in payloads]
+        results: list[Optional[SimulationPayload[T]]] = []
+        for payload, output in zip(payloads, outputs):
+            if isinstance(output, BranchFailure):
+                failed(TREATMENT, self.operation_tag, self.time_point, output.reason)
+                results.append(None)
+                continue
+            new_state, new_collected_data = output
+            failure = _complete_operation(payload, new_state, new_collected_data, self.operation_tag,
+                                          self.time_point, self.postconditions, self.operation_parameters)
+            results.append(payload if failure is None else None)
+        return results
+
+    def _process_in_place_or_none(self, payload: SimulationPayload[T]) -> Optional[SimulationPayload[T]]:
+        failure = _apply_operation(payload, self.operation, self.operation_tag, self.time_point,
+                                   self.postconditions, self.operation_parameters)
+        return payload if failure is None else None
+
+
+class FusedTreatment[T]:
+    """A linear run of PreparedTreatments without branching, processed back to back as a single step. The run
+    conditions and history entries of each treatment are kept as if they were processed one by one, but the
+    intermediate payloads are not produced, as no branch can share them. See fuse_linear_runs."""
+
+    __slots__ = ('treatments',)
+
+    treatments: list[PreparedTreatment[T]]
+
+    def __init__(self, treatments: list[PreparedTreatment[T]]):
+        self.treatments = treatments
+
+    def __call__(self, payload: SimulationPayload[T]) -> SimulationPayload[T] | BranchFailure:
+        return self._process_rest(self.treatments[0](payload))
+
+    def preconditions_hold(self, payload: SimulationPayload[T]) -> bool:
+        """Probe the preconditions of the first treatment of the run. The rest depend on the preceding treatments."""
+        return self.treatments[0].preconditions_hold(payload)
+
+    def process_unchecked(self, payload: SimulationPayload[T]) -> SimulationPayload[T] | BranchFailure:
+        """Process the payload without evaluating the preconditions of the first treatment again."""
+        return self._process_rest(self.treatments[0].process_unchecked(payload))
+
+    def _process_rest(self, payload: SimulationPayload[T] | BranchFailure) -> SimulationPayload[T] | BranchFailure:
+        if isinstance(payload, BranchFailure):
+            return payload
+        for treatment in self.treatments[1:]:
+            failure = treatment.process_in_place(payload)
+            if failure is not None:
+                return failure
+        return payload
+
+
+def probe_preconditions[T](treatment: ProcessedTreatment[T],
+                           payload: SimulationPayload[T]) -> Optional[ProcessedTreatment[T]]:
+    """
+    Evaluate the preconditions of the given processed treatment against the payload without processing or modifying
+    it. This allows skipping the copying of a payload for branches that would be aborted by their preconditions.
+    Treatments other than PreparedTreatments and FusedTreatments have no preconditions to probe.
 
-    return newpayload
+    :param treatment: a processed treatment
+    :param payload: the simulation state payload the treatment would be run with, or its original before copying
+    :return: None if a precondition fails, otherwise the function to process (a copy of) the payload with
+    """
+    if not isinstance(treatment, (PreparedTreatment, FusedTreatment)):
+        return treatment
+    if not treatment.preconditions_hold(payload):
+        return None
+    return treatment.process_unchecked
@@ -1,22 +1,43 @@
-from collections.abc import Callable
-from copy import deepcopy
-from typing import TypeVar
+from collections import deque
+from collections.abc import Callable, Iterator
+from copy import copy, deepcopy
+from functools import partial
+import math
+import multiprocessing
+from multiprocessing.pool import AsyncResult
+import os
+import pickle
+from pathlib import Path
+from typing import Any, Optional, TypeVar
+import numpy as np
 from lukefi.metsi.app.console_logging import print_logline
-from lukefi.metsi.app.utils import ConditionFailed
-from lukefi.metsi.data.layered_model import PossiblyLayered
+from lukefi.metsi.app.utils import ConditionFailed, MetsiException, SimulationAborted
+from lukefi.metsi.data.layered_model import LayeredObject, PossiblyLayered
 from lukefi.metsi.sim.collected_data import CollectedData
 from lukefi.metsi.sim.event_tree import EventTree
-from lukefi.metsi.sim.generators import Generator
-
-from lukefi.metsi.sim.simulation_payload import SimulationPayload
+from lukefi.metsi.sim import failures
+from lukefi.metsi.sim.failures import BranchFailure, FailureStatistics
+from lukefi.metsi.sim.instrumentation import Instrumentation, activate
+from lukefi.metsi.sim.payload_store import PayloadStore, shared_components
+from lukefi.metsi.sim.finalizable import Finalizable
+from lukefi.metsi.sim.processor import FusedTreatment, PreparedTreatment, probe_preconditions
+from lukefi.metsi.sim.simulation_payload import OperationHistory, ProcessedTreatment, SimulationPayload
 from lukefi.metsi.sim.sim_configuration import SimConfiguration
+from lukefi.metsi.sim.state_merging import expand_merged_payloads, merge_duplicate_payloads
 from lukefi.metsi.sim.state_tree import StateTree
 
 T = TypeVar("T")
 
 Evaluator = Callable[[SimulationPayload[T], EventTree[T]], list[SimulationPayload[T]]]
 TreeRunner = Callable[[SimulationPayload[T], SimConfiguration, Evaluator[T]], list[SimulationPayload[T]]]
-Runner = Callable[[list[T], SimConfiguration[T], TreeRunner[T], Evaluator[T]], dict[str, list[SimulationPayload[T]]]]
+# the last argument of a runner is the position of the first given unit in all units of the run, see stream_units
+Runner = Callable[[list[T], SimConfiguration[T], TreeRunner[T], Evaluator[T], int],
+                  dict[str, list[SimulationPayload[T]]]]
+StreamingRunner = Callable[[list[T], SimConfiguration[T], TreeRunner[T], Evaluator[T], int],
+                           Iterator[tuple[str, list[SimulationPayload[T]]]]]
+BlockEvaluator = Callable[[list[SimulationPayload[T]], EventTree[T]], list[list[SimulationPayload[T]]]]
+BlockTreeRunner = Callable[[list[SimulationPayload[T]], SimConfiguration, Evaluator[T]],
+                           list[list[SimulationPayload[T]]]]
 
 
 def evaluate_sequence(payload: T, *operations: Callable[[T], T]) -> T:
@@ -24,34 +45,86 @@ def evaluate_sequence(payload: T, *operations: Callable[[T], T]) -> T:
     Compute a single processing result for single data input.
 
     Execute all given instruction functions, chaining the input_data argument and
-    iterative results as arguments to subsequent calls. Abort on any function raising an exception.
+    iterative results as arguments to subsequent calls. Abort on any function raising an exception or returning a
+    BranchFailure.
 
     :param payload: argument for the first instruction functions
     :param operations: *arg list of operation functions to execute in order
-    :raises Exception: on any instruction function raising, catch and propagate the exception
+    :raises Exception: on any instruction function raising, catch and propagate the exception. A returned
+        BranchFailure is raised as its exception, see BranchFailure.exception.
     :return: return value of the last instruction function
     """
     current = payload
     for func in operations:
         current = func(current)
+        if isinstance(current, BranchFailure):
+            raise current.exception()
     return current
 
 
-def _run_chains_iteratively(payload: T, chains: list[list[Callable[[T], T]]]) -> list[T]:
+class _ChainTrie[T]:
+    """Operation chains merged by their common prefixes. Each node holds the indices of the chains ending at it."""
+    __slots__ = ('branches', 'chain_indices')
+
+    branches: dict[ProcessedTreatment[T], "_ChainTrie[T]"]
+    chain_indices: list[int]
+
+    def __init__(self):
+        self.branches = {}
+        self.chain_indices = []
+
+
+def _build_chain_trie(chains: list[list[ProcessedTreatment[T]]]) -> _ChainTrie[T]:
+    root: _ChainTrie[T] = _ChainTrie()
+    for i, chain in enumerate(chains):
+        node = root
+        for func in chain:
+            branch = node.branches.get(func)
+            if branch is None:
+                branch = _ChainTrie()
+                node.branches[func] = branch
+            node = branch
+        node.chain_indices.append(i)
+    return root
+
+
+def _run_chains_iteratively(payload: SimulationPayload[T],
+                            chains: list[list[ProcessedTreatment[T]]]) -> list[SimulationPayload[T]]:
     """Execute all given operation chains for the given state payload. Return the collection of success results from
-    all chains.
+    all chains, in the order of the chains.
+
+    Chains are merged by their common prefixes. A shared prefix is executed only once and its intermediate result is
+    copied for each of the chains continuing from it whose next operation passes its preconditions.
 
     :param payload: a simulation state payload
     :param chains: list of a list of functions usable to process the payload
     :return: list of success results of applying the function chains on the payload"""
-    results: list[T] = []
-    for chain in chains:
-        try:
-            results.append(evaluate_sequence(deepcopy(payload), *chain))
-        except (ConditionFailed, UserWarning):
-            ...
-            # TODO aborted run reporting
-    return results
+    results: list[tuple[int, SimulationPayload[T]]] = []
+    stack: list[tuple[_ChainTrie[T], SimulationPayload[T]]] = [(_build_chain_trie(chains), deepcopy(payload))]
+    while stack:
+        node, current = stack.pop()
+        # branches failing their preconditions are skipped without copying the intermediate result for them
+        runnable_branches = [(runnable, branch) for runnable, branch in
+                             ((probe_preconditions(func, current), branch) for func, branch in node.branches.items())
+                             if runnable is not None]
+        # the last consumer of the intermediate result can take it as is
+        consumers = len(node.chain_indices) + len(runnable_branches)
+        for i in node.chain_indices:
+            consumers -= 1
+            results.append((i, deepcopy(current) if consumers > 0 else current))
+        for runnable, branch in runnable_branches:
+            consumers -= 1
+            try:
+                processed = runnable(deepcopy(current) if consumers > 0 else current)
+            except (ConditionFailed, UserWarning) as e:
+                # functions other than prepared treatments signal failures by raising
+                failures.failed_by_raising(runnable, e)
+                continue
+            # failures of prepared treatments are counted where they occur, see failures.failed
+            if not isinstance(processed, BranchFailure):
+                stack.append((branch, processed))
+    results.sort(key=lambda result: result[0])
+    return [result for _, result in results]
 
 
 def chain_evaluator(payload: SimulationPayload[T], root_node: EventTree[T]) -> list[SimulationPayload[T]]:
@@ -60,8 +133,166 @@ def chain_evaluator(payload: SimulationPayload[T], root_node: EventTree[T]) -> l
 
 
 def depth_first_evaluator(payload: SimulationPayload[T], root_node: EventTree[T]) -> list[SimulationPayload[T]]:
-    state_tree: StateTree[PossiblyLayered[T]] = StateTree()
-    return root_node.evaluate(payload, state_tree)
+    return root_node.evaluate(payload)
+
+
+def recording_depth_first_evaluator(state_trees: list[StateTree[PossiblyLayered[T]]]) -> Evaluator[T]:
+    """Create a depth first evaluator which records the intermediate states of each evaluation into a StateTree,
+    appended to the given list. State recording is left out of the plain depth_first_evaluator for its memory cost.
+
+    :param state_trees: list for collecting the StateTree of each evaluation
+    :return: an Evaluator
+    """
+    def evaluator(payload: SimulationPayload[T], root_node: EventTree[T]) -> list[SimulationPayload[T]]:
+        state_tree: StateTree[PossiblyLayered[T]] = StateTree()
+        state_trees.append(state_tree)
+        return root_node.evaluate(payload, state_tree)
+    return evaluator
+
+
+class _PendingPayload[T]:
+    """A payload waiting for the treatment at the given step of the given node in the breadth first evaluation. The
+    order is the path of branch indices from the root node, for ordering the results like the depth first evaluator."""
+    __slots__ = ('node', 'step', 'payload', 'order', 'preconditions_checked')
+
+    def __init__(self,
+                 node: EventTree[T],
+                 step: int,
+                 payload: SimulationPayload[T],
+                 order: tuple[int, ...],
+                 preconditions_checked: bool):
+        self.node = node
+        self.step = step
+        self.payload = payload
+        self.order = order
+        self.preconditions_checked = preconditions_checked
+
+
+def _node_treatments(node: EventTree[T]) -> list[ProcessedTreatment[T]]:
+    if isinstance(node.processed_treatment, FusedTreatment):
+        return list(node.processed_treatment.treatments)
+    return [node.processed_treatment]
+
+
+def _equal_parameter(a: Any, b: Any) -> bool:
+    """Whether two operation parameter values are equal. Arrays are compared by their elements, and values without a
+    single truth value for their equality, such as containers of arrays, are equal only if they are the same object."""
+    if type(a) is not type(b):
+        return False
+    if isinstance(a, np.ndarray):
+        return a.dtype == b.dtype and np.array_equal(a, b)
+    try:
+        return bool(a == b)
+    except ValueError:
+        return a is b
+
+
+def _equivalent_treatments(a: PreparedTreatment[T], b: PreparedTreatment[T]) -> bool:
+    return a.operation_tag is b.operation_tag and a.time_point == b.time_point \
+        and a.preconditions is b.preconditions and a.postconditions is b.postconditions \
+        and a.operation_parameters.keys() == b.operation_parameters.keys() \
+        and all(_equal_parameter(value, b.operation_parameters[name]) for name, value in a.operation_parameters.items())
+
+
+def _process_level(level: list[_PendingPayload[T]]) -> list[tuple[_PendingPayload[T], bool]]:
+    """Process the treatments of all pending payloads of a level, batching equivalent prepared treatments. Return the
+    pending payloads paired with whether their treatment succeeded."""
+    groups: list[tuple[PreparedTreatment[T], list[_PendingPayload[T]]]] = []
+    processed: list[tuple[_PendingPayload[T], bool]] = []
+    for pending in level:
+        treatment = _node_treatments(pending.node)[pending.step]
+        if not isinstance(treatment, PreparedTreatment):
+            try:
+                result = treatment(pending.payload)
+            except (ConditionFailed, UserWarning) as e:
+                failures.failed_by_raising(treatment, e)
+                processed.append((pending, False))
+                continue
+            if isinstance(result, BranchFailure):
+                processed.append((pending, False))
+            else:
+                pending.payload = result
+                processed.append((pending, True))
+            continue
+        if not pending.preconditions_checked and not treatment.preconditions_hold(pending.payload):
+            processed.append((pending, False))
+            continue
+        group = next((members for representative, members in groups
+                      if _equivalent_treatments(representative, treatment)), None)
+        if group is None:
+            groups.append((treatment, [pending]))
+        else:
+            group.append(pending)
+    for treatment, members in groups:
+        results = treatment.process_batch([pending.payload for pending in members])
+        processed.extend((pending, result is not None) for pending, result in zip(members, results))
+    return processed
+
+
+def breadth_first_evaluator(payload: SimulationPayload[T], root_node: EventTree[T]) -> list[SimulationPayload[T]]:
+    """
+    Evaluate the EventTree level by level, advancing all payloads by one treatment at a time. Payloads reaching
+    equivalent treatments on the same level, such as the same declared event following different alternatives, are
+    processed together with a single call of the batch entry point of the treatment, if it declares one (see
+    with_batch_entrypoint). Other treatments are processed for each payload separately.
+
+    Like the other evaluators, the preconditions of each branch are probed before copying the payload for it. The
+    results are in the same order as with depth_first_evaluator, but unlike it, a tree with no successful branches
+    produces an empty list of results.
+
+    :param payload: a simulation state payload
+    :param root_node: the root node of an EventTree
+    :return: list of result payloads
+    """
+    return evaluate_block_breadth_first([payload], root_node)[0]
+
+
+def evaluate_block_breadth_first(payloads: list[SimulationPayload[T]],
+                                 root_node: EventTree[T]) -> list[list[SimulationPayload[T]]]:
+    """
+    Evaluate the EventTree for several payloads together like breadth_first_evaluator, batching equivalent treatments
+    over the payloads of all of them.
+
+    :param payloads: simulation state payloads, typically of different computational units
+    :param root_node: the root node of an EventTree
+    :return: list of result payloads for each given payload
+    """
+    results: list[tuple[tuple[int, ...], SimulationPayload[T]]] = []
+    level: list[_PendingPayload[T]] = [_PendingPayload(root_node, 0, payload, (i,), False)
+                                       for i, payload in enumerate(payloads)]
+    while level:
+        following: list[_PendingPayload[T]] = []
+        for pending, succeeded in _process_level(level):
+            if not succeeded:
+                continue
+            node, current = pending.node, pending.payload
+            if pending.step + 1 < len(_node_treatments(node)):
+                following.append(_PendingPayload(node, pending.step + 1, current, pending.order, False))
+                continue
+            if isinstance(current.computational_unit, Finalizable):
+                current.computational_unit.finalize()
+            if len(node.branches) == 0:
+                results.append((pending.order, current))
+                continue
+            runnable_branches = [(i, branch) for i, branch in enumerate(node.branches)
+                                 if probe_preconditions(branch.processed_treatment, current) is not None]
+            # the last branch can take the payload as is, unless the copies for the other branches are layers over it
+            shared = isinstance(current.computational_unit, LayeredObject)
+            for consumers, (i, branch) in enumerate(reversed(runnable_branches)):
+                branch_payload = copy(current) if consumers > 0 or shared else current
+                following.append(_PendingPayload(branch, 0, branch_payload, (*pending.order, i), True))
+        level = following
+    results.sort(key=lambda result: result[0])
+    grouped: list[list[SimulationPayload[T]]] = [[] for _ in payloads]
+    for order, result in results:
+        grouped[order[0]].append(result)
+    return grouped
+
+
+def _block_evaluator(evaluator: Evaluator[T]) -> BlockEvaluator[T]:
+    if evaluator is breadth_first_evaluator:
+        return evaluate_block_breadth_first
+    return lambda payloads, root_node: [evaluator(payload, root_node) for payload in payloads]
 
 
 def run_full_tree_strategy(payload: SimulationPayload[T], config: SimConfiguration,
@@ -76,12 +307,18 @@ def run_full_tree_strategy(payload: SimulationPayload[T], config: SimConfigurati
     :return: a list of resulting simulation state payloads
     """
 
-    nestable_generator: Generator[T] = config.full_tree_generators()
-    root_node: EventTree[T] = nestable_generator.compose_nested()
+    root_node: EventTree[T] = config.full_event_tree()
     result = evaluator(payload, root_node)
     return result
 
 
+def run_full_tree_strategy_for_block(payloads: list[SimulationPayload[T]], config: SimConfiguration[T],
+                                     evaluator: Evaluator[T] = chain_evaluator) -> list[list[SimulationPayload[T]]]:
+    """Process several payloads like run_full_tree_strategy. With breadth_first_evaluator, all the payloads are
+    evaluated together."""
+    return _block_evaluator(evaluator)(payloads, config.full_event_tree())
+
+
 def run_partial_tree_strategy(payload: SimulationPayload[T], config: SimConfiguration[T],
                               evaluator: Evaluator[T] = chain_evaluator
                               ) -> list[SimulationPayload[T]]:
@@ -89,42 +326,510 @@ def run_partial_tree_strategy(payload: SimulationPayload[T], config: SimConfigur
     tree and operation chains are generated and executed in order per simulation time point. This reduces the amount of
     redundant, always-failing operation chains and redundant branches of the simulation tree.
 
+    If merge_duplicate_states is set in the configuration, payloads ending up in identical states at the end of a time
+    point are simulated further as one. They are expanded back into separate payloads for the result.
+
     :param payload: a simulation state payload
     :param config: a prepared SimConfiguration object
     :param evaluator: a function for performing computation from given EventTree and for given OperationPayload
     :return: a list of resulting simulation state payloads
     """
-    generators_by_time_point: dict[int, Generator[T]] = config.partial_tree_generators_by_time_point()
-    root_nodes: dict[int, EventTree[T]] = {}
-    results: list[SimulationPayload[T]] = [payload]
-
-    # build chains_by_time_point, which is a dict of chains
-    for time_point, nestable_generator in generators_by_time_point.items():
-        root_nodes[time_point] = nestable_generator.compose_nested()
-
-    for time_point in config.time_points:
-        root_node = root_nodes[time_point]
-        time_point_results: list[SimulationPayload[T]] = []
-        for payload_ in results:
-            payload_results = evaluator(payload_, root_node)
-            time_point_results.extend(payload_results)
-        results = time_point_results
+    return _run_partial_trees([payload], config, _block_evaluator(evaluator))[0]
+
+
+def run_partial_tree_strategy_for_block(payloads: list[SimulationPayload[T]], config: SimConfiguration[T],
+                                        evaluator: Evaluator[T] = chain_evaluator) -> list[list[SimulationPayload[T]]]:
+    """Process several payloads like run_partial_tree_strategy, advancing all of them through each time point before
+    the next one. With breadth_first_evaluator, the payloads at each time point are evaluated together."""
+    return _run_partial_trees(payloads, config, _block_evaluator(evaluator))
+
+
+def run_beam_search_strategy(payload: SimulationPayload[T], config: SimConfiguration[T],
+                             evaluator: Evaluator[T] = chain_evaluator
+                             ) -> list[SimulationPayload[T]]:
+    """Process the given operation payload like run_partial_tree_strategy, but keep only the beam_width best payloads
+    as ranked by beam_objective after each simulation time point. The amount of simulated alternatives grows linearly
+    with the amount of time points instead of exponentially, at the cost of discarding alternatives that rank low at
+    intermediate time points.
+
+    :param payload: a simulation state payload
+    :param config: a prepared SimConfiguration object with beam_width and beam_objective
+    :param evaluator: a function for performing computation from given EventTree and for given OperationPayload
+    :return: a list of resulting simulation state payloads
+    """
+    return run_beam_search_strategy_for_block([payload], config, evaluator)[0]
+
+
+def run_beam_search_strategy_for_block(payloads: list[SimulationPayload[T]], config: SimConfiguration[T],
+                                       evaluator: Evaluator[T] = chain_evaluator) -> list[list[SimulationPayload[T]]]:
+    """Process several payloads like run_beam_search_strategy, advancing all of them through each time point before
+    the next one. The beam is kept separately for each given payload."""
+    if config.beam_width is None or config.beam_objective is None:
+        raise MetsiException("Beam search formation strategy requires both beam_width and beam_objective")
+    select = partial(select_best_payloads, objective=config.beam_objective, width=config.beam_width)
+    return _run_partial_trees(payloads, config, _block_evaluator(evaluator), select)
+
+
+def select_best_payloads(payloads: list[SimulationPayload[T]],
+                         objective: Callable[[SimulationPayload[T]], float],
+                         width: int) -> list[SimulationPayload[T]]:
+    """Select the given amount of highest ranking payloads by the given objective function, preserving their order.
+    Ties are resolved in favour of earlier payloads and NaN ranks the lowest."""
+    if len(payloads) <= width:
+        return payloads
+    scores = [objective(payload) for payload in payloads]
+    scores = [float("-inf") if math.isnan(score) else score for score in scores]
+    best = sorted(range(len(payloads)), key=lambda i: scores[i], reverse=True)[:width]
+    return [payloads[i] for i in sorted(best)]
+
+
+def _run_partial_trees(payloads: list[SimulationPayload[T]],
+                       config: SimConfiguration[T],
+                       evaluator: BlockEvaluator[T],
+                       select: Optional[Callable[[list[SimulationPayload[T]]], list[SimulationPayload[T]]]] = None
+                       ) -> list[list[SimulationPayload[T]]]:
+    root_nodes: dict[int, EventTree[T]] = config.partial_event_trees_by_time_point()
+    stores = [_payload_store(payload, config) for payload in payloads]
+    try:
+        for time_point in config.time_points:
+            root_node = root_nodes[time_point]
+            in_memory = [payload_ for store in stores if not store.spilled for payload_ in store.payloads]
+            evaluated = iter(evaluator(in_memory, root_node))
+            time_point_stores: list[PayloadStore[T]] = []
+            for unit, store in enumerate(stores):
+                outputs: Iterator[tuple[SimulationPayload[T], list[SimulationPayload[T]]]]
+                if store.spilled:
+                    # the spilled payloads are read back and evaluated one at a time
+                    outputs = ((payload_, evaluator([payload_], root_node)[0]) for payload_ in store)
+                else:
+                    outputs = ((payload_, next(evaluated)) for payload_ in store.payloads)
+                time_point_stores.append(_collect_time_point_results(outputs, store.empty_like(), config, select,
+                                                                     unit, time_point))
+                store.close()
+            stores = time_point_stores
+        results = [list(store) for store in stores]
+    finally:
+        for store in stores:
+            store.close()
+    if config.merge_duplicate_states:
+        results = [expand_merged_payloads(unit_results) for unit_results in results]
     return results
 
 
+def _payload_store(payload: SimulationPayload[T], config: SimConfiguration[T]) -> PayloadStore[T]:
+    """A PayloadStore with the initial payload of a unit, spilling beyond the alternatives budget of the unit."""
+    budget = config.alternatives_budget
+    if config.memory_budget is not None:
+        state_bytes = max(len(pickle.dumps(payload.computational_unit)), 1)
+        memory_alternatives = max(config.memory_budget // state_bytes, 1)
+        budget = memory_alternatives if budget is None else min(budget, memory_alternatives)
+    if budget is None:
+        store = PayloadStore[T]()
+    else:
+        store = PayloadStore[T](budget, shared_components(payload), config.spill_directory)
+    store.append(payload)
+    return store
+
+
+def _collect_time_point_results(outputs: Iterator[tuple[SimulationPayload[T], list[SimulationPayload[T]]]],
+                                store: PayloadStore[T],
+                                config: SimConfiguration[T],
+                                select: Optional[Callable[[list[SimulationPayload[T]]], list[SimulationPayload[T]]]],
+                                unit: int,
+                                time_point: int) -> PayloadStore[T]:
+    """Collect the payloads evaluated from the payloads of a unit at a time point into the given store, merging and
+    selecting them. Spilled payloads are not merged. Raises SimulationAborted if the unit exceeds the alternatives
+    limit."""
+    limit = config.alternatives_limit
+    for payload_, payload_results in outputs:
+        if config.merge_duplicate_states:
+            for payload_result in payload_results:
+                payload_result.merged_histories = payload_.merged_histories
+        store.extend(payload_results)
+        if limit is not None and store.spilled and len(store) > limit:
+            break
+    if not store.spilled:
+        if config.merge_duplicate_states:
+            store.payloads = merge_duplicate_payloads(store.payloads, config.merge_collected_data)
+        if select is not None:
+            store.payloads = select(store.payloads)
+    elif select is not None:
+        selected = store.empty_like()
+        selected.extend(select(list(store)))
+        store.close()
+        store = selected
+    if limit is not None and len(store) > limit:
+        store.close()
+        raise SimulationAborted(f"over {limit} alternatives at time point {time_point}", unit)
+    return store
+
+
+def block_formation_strategy(formation_strategy: TreeRunner[T]) -> BlockTreeRunner[T]:
+    """The variant of the given formation strategy processing several payloads together. Other than the strategies of
+    this module are run for each payload separately.
+
+    :param formation_strategy: a TreeRunner
+    :return: a BlockTreeRunner
+    """
+    block_strategy = _BLOCK_FORMATION_STRATEGIES.get(formation_strategy)
+    if block_strategy is not None:
+        return block_strategy
+    return lambda payloads, config, evaluator: [formation_strategy(payload, config, evaluator) for payload in payloads]
+
+
+_BLOCK_FORMATION_STRATEGIES: dict[TreeRunner[Any], BlockTreeRunner[Any]] = {
+    run_full_tree_strategy: run_full_tree_strategy_for_block,
+    run_partial_tree_strategy: run_partial_tree_strategy_for_block,
+    run_beam_search_strategy: run_beam_search_strategy_for_block
+}
+
+
+def stream_units(units: list[T],
+                 config: SimConfiguration[T],
+                 formation_strategy: TreeRunner[T],
+                 evaluation_strategy: Evaluator[T],
+                 offset: int = 0) -> Iterator[tuple[str, list[SimulationPayload[T]]]]:
+    """Run the simulation for the given units one at a time, or in blocks of config.block_size units, yielding the
+    results for each unit as soon as they are ready. The results are keyed with the unit index, which is the position
+    of the unit in all units of the run. Wrappers running the units one at a time, such as process_pool_stream, pass
+    the position of the first given unit as the offset."""
+
+    def payload_for(unit: T) -> SimulationPayload[T]:
+        return SimulationPayload[T](
+            computational_unit=unit,
+            collected_data=CollectedData(initial_time_point=config.time_points[0]),
+            operation_history=OperationHistory())
+
+    blocks = run_in_blocks(units, config, formation_strategy, evaluation_strategy, payload_for)
+    for i, schedule_payloads in enumerate(blocks, offset):
+        if isinstance(schedule_payloads, SimulationAborted):
+            print_logline(f"Simulation of unit {i} aborted: {schedule_payloads}")
+            continue
+        print_logline(f"Alternatives for unit {i}: {len(schedule_payloads)}")
+        yield str(i), schedule_payloads
+
+
+def run_in_blocks(units: list[T],
+                  config: SimConfiguration[T],
+                  formation_strategy: TreeRunner[T],
+                  evaluation_strategy: Evaluator[T],
+                  payload_for: Callable[[T], SimulationPayload[T]]
+                  ) -> Iterator[list[SimulationPayload[T]] | SimulationAborted]:
+    """
+    Run the formation strategy for the payloads of the given units in blocks of config.block_size units, yielding the
+    results of each unit in order. The units of a block are simulated together with the block variant of the formation
+    strategy, see block_formation_strategy. Without a block size, the units are simulated one at a time.
+
+    A unit whose simulation is aborted yields the SimulationAborted exception with the reason instead of its results.
+
+    :param units: computational units
+    :param config: a prepared SimConfiguration object
+    :param formation_strategy: a TreeRunner
+    :param evaluation_strategy: an Evaluator
+    :param payload_for: function creating the initial simulation state payload of a unit
+    :return: iterator of the result payloads of each unit, or the reason of aborting it
+    """
+    block_size = config.block_size or 1
+    block_strategy = block_formation_strategy(formation_strategy)
+    for start in range(0, len(units), block_size):
+        yield from _run_block(units[start:start + block_size], config, formation_strategy, block_strategy,
+                              evaluation_strategy, payload_for)
+
+
+def _run_block(units: list[T],
+               config: SimConfiguration[T],
+               formation_strategy: TreeRunner[T],
+               block_strategy: BlockTreeRunner[T],
+               evaluation_strategy: Evaluator[T],
+               payload_for: Callable[[T], SimulationPayload[T]]
+               ) -> list[list[SimulationPayload[T]] | SimulationAborted]:
+    """Simulate a block of units. If the simulation of a unit is aborted, the rest of the block is simulated again
+    without it."""
+    results: dict[int, list[SimulationPayload[T]] | SimulationAborted] = {}
+    remaining = list(range(len(units)))
+    while remaining:
+        payloads = [payload_for(units[i]) for i in remaining]
+        try:
+            if len(payloads) == 1:
+                block_results = [formation_strategy(payloads[0], config, evaluation_strategy)]
+            else:
+                block_results = block_strategy(payloads, config, evaluation_strategy)
+        except SimulationAborted as e:
+            results[remaining.pop(e.unit)] = e
+            continue
+        results.update(zip(remaining, block_results))
+        break
+    return [results[i] for i in range(len(units))]
+
+
 def default_runner(units: list[T],
                    config: SimConfiguration[T],
                    formation_strategy: TreeRunner[T],
-                   evaluation_strategy: Evaluator[T]) -> dict[str, list[SimulationPayload[T]]]:
-    retval: dict[str, list[SimulationPayload[T]]] = {}
-    for i, unit in enumerate(units):
-        payload = SimulationPayload[T](
-            computational_unit=unit,
-            collected_data=CollectedData(initial_time_point=config.time_points[0]),
-            operation_history=[])
+                   evaluation_strategy: Evaluator[T],
+                   offset: int = 0) -> dict[str, list[SimulationPayload[T]]]:
+    return dict(stream_units(units, config, formation_strategy, evaluation_strategy, offset))
 
-        schedule_payloads = formation_strategy(payload, config, evaluation_strategy)
+# statistics reported by wrappers such as failure_counting_stream for the units run inside another wrapper or a worker
+# process of process_pool_stream, to be summarized by the outermost wrapper or the parent process, see _report
+_reports: Optional[list[FailureStatistics | Instrumentation]] = None
 
-        print_logline(f"Alternatives for unit {i}: {len(schedule_payloads)}")
-        retval[str(i)] = schedule_payloads
-    return retval
+_worker_context: Optional[tuple[Runner[Any] | StreamingRunner[Any],
+                                SimConfiguration[Any],
+                                TreeRunner[Any],
+                                Evaluator[Any]]] = None
+
+
+def _init_worker(runner: Runner[T] | StreamingRunner[T],
+                 config: SimConfiguration[T],
+                 formation_strategy: TreeRunner[T],
+                 evaluation_strategy: Evaluator[T]):
+    global _worker_context  # pylint: disable=global-statement
+    _worker_context = (runner, config, formation_strategy, evaluation_strategy)
+
+
+def _run_in_worker(index: int, unit: T) -> tuple[list[tuple[str, list[SimulationPayload[T]]]],
+                                                  list[FailureStatistics | Instrumentation]]:
+    """Run a single unit in a worker process, returning its results and the statistics reported for it."""
+    if _worker_context is None:
+        raise MetsiException("Worker process has not been initialized with a simulation context")
+    runner, config, formation_strategy, evaluation_strategy = _worker_context
+    reports: list[FailureStatistics | Instrumentation] = []
+    results = _run_reporting(reports, runner, index, unit, config, formation_strategy, evaluation_strategy)
+    return results, reports
+
+
+def _run_single_unit(runner: Runner[T] | StreamingRunner[T],
+                     index: int,
+                     unit: T,
+                     config: SimConfiguration[T],
+                     formation_strategy: TreeRunner[T],
+                     evaluation_strategy: Evaluator[T]) -> list[tuple[str, list[SimulationPayload[T]]]]:
+    """Run the given runner for a single unit list. The index is the position of the unit in all units of the run,
+    passed to the runner as the offset, so that runners keying the results with the unit index, such as
+    default_runner, key them as if all units were run in a single call."""
+    result = runner([unit], config, formation_strategy, evaluation_strategy, index)
+    return list(result.items() if isinstance(result, dict) else result)
+
+
+def _run_reporting(reports: list[FailureStatistics | Instrumentation],
+                   runner: Runner[T] | StreamingRunner[T],
+                   index: int,
+                   unit: T,
+                   config: SimConfiguration[T],
+                   formation_strategy: TreeRunner[T],
+                   evaluation_strategy: Evaluator[T]) -> list[tuple[str, list[SimulationPayload[T]]]]:
+    """As _run_single_unit, collecting the statistics reported by the wrappers in the runner into the given list."""
+    global _reports  # pylint: disable=global-statement
+    previous = _reports
+    _reports = reports
+    try:
+        return _run_single_unit(runner, index, unit, config, formation_strategy, evaluation_strategy)
+    finally:
+        _reports = previous
+
+
+def _report(statistics: list[FailureStatistics | Instrumentation]):
+    """Log the summaries of the given statistics, merged by their type. Inside another wrapper or a worker process, the
+    statistics are passed on to it instead, so that they are summarized once for all units."""
+    if _reports is not None:
+        _reports.extend(statistics)
+        return
+    instrumentation = Instrumentation()
+    failure_statistics = FailureStatistics()
+    for item in statistics:
+        if isinstance(item, Instrumentation):
+            instrumentation.merge(item)
+        else:
+            failure_statistics.merge(item)
+    for line in [*instrumentation.summary(), *failure_statistics.summary()]:
+        print_logline(line)
+
+
+def process_pool_stream(runner: Runner[T] | StreamingRunner[T], workers: Optional[int] = None) -> StreamingRunner[T]:
+    """Wrap the given runner to distribute units over a pool of worker processes. Each unit is run separately with the
+    wrapped runner and the results are yielded in the original unit order. The amount of finished results waiting to
+    be consumed is bounded by the number of workers.
+
+    Every worker call sees a single unit list. The wrapped runner must key its results by an identifier intrinsic to
+    the unit (such as the stand identifier), or by the unit index like default_runner, see _run_single_unit. Worker
+    processes are forked so that the simulation declaration is inherited as is and does not need to be picklable. On
+    platforms without fork, such as Windows, a MetsiException is raised when wrapping the runner. The simulation
+    results are pickled back to the parent process, along with the statistics of wrappers such as
+    failure_counting_stream, which are summarized in the parent process after the last unit.
+
+    :param runner: a Runner or StreamingRunner to use for running single units in the worker processes
+    :param workers: number of worker processes, defaults to the number of CPUs available
+    :return: a StreamingRunner
+    :raises MetsiException: if the platform does not support forking processes
+    """
+    if "fork" not in multiprocessing.get_all_start_methods():
+        raise MetsiException("Multiprocessing requires forking worker processes, which this platform does not "
+                             "support. Run the simulation without multiprocessing.")
+
+    def pooled_stream(units: list[T],
+                      config: SimConfiguration[T],
+                      formation_strategy: TreeRunner[T],
+                      evaluation_strategy: Evaluator[T],
+                      offset: int = 0) -> Iterator[tuple[str, list[SimulationPayload[T]]]]:
+        processes = workers or os.cpu_count() or 1
+        context = multiprocessing.get_context("fork")
+        with context.Pool(processes=processes,
+                          initializer=_init_worker,
+                          initargs=(runner, config, formation_strategy, evaluation_strategy)) as pool:
+            pending: deque[AsyncResult] = deque()
+            reports: list[FailureStatistics | Instrumentation] = []
+
+            def results_of(result: AsyncResult) -> list[tuple[str, list[SimulationPayload[T]]]]:
+                unit_results, unit_reports = result.get()
+                reports.extend(unit_reports)
+                return unit_results
+
+            for i, unit in enumerate(units, offset):
+                pending.append(pool.apply_async(_run_in_worker, (i, unit)))
+                if len(pending) >= 2 * processes:
+                    yield from results_of(pending.popleft())
+            while pending:
+                yield from results_of(pending.popleft())
+        _report(reports)
+    return pooled_stream
+
+
+def process_pool_runner(runner: Runner[T] | StreamingRunner[T], workers: Optional[int] = None) -> Runner[T]:
+    """Wrap the given runner to distribute units over a pool of worker processes, collecting the results in the
+    original unit order. See process_pool_stream.
+
+    :param runner: a Runner or StreamingRunner to use for running single units in the worker processes
+    :param workers: number of worker processes, defaults to the number of CPUs available
+    :return: a Runner with the same signature as the wrapped one
+    """
+    stream = process_pool_stream(runner, workers)
+
+    def pooled_runner(units: list[T],
+                      config: SimConfiguration[T],
+                      formation_strategy: TreeRunner[T],
+                      evaluation_strategy: Evaluator[T],
+                      offset: int = 0) -> dict[str, list[SimulationPayload[T]]]:
+        retval: dict[str, list[SimulationPayload[T]]] = {}
+        for identifier, schedule_payloads in stream(units, config, formation_strategy, evaluation_strategy, offset):
+            if identifier in retval:
+                raise MetsiException(f"Duplicate result identifier '{identifier}' from parallel runner")
+            retval[identifier] = schedule_payloads
+        return retval
+    return pooled_runner
+
+
+def instrumented_stream(runner: Runner[T] | StreamingRunner[T],
+                        trace_directory: Optional[str | Path] = None) -> StreamingRunner[T]:
+    """Wrap the given runner to measure the processed treatments of each unit with an Instrumentation. A summary of the
+    statistics over all units is logged after the last unit. If given a trace directory, a Chrome trace file of each
+    unit is written there, named by the result identifier.
+
+    Like process_pool_stream, every call of the wrapped runner sees a single unit list. When combined with
+    process_pool_stream, this wrapper should be the inner one, so that the measuring happens in the worker processes.
+    The statistics of each worker are then sent back to the parent process and merged there, which logs the summary.
+
+    :param runner: a Runner or StreamingRunner to measure
+    :param trace_directory: optional directory for trace files
+    :return: a StreamingRunner
+    """
+    def stream(units: list[T],
+               config: SimConfiguration[T],
+               formation_strategy: TreeRunner[T],
+               evaluation_strategy: Evaluator[T],
+               offset: int = 0) -> Iterator[tuple[str, list[SimulationPayload[T]]]]:
+        total = Instrumentation()
+        reports: list[FailureStatistics | Instrumentation] = [total]
+        if trace_directory is not None:
+            Path(trace_directory).mkdir(parents=True, exist_ok=True)
+        for i, unit in enumerate(units, offset):
+            hooks = Instrumentation(tracing=trace_directory is not None)
+            previous = activate(hooks)
+            try:
+                results = _run_reporting(reports, runner, i, unit, config, formation_strategy, evaluation_strategy)
+            finally:
+                activate(previous)
+            total.merge(hooks)
+            if trace_directory is not None:
+                for identifier, _ in results:
+                    hooks.write_trace(Path(trace_directory, f"{identifier}.trace.json"))
+            yield from results
+        _report(reports)
+    return stream
+
+
+def instrumented_runner(runner: Runner[T] | StreamingRunner[T],
+                        trace_directory: Optional[str | Path] = None) -> Runner[T]:
+    """Wrap the given runner to measure the processed treatments of each unit, collecting the results into a dict.
+    See instrumented_stream.
+
+    :param runner: a Runner or StreamingRunner to measure
+    :param trace_directory: optional directory for trace files
+    :return: a Runner
+    """
+    stream = instrumented_stream(runner, trace_directory)
+
+    def instrumented(units: list[T],
+                     config: SimConfiguration[T],
+                     formation_strategy: TreeRunner[T],
+                     evaluation_strategy: Evaluator[T],
+                     offset: int = 0) -> dict[str, list[SimulationPayload[T]]]:
+        return dict(stream(units, config, formation_strategy, evaluation_strategy, offset))
+    return instrumented
+
+
+def failure_counting_stream(runner: Runner[T] | StreamingRunner[T],
+                            target_directory: Optional[str | Path] = None) -> StreamingRunner[T]:
+    """Wrap the given runner to count the branch failures of each unit by treatment, time point and phase with a
+    FailureStatistics. A summary of the counts over all units is logged after the last unit, by the outermost wrapper
+    or the parent process of process_pool_stream. If given a target directory, the counts of each unit are written
+    there as JSON, named by the result identifier.
+
+    Like instrumented_stream, this wrapper should be inside process_pool_stream when combined with it.
+
+    :param runner: a Runner or StreamingRunner to count the failures of
+    :param target_directory: optional directory for the failure count files
+    :return: a StreamingRunner
+    """
+    def stream(units: list[T],
+               config: SimConfiguration[T],
+               formation_strategy: TreeRunner[T],
+               evaluation_strategy: Evaluator[T],
+               offset: int = 0) -> Iterator[tuple[str, list[SimulationPayload[T]]]]:
+        total = FailureStatistics()
+        reports: list[FailureStatistics | Instrumentation] = [total]
+        if target_directory is not None:
+            Path(target_directory).mkdir(parents=True, exist_ok=True)
+        for i, unit in enumerate(units, offset):
+            statistics = FailureStatistics()
+            previous = failures.activate(statistics)
+            try:
+                results = _run_reporting(reports, runner, i, unit, config, formation_strategy, evaluation_strategy)
+            finally:
+                failures.activate(previous)
+            total.merge(statistics)
+            if target_directory is not None:
+                for identifier, _ in results:
+                    statistics.write(Path(target_directory, f"{identifier}.failures.json"))
+            yield from results
+        _report(reports)
+    return stream
+
+
+def failure_counting_runner(runner: Runner[T] | StreamingRunner[T],
+                            target_directory: Optional[str | Path] = None) -> Runner[T]:
+    """Wrap the given runner to count the branch failures of each unit, collecting the results into a dict. See
+    failure_counting_stream.
+
+    :param runner: a Runner or StreamingRunner to count the failures of
+    :param target_directory: optional directory for the failure count files
+    :return: a Runner
+    """
+    stream = failure_counting_stream(runner, target_directory)
+
+    def counting(units: list[T],
+                 config: SimConfiguration[T],
+                 formation_strategy: TreeRunner[T],
+                 evaluation_strategy: Evaluator[T],
+                 offset: int = 0) -> dict[str, list[SimulationPayload[T]]]:
+        return dict(stream(units, config, formation_strategy, evaluation_strategy, offset))
+    return counting
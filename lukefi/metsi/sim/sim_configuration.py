@@ -1,6 +1,10 @@
+from collections.abc import Callable
 from types import SimpleNamespace
+from typing import Optional
+from lukefi.metsi.sim.event_tree import EventTree, fuse_linear_runs
 from lukefi.metsi.sim.simulation_instruction import SimulationInstruction, generator_declarations_for_time_point
 from lukefi.metsi.sim.generators import Generator, Sequence
+from lukefi.metsi.sim.simulation_payload import SimulationPayload
 
 
 class SimConfiguration[T](SimpleNamespace):
@@ -10,12 +14,41 @@ class SimConfiguration[T](SimpleNamespace):
     Attributes:
         instructions: A list of instructions for the simulation.
         time_points: A sorted list of unique time points derived from the simulation instructions.
+        merge_duplicate_states: Collapse identical payloads between time points in the partial tree strategy.
+        merge_collected_data: Collected data tags compared when merging duplicate states. All if None.
+        beam_width: Number of payloads kept after each time point in the beam search strategy.
+        beam_objective: Function ranking payloads in the beam search strategy. Higher is better.
+        fuse_linear_events: Process linear runs of events without branching as single steps, see fuse_linear_runs.
+        block_size: Number of computational units the runners simulate together, see block_formation_strategy.
+        alternatives_budget: Number of payloads of a unit kept in memory between time points in the partial tree
+            strategies. The rest are spilled to a temporary file, see PayloadStore.
+        memory_budget: Bytes of payloads of a unit kept in memory between time points, estimated by the pickled size
+            of the initial state of the unit. Limits the alternatives_budget.
+        spill_directory: Directory of the temporary files of spilled payloads. The system default if None.
+        alternatives_limit: Number of payloads of a unit after a time point in the partial tree strategies beyond which
+            the simulation of the unit is aborted with SimulationAborted.
     Methods:
         __init__(**kwargs):
             Initializes the SimConfiguration instance with keyword arguments.
+        full_event_tree():
+            The EventTree of the full simulation, composed once and shared by all computational units.
+        partial_event_trees_by_time_point():
+            The EventTrees of each time point, composed once and shared by all computational units.
     """
     instructions: list[SimulationInstruction[T]] = []
     time_points: list[int] = []
+    merge_duplicate_states: bool = False
+    merge_collected_data: Optional[list[str]] = None
+    beam_width: Optional[int] = None
+    beam_objective: Optional[Callable[[SimulationPayload[T]], float]] = None
+    fuse_linear_events: bool = True
+    block_size: Optional[int] = None
+    alternatives_budget: Optional[int] = None
+    memory_budget: Optional[int] = None
+    spill_directory: Optional[str] = None
+    alternatives_limit: Optional[int] = None
+    _full_event_tree: Optional[EventTree[T]] = None
+    _partial_event_trees: Optional[dict[int, EventTree[T]]] = None
 
     def __init__(self, **kwargs):
         """
@@ -33,6 +66,8 @@ class SimConfiguration[T](SimpleNamespace):
             source_time_points = instruction.time_points
             time_points.update(source_time_points)
         self.time_points = sorted(time_points)
+        self._full_event_tree = None
+        self._partial_event_trees = None
 
     def full_tree_generators(self) -> Generator[T]:
         """
@@ -62,3 +97,31 @@ class SimConfiguration[T](SimpleNamespace):
             sequence_wrapper_declaration: Generator[T] = Sequence(generator_declarations, time_point)
             generators_by_time_point[time_point] = sequence_wrapper_declaration
         return generators_by_time_point
+
+    def full_event_tree(self) -> EventTree[T]:
+        """
+        Compose the EventTree of the full simulation on first use and reuse it on subsequent calls. The tree is
+        shared by all computational units in the simulation run and must not be modified.
+
+        :return: the root node of the full simulation EventTree
+        """
+        if self._full_event_tree is None:
+            self._full_event_tree = self._compiled(self.full_tree_generators().compose_nested())
+        return self._full_event_tree
+
+    def partial_event_trees_by_time_point(self) -> dict[int, EventTree[T]]:
+        """
+        Compose the EventTrees of each time point on first use and reuse them on subsequent calls. The trees are
+        shared by all computational units in the simulation run and must not be modified.
+
+        :return: a dict of EventTree root nodes keyed by their time_point in the simulation
+        """
+        if self._partial_event_trees is None:
+            self._partial_event_trees = {
+                time_point: self._compiled(generator.compose_nested())
+                for time_point, generator in self.partial_tree_generators_by_time_point().items()
+            }
+        return self._partial_event_trees
+
+    def _compiled(self, root: EventTree[T]) -> EventTree[T]:
+        return fuse_linear_runs(root) if self.fuse_linear_events else root
@@ -1,20 +1,184 @@
-from collections.abc import Callable
+from array import array
+from collections.abc import Callable, Hashable, Iterable, Iterator
 from copy import copy, deepcopy
 from types import SimpleNamespace
-from typing import TYPE_CHECKING, TypeVar
+from typing import TYPE_CHECKING, Any, Optional, TypeVar
 
 from lukefi.metsi.data.layered_model import LayeredObject, PossiblyLayered
-from lukefi.metsi.sim.collected_data import CollectedData
+from lukefi.metsi.sim.collected_data import AppendOnlyList, CollectedData
+from lukefi.metsi.sim.failures import BranchFailure
 if TYPE_CHECKING:
     from lukefi.metsi.sim.generators import TreatmentFn
 
+HistoryEntry = tuple[int, "TreatmentFn[Any]", dict[str, dict]]
+# operation history of a payload merged into another one, the length of the operation history of the other payload at
+# the time of merging, and the collected data of the merged payload paired with that of the other payload at the time
+# of merging, or None if their collected data was equal. See sim.state_merging
+MergedHistory = tuple[list[HistoryEntry], int, Optional[tuple[CollectedData, CollectedData]]]
+
+
+def _typed_key(value: Any) -> Hashable:
+    """The value paired with its type, so that equal values of different types such as 1, 1.0 and True differ."""
+    if isinstance(value, tuple):
+        return tuple, tuple(_typed_key(item) for item in value)
+    return type(value), value
+
+
+def _parameters_key(parameters: dict[str, Any]) -> Optional[Hashable]:
+    """A hashable key equal for equal parameter sets of equal types, or None for parameter values that are not
+    hashable."""
+    try:
+        key = tuple(sorted((name, _typed_key(value)) for name, value in parameters.items()))
+        hash(key)
+        return key
+    except TypeError:
+        return None
+
+
+class EventTable:
+    """
+    The distinct operation history entries of the simulation of a computational unit, numbered in the order they are
+    first appended. OperationHistory stores the numbers of its entries, so that the histories of all alternatives share
+    a single entry tuple for each event. Equal parameter sets of the same event are interned into a single entry even
+    if given as separate dicts, as long as their values are also of the same types.
+    """
+
+    __slots__ = ('entries', '_ids', '_ids_by_value')
+
+    entries: list[HistoryEntry]
+    # entry numbers by time point, treatment and the id of the parameter dict of the entry
+    _ids: dict[tuple[int, "TreatmentFn[Any]", int], int]
+    _ids_by_value: dict[tuple[int, "TreatmentFn[Any]", Hashable], int]
+
+    def __init__(self, entries: Iterable[HistoryEntry] = ()):
+        self.entries = []
+        self._ids = {}
+        self._ids_by_value = {}
+        for entry in entries:
+            self.event_id(entry)
+
+    def event_id(self, entry: HistoryEntry) -> int:
+        """The number of the given entry, adding it to the table if it is not there yet."""
+        time_point, treatment, parameters = entry
+        key = (time_point, treatment, id(parameters))
+        event_id = self._ids.get(key)
+        if event_id is not None and self.entries[event_id][2] is parameters:
+            return event_id
+        value_key = _parameters_key(parameters)
+        event_id = None if value_key is None else self._ids_by_value.get((time_point, treatment, value_key))
+        if event_id is None:
+            event_id = len(self.entries)
+            self.entries.append((time_point, treatment, parameters))
+            if value_key is not None:
+                self._ids_by_value[(time_point, treatment, value_key)] = event_id
+        if self.entries[event_id][2] is parameters:
+            self._ids[key] = event_id
+        return event_id
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __reduce__(self):
+        return EventTable, (self.entries,)
+
+
+class OperationHistory(AppendOnlyList[int]):
+    """
+    Operation history of a simulation payload as (time point, treatment, parameters) entries. The history stores the
+    numbers of its entries in an EventTable shared with its copies, and decodes them back to entries when iterated or
+    indexed. The numbers are shared with copies of the history as in AppendOnlyList, and the last run time point of
+    each treatment is indexed as entries are appended, so that history based conditions need not scan the history.
+
+    Pickles as the event table and the entry numbers packed into bytes, so that the histories of a computational unit
+    pickled together store each entry once.
+    """
+
+    __slots__ = ('_last_runs', '_table')
+
+    _last_runs: dict["TreatmentFn[Any]", int]
+    _table: Optional[EventTable]
+
+    def __init__(self, items: Iterable[HistoryEntry] = (), table: Optional[EventTable] = None,
+                 event_ids: Iterable[int] = ()):
+        """
+        :param items: the initial entries
+        :param table: the EventTable to number the entries with, a new one if None
+        :param event_ids: initial entries preceding the items, as their numbers in the table, see event_ids
+        """
+        super().__init__(event_ids)
+        self._last_runs = {}
+        self._table = table
+        for time_point, treatment, _ in self:
+            self._last_runs[treatment] = time_point
+        self.extend(items)
+
+    @property
+    def table(self) -> EventTable:
+        if self._table is None:
+            self._table = EventTable()
+        return self._table
+
+    def append(self, item: HistoryEntry):  # type: ignore[override]
+        self._tail.append(self.table.event_id(item))
+        self._last_runs[item[1]] = item[0]
+
+    def extend(self, items: Iterable[HistoryEntry]):  # type: ignore[override]
+        for item in items:
+            self.append(item)
+
+    def event_ids(self) -> list[int]:
+        """The entry numbers of the history, see EventTable."""
+        return list(super().__iter__())
+
+    def __iter__(self) -> Iterator[HistoryEntry]:  # type: ignore[override]
+        entries = self.table.entries
+        for event_id in super().__iter__():
+            yield entries[event_id]
+
+    def __getitem__(self, index: int | slice) -> Any:
+        if isinstance(index, slice):
+            return list(self)[index]
+        return self.table.entries[super().__getitem__(index)]
+
+    def __copy__(self) -> "OperationHistory":
+        copied = type(self)(table=self.table)
+        copied._chunks = self._shared_chunks()
+        copied._last_runs = dict(self._last_runs)
+        return copied
+
+    def __deepcopy__(self, memo: dict) -> "OperationHistory":
+        _ = memo
+        return self.__copy__()
+
+    def __reduce__(self):
+        table = self.table
+        typecode = 'B' if len(table) <= 0xFF else 'H' if len(table) <= 0xFFFF else 'I'
+        return _restore_history, (table, typecode, array(typecode, super().__iter__()).tobytes())
+
+    def last_run(self, treatment: "TreatmentFn[Any]") -> Optional[int]:
+        """Time point of the latest entry of the given treatment, or None if it has not been run."""
+        return self._last_runs.get(treatment)
+
+    def last_runs(self) -> dict["TreatmentFn[Any]", int]:
+        """Time points of the latest entries of each treatment in the history."""
+        return dict(self._last_runs)
+
+
+def _restore_history(table: EventTable, typecode: str, data: bytes) -> OperationHistory:
+    event_ids = array(typecode)
+    event_ids.frombytes(data)
+    return OperationHistory(table=table, event_ids=event_ids.tolist())
+
 
 class SimulationPayload[T](SimpleNamespace):
     """Data structure for keeping simulation state and progress data. Passed on as the data package of chained
     operation calls. """
     computational_unit: PossiblyLayered[T]
     collected_data: CollectedData
-    operation_history: list[tuple[int, "TreatmentFn[T]", dict[str, dict]]]
+    # a plain list or an OperationHistory, which payloads use after the first copy or processed treatment
+    operation_history: list[tuple[int, "TreatmentFn[T]", dict[str, dict]]] | OperationHistory
+    # operation histories of duplicate states merged into this payload, see sim.state_merging
+    merged_histories: list[MergedHistory] = []
 
     def __copy__(self) -> "SimulationPayload[T]":
         copy_like: PossiblyLayered[T]
@@ -28,8 +192,10 @@ class SimulationPayload[T](SimpleNamespace):
         return SimulationPayload(
             computational_unit=copy_like,
             collected_data=copy(self.collected_data),
-            operation_history=list(self.operation_history)
+            operation_history=copy(self.operation_history)
+            if isinstance(self.operation_history, OperationHistory)
+            else OperationHistory(self.operation_history)
         )
 
 T = TypeVar("T")
-ProcessedTreatment = Callable[[SimulationPayload[T]], SimulationPayload[T]]
+ProcessedTreatment = Callable[[SimulationPayload[T]], SimulationPayload[T] | BranchFailure]
@@ -1,26 +1,43 @@
-from typing import Any
+from collections.abc import Iterator
+from pathlib import Path
+from typing import Any, Optional
 from lukefi.metsi.app.app_io import MetsiConfiguration
 from lukefi.metsi.app.metsi_enum import FormationStrategy, EvaluationStrategy
 from lukefi.metsi.sim.runners import (
     Runner,
+    StreamingRunner,
     default_runner,
+    process_pool_runner,
+    process_pool_stream,
+    instrumented_runner,
+    instrumented_stream,
+    failure_counting_runner,
+    failure_counting_stream,
+    stream_units,
     run_full_tree_strategy,
     run_partial_tree_strategy,
+    run_beam_search_strategy,
     depth_first_evaluator,
-    chain_evaluator)
+    chain_evaluator,
+    breadth_first_evaluator)
 from lukefi.metsi.app.utils import MetsiException
+from lukefi.metsi.sim.cost_model import static_alternatives
+from lukefi.metsi.domain.utils.collectives import collective_objective
 from lukefi.metsi.sim.runners import Evaluator
 from lukefi.metsi.sim.runners import TreeRunner
 from lukefi.metsi.sim.sim_configuration import SimConfiguration
+from lukefi.metsi.sim.simulation_payload import SimulationPayload
 
 _FORMATION_STRATEGY_MAP: dict[FormationStrategy, TreeRunner] = {
     FormationStrategy.FULL: run_full_tree_strategy,
-    FormationStrategy.PARTIAL: run_partial_tree_strategy
+    FormationStrategy.PARTIAL: run_partial_tree_strategy,
+    FormationStrategy.BEAM: run_beam_search_strategy
 }
 
 _EVALUATION_STRATEGY_MAP: dict[EvaluationStrategy, Evaluator] = {
     EvaluationStrategy.DEPTH: depth_first_evaluator,
-    EvaluationStrategy.CHAINS: chain_evaluator
+    EvaluationStrategy.CHAINS: chain_evaluator,
+    EvaluationStrategy.BREADTH: breadth_first_evaluator
 }
 
 
@@ -28,13 +45,81 @@ def simulate_alternatives[T](config: MetsiConfiguration,
                              control: dict[str, Any],
                              stands: list[T],
                              runner: Runner[T] = default_runner):
-    simconfig = SimConfiguration[T](**control)
+    simconfig: SimConfiguration[T] = _simulation_configuration(config, control)
+    _compose_event_trees(simconfig, config.formation_strategy)
     formation_strategy = _resolve_formation_strategy(config.formation_strategy)
     evaluation_strategy = _resolve_evaluation_strategy(config.evaluation_strategy)
-    result = runner(stands, simconfig, formation_strategy, evaluation_strategy)
+    if config.failure_statistics:
+        runner = failure_counting_runner(runner, _failures_directory(config))
+    if config.instrumentation:
+        runner = instrumented_runner(runner, _trace_directory(config))
+    if config.multiprocessing:
+        runner = process_pool_runner(runner, config.multiprocessing_workers)
+    result = runner(stands, simconfig, formation_strategy, evaluation_strategy, 0)
     return result
 
 
+def stream_alternatives[T](config: MetsiConfiguration,
+                           control: dict[str, Any],
+                           stands: list[T],
+                           runner: StreamingRunner[T] = stream_units
+                           ) -> Iterator[tuple[str, list[SimulationPayload[T]]]]:
+    """Like simulate_alternatives, but yields the results for one unit at a time instead of collecting all of them."""
+    simconfig: SimConfiguration[T] = _simulation_configuration(config, control)
+    _compose_event_trees(simconfig, config.formation_strategy)
+    formation_strategy = _resolve_formation_strategy(config.formation_strategy)
+    evaluation_strategy = _resolve_evaluation_strategy(config.evaluation_strategy)
+    if config.failure_statistics:
+        runner = failure_counting_stream(runner, _failures_directory(config))
+    if config.instrumentation:
+        runner = instrumented_stream(runner, _trace_directory(config))
+    if config.multiprocessing:
+        runner = process_pool_stream(runner, config.multiprocessing_workers)
+    return runner(stands, simconfig, formation_strategy, evaluation_strategy, 0)
+
+
+def simulation_alternatives(config: MetsiConfiguration, control: dict[str, Any]) -> int:
+    """Upper bound of the amount of alternatives a single unit can produce with the given configuration and control,
+    see static_alternatives."""
+    simconfig: SimConfiguration[Any] = _simulation_configuration(config, control)
+    beam_width = config.beam_width if config.formation_strategy == FormationStrategy.BEAM else None
+    return static_alternatives(simconfig, beam_width)
+
+
+def _simulation_configuration[T](config: MetsiConfiguration, control: dict[str, Any]) -> SimConfiguration[T]:
+    simconfig = SimConfiguration[T](**control)
+    simconfig.merge_duplicate_states = bool(config.merge_duplicate_states)
+    simconfig.merge_collected_data = config.merge_collected_data
+    simconfig.beam_width = config.beam_width
+    simconfig.block_size = config.block_size
+    simconfig.alternatives_budget = config.alternatives_budget
+    if config.memory_budget is not None:
+        simconfig.memory_budget = config.memory_budget * 2**20
+    simconfig.alternatives_limit = config.alternatives_limit
+    if config.beam_objective is not None:
+        simconfig.beam_objective = collective_objective(config.beam_objective)
+    return simconfig
+
+
+def _trace_directory(config: MetsiConfiguration) -> Optional[Path]:
+    if config.instrumentation_trace:
+        return Path(config.target_directory, "traces")
+    return None
+
+
+def _failures_directory(config: MetsiConfiguration) -> Path:
+    return Path(config.target_directory, "failures")
+
+
+def _compose_event_trees(simconfig: SimConfiguration, formation_strategy: FormationStrategy):
+    """Compose the EventTrees used by the formation strategy up front, so that all stands and worker processes share
+    them instead of composing their own."""
+    if formation_strategy == FormationStrategy.FULL:
+        simconfig.full_event_tree()
+    else:
+        simconfig.partial_event_trees_by_time_point()
+
+
 def _resolve_formation_strategy(source: FormationStrategy) -> TreeRunner:
     if source in _FORMATION_STRATEGY_MAP:
         return _FORMATION_STRATEGY_MAP[source]
@@ -0,0 +1,137 @@
+import pickle
+from collections.abc import Hashable
+from copy import copy
+from typing import Any, Optional
+
+from lukefi.metsi.data.layered_model import LayeredObject
+from lukefi.metsi.sim.collected_data import AppendOnlyList, CollectedData
+from lukefi.metsi.sim.simulation_payload import HistoryEntry, OperationHistory, SimulationPayload
+
+
+def _plain_state(value: Any) -> Any:
+    """Replace LayeredObjects in the given value with their effective attribute values, so that equal states produce
+    equal pickles regardless of how their layers are stacked."""
+    if isinstance(value, LayeredObject):
+        return {key: _plain_state(attribute) for key, attribute in value.flattened_attributes().items()}
+    if isinstance(value, list):
+        return [_plain_state(item) for item in value]
+    return value
+
+
+def payload_fingerprint[T](payload: SimulationPayload[T], collected_data_tags: Optional[list[str]] = None) -> Hashable:
+    """
+    Fingerprint of the simulation state carried by the payload. Payloads with equal fingerprints evolve identically
+    in the rest of the simulation.
+
+    The fingerprint consists of the computational unit, the collected data under the given tags (all collected data if
+    not given) and the last run time point of each treatment in the operation history, which is what history based
+    conditions such as MinimumTimeInterval depend on.
+
+    :param payload: a simulation state payload
+    :param collected_data_tags: collected data tags relevant to the rest of the simulation
+    :return: a hashable fingerprint
+    """
+    operation_results = payload.collected_data.operation_results
+    if collected_data_tags is not None:
+        operation_results = {tag: operation_results[tag] for tag in collected_data_tags if tag in operation_results}
+    if isinstance(payload.operation_history, OperationHistory):
+        last_runs = payload.operation_history.last_runs()
+    else:
+        last_runs = {treatment: time_point for time_point, treatment, _ in payload.operation_history}
+    state = pickle.dumps((_plain_state(payload.computational_unit), operation_results), protocol=5)
+    return state, frozenset(last_runs.items())
+
+
+def merge_duplicate_payloads[T](payloads: list[SimulationPayload[T]],
+                                collected_data_tags: Optional[list[str]] = None) -> list[SimulationPayload[T]]:
+    """
+    Collapse payloads with equal fingerprints into the first one of them. The operation histories of the collapsed
+    payloads are kept in the merged_histories of the remaining payload, paired with the length of its own operation
+    history at the time of merging. With collected_data_tags, the collapsed payloads may differ in the other collected
+    data, so their own collected data is kept as well. See expand_merged_payloads.
+
+    :param payloads: simulation state payloads at the same time point
+    :param collected_data_tags: collected data tags relevant to the rest of the simulation
+    :return: list of distinct payloads
+    """
+    distinct: dict[Hashable, SimulationPayload[T]] = {}
+    for payload in payloads:
+        fingerprint = payload_fingerprint(payload, collected_data_tags)
+        representative = distinct.get(fingerprint)
+        if representative is None:
+            distinct[fingerprint] = payload
+            continue
+        merge_point = len(representative.operation_history)
+        merged_into = None if collected_data_tags is None else copy(representative.collected_data)
+        representative.merged_histories = [
+            *representative.merged_histories,
+            *((history, merge_point,
+               None if merged_into is None or collected_data is None else (collected_data, merged_into))
+              for history, collected_data in _merged_states_until_now(payload, include_own=True))
+        ]
+    return list(distinct.values())
+
+
+def _merged_states_until_now[T](payload: SimulationPayload[T],
+                                include_own: bool = False) -> list[tuple[list[HistoryEntry], Optional[CollectedData]]]:
+    """The operation histories merged into the payload, continued with the entries of the payload since merging, and
+    their own collected data continued the same way, or None if it is that of the payload. Preceded by the history and
+    collected data of the payload itself if include_own is set."""
+    own_history: list[HistoryEntry] = list(iter(payload.operation_history))
+    states: list[tuple[list[HistoryEntry], Optional[CollectedData]]] = \
+        [(own_history, payload.collected_data)] if include_own else []
+    for history, merge_point, collected_data in payload.merged_histories:
+        states.append((history + own_history[merge_point:],
+                       None if collected_data is None else _continued_data(*collected_data, payload.collected_data)))
+    return states
+
+
+def _continued_data(own: CollectedData, merged_into: CollectedData, current: CollectedData) -> CollectedData:
+    """
+    The collected data of a merged payload, continued with the data collected since merging by the payload it was
+    merged into.
+
+    :param own: collected data of the merged payload at the time of merging
+    :param merged_into: collected data of the payload it was merged into, at the time of merging
+    :param current: collected data of the payload it was merged into, now
+    :return: a new CollectedData
+    """
+    continued = copy(own)
+    for tag, value in current.operation_results.items():
+        before = merged_into.operation_results.get(tag)
+        if isinstance(value, dict):
+            if value is not before:
+                stored = continued.get(tag)
+                for time_point, result in value.items():
+                    if before is None or time_point not in before:
+                        stored[time_point] = result
+        elif isinstance(value, (list, AppendOnlyList)):
+            continued.extend_list_result(tag, value[0 if before is None else len(before):])
+        elif value is not before:
+            continued.operation_results[tag] = value
+    continued.current_time_point = current.current_time_point
+    return continued
+
+
+def expand_merged_payloads[T](payloads: list[SimulationPayload[T]]) -> list[SimulationPayload[T]]:
+    """
+    Restore a payload for each operation history merged by merge_duplicate_payloads. The restored payloads follow the
+    payload they were merged into, with a copy of its state, and a copy of its collected data unless their own
+    collected data was kept.
+
+    :param payloads: simulation state payloads with merged histories
+    :return: list of payloads with a single operation history each
+    """
+    results: list[SimulationPayload[T]] = []
+    for payload in payloads:
+        merged_states = _merged_states_until_now(payload)
+        payload.merged_histories = []
+        results.append(payload)
+        table = payload.operation_history.table if isinstance(payload.operation_history, OperationHistory) else None
+        for history, collected_data in merged_states:
+            restored = copy(payload)
+            restored.operation_history = OperationHistory(history, table)
+            if collected_data is not None:
+                restored.collected_data = collected_data
+            results.append(restored)
+    return results
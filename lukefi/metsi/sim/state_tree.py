@@ -1,14 +1,22 @@
 from collections.abc import Callable
+from copy import deepcopy
+from enum import Enum
 from pathlib import Path
 import pickle
 from typing import Any, Optional
 
+import numpy as np
+
 from lukefi.metsi.app.utils import MetsiException
+from lukefi.metsi.data.layered_model import LayeredObject
+from lukefi.metsi.data.model import SlottedModel
+from lukefi.metsi.data.vector_model import VectorData
+from lukefi.metsi.sim.failures import BranchFailure
 
 
 class StateTree[T]:
     state: T
-    done_treatment: Optional[Callable[[tuple[T, Any]], tuple[T, Any]]]
+    done_treatment: Optional[Callable[[tuple[T, Any]], tuple[T, Any] | BranchFailure]]
     treatment_params: Optional[dict[str, Any]]
     time_point: Optional[int]
     branches: list['StateTree[T]']
@@ -32,3 +40,95 @@ class StateTree[T]:
             with open(path, "rb") as f:
                 return pickle.load(f)
         raise MetsiException(f"Unable to load {path} as {fmt}")
+
+
+def capture_state(state: Any, previous: Optional[Any] = None) -> Any:
+    """
+    Create a snapshot of the given simulation state for a StateTree node.
+
+    Objects are captured attribute by attribute, including the objects in their list attributes and their object
+    attributes such as VectorData. Given the snapshot of the parent node, only the attributes changed since it are
+    stored, in a LayeredObject on top of the parent snapshot, and unchanged objects are shared with it. Changed
+    VectorData is captured as a new object sharing its unchanged columns instead, as a layer would bypass the
+    decoding of its string columns. Attribute values are compared by identity. Writable numpy arrays are copied, while
+    read-only ones, such as the columns of finalized VectorData, are shared. Other lists are copied one level deep and
+    other attribute values, such as dicts, are stored by reference, so they must not be modified in place after
+    capturing, like stored collected data. A state which is not an object is deep copied as a whole.
+
+    :param state: the simulation state to capture
+    :param previous: optional snapshot of the parent state, as returned by this function
+    :return: the snapshot
+    """
+    if not _is_object(state):
+        return deepcopy(state)
+    return _capture_object(state, previous, nested=True)
+
+
+def _is_object(value: Any) -> bool:
+    if isinstance(value, (LayeredObject, SlottedModel)):
+        return True
+    return hasattr(value, '__dict__') and not isinstance(value, (Enum, type)) and not callable(value)
+
+
+def _effective_attributes(value: Any) -> dict[str, Any]:
+    if isinstance(value, LayeredObject):
+        return value.flattened_attributes()
+    if isinstance(value, SlottedModel):
+        return value.field_values()
+    return dict(vars(value))
+
+
+def _base_type(value: Any) -> type:
+    while isinstance(value, LayeredObject):
+        value = object.__getattribute__(value, '_previous')
+    return type(value)
+
+
+def _capture_object(value: Any, previous: Optional[Any], nested: bool) -> Any:
+    attributes = _effective_attributes(value)
+    snapshot: Any
+    if previous is None or _base_type(previous) is not _base_type(value):
+        snapshot = object.__new__(_base_type(value))
+        for key, attribute in attributes.items():
+            setattr(snapshot, key, _capture_value(attribute, None, nested))
+        return snapshot
+    previous_attributes = _effective_attributes(previous)
+    changes = {}
+    for key, attribute in attributes.items():
+        previous_attribute = previous_attributes.get(key)
+        captured = _capture_value(attribute, previous_attribute, nested)
+        if captured is not previous_attribute or key not in previous_attributes:
+            changes[key] = captured
+    if not changes:
+        return previous
+    if isinstance(value, VectorData):
+        snapshot = object.__new__(_base_type(value))
+        snapshot.__dict__.update(previous_attributes)
+        snapshot.__dict__.update(changes)
+        return snapshot
+    layer = LayeredObject(previous)
+    for key, captured in changes.items():
+        setattr(layer, key, captured)
+    return layer
+
+
+def _capture_value(value: Any, previous: Any, nested: bool) -> Any:
+    if isinstance(value, np.ndarray):
+        if value is previous or not value.flags.writeable:
+            return value
+        snapshot = value.copy()
+        snapshot.flags.writeable = False
+        return snapshot
+    if isinstance(value, list):
+        previous_items = previous if isinstance(previous, list) and len(previous) == len(value) else None
+        if nested and len(value) > 0 and all(_is_object(item) for item in value):
+            captured = [_capture_object(item, None if previous_items is None else previous_items[i], nested=False)
+                        for i, item in enumerate(value)]
+        else:
+            captured = list(value)
+        if previous_items is not None and all(a is b for a, b in zip(captured, previous_items)):
+            return previous
+        return captured
+    if nested and _is_object(value):
+        return _capture_object(value, previous, nested=False)
+    return value
@@ -10,10 +10,14 @@ class TestAppIO(unittest.TestCase):
     def test_sim_cli_arguments(self):
         args = ['input.dat', 'out', 'control.py']
         result = parse_cli_arguments(args)
-        self.assertEqual(3, len(result.keys()))
+        self.assertEqual(5, len(result.keys()))
         self.assertEqual('input.dat', result['input_path'])
         self.assertEqual('out', result['target_directory'])
         self.assertEqual('control.py', result['control_file'])
+        self.assertIsNone(result['resume'])
+        self.assertTrue(parse_cli_arguments(args + ['--resume'])['resume'])
+        self.assertIsNone(result['dry_run'])
+        self.assertTrue(parse_cli_arguments(args + ['--dry-run'])['dry_run'])
 
     def test_control_configurations(self):
         args = ['cli_input', 'cli_output', 'cli_control.py']
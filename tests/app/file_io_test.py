@@ -114,7 +114,7 @@ class TestFileReading(unittest.TestCase):
             file_io.csv_file_reader(Path("outdir/output.csv")))
         data[0].reference_trees[0].stand = None
         result[0].reference_trees[0].stand = None
-        self.assertDictEqual(data[0].reference_trees[0].__dict__, result[0].reference_trees[0].__dict__)
+        self.assertDictEqual(data[0].reference_trees[0].field_values(), result[0].reference_trees[0].field_values())
         data[0].reference_trees = []
         result[0].reference_trees = []
         data[0].reference_trees_soa = None
@@ -201,6 +201,24 @@ class TestFileReading(unittest.TestCase):
         self.assertTrue(size > 0)
         shutil.rmtree('outdir')
 
+    def test_simulation_journal(self):
+        file_io.prepare_target_directory('outdir')
+        journal = file_io.simulation_journal_path('outdir')
+        file_io.append_to_simulation_journal(journal, "stand_1", [Test(a=1)])
+        file_io.append_to_simulation_journal(journal, "stand_2", [Test(a=2), Test(a=3)])
+        complete_size = os.path.getsize(journal)
+        file_io.append_to_simulation_journal(journal, "stand_3", [Test(a=4)])
+        os.truncate(journal, os.path.getsize(journal) - 1)
+
+        self.assertEqual({"stand_2": [Test(a=2), Test(a=3)]}, file_io.read_simulation_journal(journal, {"stand_2"}))
+        self.assertEqual(complete_size, os.path.getsize(journal))
+        file_io.append_to_simulation_journal(journal, "stand_3", [Test(a=5)])
+        result = file_io.read_simulation_journal(journal)
+        self.assertEqual(["stand_1", "stand_2", "stand_3"], list(result.keys()))
+        self.assertEqual([Test(a=5)], result["stand_3"])
+        self.assertEqual({}, file_io.read_simulation_journal(Path('outdir', 'nonexisting')))
+        shutil.rmtree('outdir')
+
     def test_read_stands_from_pickle_file(self):
         config = MetsiConfiguration(
             input_path="tests/resources/file_io_test/forest_centre.pickle",
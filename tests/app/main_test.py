@@ -4,10 +4,20 @@ The tests write into sys.argv to simulate calling the applications from the comm
 """
 
 import os
+import pickle
 import sys
 import shutil
 import unittest
 from lukefi.metsi.app import metsi
+from lukefi.metsi.app.app_io import generate_application_configuration
+from lukefi.metsi.app.file_io import read_cost_statistics
+from lukefi.metsi.app.stand_costs import cost_report, estimate_stand_costs
+from lukefi.metsi.data.model import ForestStand, ReferenceTree
+from lukefi.metsi.sim.cost_model import longest_first
+from lukefi.metsi.sim.condition import Condition
+from lukefi.metsi.sim.generators import Alternatives, Event
+from lukefi.metsi.sim.operations import do_nothing
+from lukefi.metsi.sim.simulation_instruction import SimulationInstruction
 import tempfile
 from pathlib import Path
 from types import SimpleNamespace
@@ -78,3 +88,172 @@ class RemoveExistingExportFilesTest(unittest.TestCase):
         self.assertNotIn("data.cda", remaining_files)
         self.assertNotIn("custom_export.txt", remaining_files)
         self.assertNotIn("preprocessing_result.csv", remaining_files)
+
+
+def grow_trees(input_, **operation_params):
+    stand, collected_data = input_
+    for tree in stand.reference_trees:
+        tree.height += operation_params.get("increment", 1.0)
+    collected_data.store("heights", [tree.height for tree in stand.reference_trees])
+    return stand, collected_data
+
+
+def tag_schedule(input_, **operation_params):
+    _ = operation_params
+    stand, collected_data = input_
+    collected_data.store("post_processed", True)
+    return stand, collected_data
+
+
+class SimulateStreamingTest(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.control = {
+            "simulation_instructions": [
+                SimulationInstruction(
+                    time_points=[0, 5],
+                    events=Alternatives([
+                        Event(do_nothing),
+                        Event(grow_trees, parameters={"increment": 2.0})
+                    ])
+                )
+            ],
+            "post_processing": {
+                "post_processing": [tag_schedule]
+            },
+            "export": []
+        }
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def stands(self):
+        stands = []
+        for i in range(3):
+            stand = ForestStand(identifier=f"stand_{i}")
+            stand.reference_trees = [ReferenceTree(identifier=f"tree_{i}", height=float(i))]
+            stands.append(stand)
+        return stands
+
+    def read_derived_data(self, target: Path) -> dict:
+        result = {}
+        for stand_id in sorted(os.listdir(target)):
+            for schedule in sorted(os.listdir(target / stand_id)):
+                with open(target / stand_id / schedule / "derived_data.pickle", "rb") as f:
+                    result[(stand_id, schedule)] = pickle.load(f).operation_results
+        return result
+
+    def test_streaming_matches_batch_pipeline(self):
+        batch_target = Path(self.temp_dir.name, "batch")
+        streaming_target = Path(self.temp_dir.name, "streaming")
+        batch_config = generate_application_configuration({
+            "target_directory": str(batch_target),
+            "derived_data_output_container": "pickle",
+            "run_modes": ["simulate", "postprocess"]
+        })
+        streaming_config = generate_application_configuration({
+            "target_directory": str(streaming_target),
+            "derived_data_output_container": "pickle",
+            "run_modes": ["simulate", "postprocess"],
+            "streaming": True
+        })
+
+        simulated = metsi.simulate(batch_config, self.control, self.stands())
+        metsi.post_process(batch_config, self.control, simulated)
+        metsi.simulate_streaming(streaming_config, self.control, self.stands())
+
+        expected = self.read_derived_data(batch_target)
+        self.assertEqual(12, len(expected))
+        self.assertEqual(expected, self.read_derived_data(streaming_target))
+
+    def test_resume_from_journal(self):
+        target = Path(self.temp_dir.name, "journaled")
+        config = generate_application_configuration({
+            "target_directory": str(target),
+            "run_modes": ["simulate"],
+            "journal": True
+        })
+        expected = metsi.simulate(config, self.control, self.stands())
+        journal = target / "simulation_journal.bin"
+        self.assertTrue(journal.exists())
+
+        # a journal of an interrupted run with the first stand finished
+        completed = metsi.read_simulation_journal(journal, {"stand_0"})
+        journal.unlink()
+        metsi.append_to_simulation_journal(journal, "stand_0", completed["stand_0"])
+        resume_config = generate_application_configuration({
+            "target_directory": str(target),
+            "run_modes": ["simulate"],
+            "resume": True
+        })
+        stands = self.stands()
+        stands[0].reference_trees[0].height = 100.0  # resumed stands are not simulated again
+        resumed = metsi.simulate(resume_config, self.control, stands)
+
+        self.assertEqual(list(expected.keys()), list(resumed.keys()))
+        for stand_id, schedules in expected.items():
+            self.assertEqual([s.collected_data.operation_results for s in schedules],
+                             [s.collected_data.operation_results for s in resumed[stand_id]])
+        self.assertEqual(3, len(metsi.read_simulation_journal(journal)))
+
+    def test_cost_scheduling(self):
+        target = Path(self.temp_dir.name, "scheduled")
+        config = generate_application_configuration({
+            "target_directory": str(target),
+            "run_modes": ["simulate"],
+            "cost_scheduling": True
+        })
+        stands = self.stands()
+        stands[2].reference_trees = [ReferenceTree(identifier=f"tree_{i}", height=1.0) for i in range(10)]
+        _, estimates = estimate_stand_costs(config, self.control, stands)
+        self.assertEqual([2, 0, 1], longest_first(estimates))
+        self.assertEqual([4, 4, 4], [estimate.alternatives for estimate in estimates])
+
+        result = metsi.simulate(config, self.control, stands)
+        self.assertEqual(["stand_0", "stand_1", "stand_2"], list(result.keys()))
+        statistics = read_cost_statistics(target)
+        self.assertEqual({"stand_0": 4, "stand_1": 4, "stand_2": 4}, statistics["alternatives"])
+        self.assertEqual(1.0, statistics["survival"])
+        self.assertIsNotNone(statistics["seconds_per_cost"])
+        report = cost_report(estimate_stand_costs(config, self.control, stands)[1])
+        self.assertEqual(4, len(report))
+        self.assertTrue(report[2].startswith("Stand stand_2 (10 trees): 4 alternatives"))
+
+    def aborting_control(self) -> dict:
+        """Control with 4 alternatives for stand_1 and 1 for the other stands."""
+        return {
+            "simulation_instructions": [
+                SimulationInstruction(
+                    time_points=[0, 5],
+                    events=Alternatives([
+                        Event(do_nothing),
+                        Event(grow_trees, parameters={"increment": 2.0},
+                              preconditions=[Condition(
+                                  lambda _, payload: payload.computational_unit.identifier == "stand_1")])
+                    ])
+                )
+            ]
+        }
+
+    def test_journal_with_aborted_stand(self):
+        config = generate_application_configuration({
+            "target_directory": str(Path(self.temp_dir.name, "journaled")),
+            "run_modes": ["simulate"],
+            "journal": True,
+            "alternatives_limit": 3
+        })
+        result = metsi.simulate(config, self.aborting_control(), self.stands())
+        self.assertEqual(["stand_0", "stand_2"], list(result.keys()))
+        self.assertEqual([1, 1], [len(schedules) for schedules in result.values()])
+
+    def test_cost_scheduling_with_aborted_stand(self):
+        target = Path(self.temp_dir.name, "scheduled")
+        config = generate_application_configuration({
+            "target_directory": str(target),
+            "run_modes": ["simulate"],
+            "cost_scheduling": True,
+            "alternatives_limit": 3
+        })
+        result = metsi.simulate(config, self.aborting_control(), self.stands())
+        self.assertEqual(["stand_0", "stand_2"], list(result.keys()))
+        self.assertEqual({"stand_0": 1, "stand_2": 1}, read_cost_statistics(target)["alternatives"])
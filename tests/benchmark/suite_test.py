@@ -0,0 +1,30 @@
+import unittest
+
+from lukefi.metsi.app.metsi_enum import EvaluationStrategy, FormationStrategy
+from lukefi.metsi.benchmark.suite import BenchmarkCase, benchmark_cases, compare_results, run_case
+from lukefi.metsi.benchmark.synthetic import synthetic_stands
+
+
+class BenchmarkTest(unittest.TestCase):
+    def test_synthetic_stands(self):
+        stands = synthetic_stands(2, 5)
+        vectorized = synthetic_stands(2, 5, vectorized=True)
+        self.assertEqual([5, 5], [len(stand.reference_trees) for stand in stands])
+        self.assertEqual([5, 5], [stand.reference_trees_soa.size for stand in vectorized])
+        self.assertEqual([tree.height for tree in stands[1].reference_trees],
+                         list(vectorized[1].reference_trees_soa.height))
+
+    def test_run_case(self):
+        results = [run_case(BenchmarkCase(2, 3, 2, 3, vectorized, FormationStrategy.PARTIAL, EvaluationStrategy.CHAINS),
+                            repeat=1)
+                   for vectorized in [False, True]]
+        self.assertEqual([18, 18], [result["alternatives"] for result in results])
+        self.assertEqual("partial-chains-soa-s2-t3-d2-w3", results[1]["name"])
+        self.assertTrue(all(result["peak_allocated_bytes"] > 0 for result in results))
+        self.assertEqual(1, len(compare_results(results[:1], results)))
+
+    def test_benchmark_cases(self):
+        cases = benchmark_cases([1], [10, 100], [3], [2], ["aos", "soa"],
+                                [FormationStrategy.FULL, FormationStrategy.PARTIAL], [EvaluationStrategy.DEPTH])
+        self.assertEqual(8, len(cases))
+        self.assertEqual(len(cases), len({case.name for case in cases}))
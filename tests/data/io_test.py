@@ -91,15 +91,15 @@ class IoUtilsTest(ConverterTestSuite):
         # Perform comparison of dicts for each relevant object, setting relations to None to avoid recursive loop
         for i in range(len(vmi13_stands)):
             for t in range(len(vmi13_stands[i].reference_trees)):
-                trees_expected = vmi13_stands[i].reference_trees[t].__dict__
-                trees_actual = stands_from_csv[i].reference_trees[t].__dict__
+                trees_expected = vmi13_stands[i].reference_trees[t].field_values()
+                trees_actual = stands_from_csv[i].reference_trees[t].field_values()
                 trees_expected['stand'] = None
                 trees_actual['stand'] = None
                 self.assertTrue(trees_expected == trees_actual)
             
             for s in range(len(vmi13_stands[i].tree_strata)):
-                strata_expected = vmi13_stands[i].tree_strata[s].__dict__
-                strata_actual = stands_from_csv[i].tree_strata[s].__dict__
+                strata_expected = vmi13_stands[i].tree_strata[s].field_values()
+                strata_actual = stands_from_csv[i].tree_strata[s].field_values()
                 strata_expected['stand'] = None
                 strata_actual['stand'] = None
                 self.assertTrue(strata_expected == strata_actual)
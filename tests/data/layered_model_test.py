@@ -1,7 +1,8 @@
+import pickle
 import unittest
 from dataclasses import dataclass
 from typing import Optional
-from lukefi.metsi.data.layered_model import LayeredObject
+from lukefi.metsi.data.layered_model import LayeredObject, _restore_layer
 
 
 @dataclass
@@ -56,3 +57,69 @@ class LayeredModelTest(unittest.TestCase):
         self.assertEqual('10', result.s)
         self.assertEqual(level0.n, result.n)
         self.assertEqual(1000, result.n)
+
+    def test_pickling_preserves_layers(self):
+        level0 = ExampleType()
+        level1 = LayeredObject[ExampleType](level0)
+        level1.i = 10
+        level2 = level1.new_layer()
+        level2.s = '10'
+        restored2, restored1 = pickle.loads(pickle.dumps([level2, level1]))
+        self.assertIsInstance(restored2, LayeredObject)
+        self.assertIs(restored1, restored2._previous)
+        self.assertEqual(10, restored2.i)
+        self.assertEqual('10', restored2.s)
+        self.assertEqual('1', restored1.s)
+        self.assertEqual(1.0, restored2.f)
+
+    def test_flattening(self):
+        level0 = ExampleType()
+        previous_max_depth = LayeredObject.max_depth
+        LayeredObject.max_depth = 3
+        try:
+            layer = LayeredObject[ExampleType](level0)
+            layers = [layer]
+            for i in range(10):
+                layer = layer.new_layer()
+                layer.i = i
+                if i == 5:
+                    layer.s = 'five'
+                layers.append(layer)
+        finally:
+            LayeredObject.max_depth = previous_max_depth
+        self.assertEqual(9, layer.i)
+        self.assertEqual('five', layer.s)
+        self.assertEqual(1.0, layer.f)
+        self.assertEqual(5, layers[6].i)
+        self.assertTrue(all(len(layer._lower) < 3 for layer in layers))
+        self.assertTrue(all(layer.base_object() is level0 for layer in layers))
+        self.assertEqual(1, level0.i)
+        self.assertEqual({'i': 9, 'f': 1.0, 's': 'five', 'n': None}, layer.flattened_attributes())
+
+    def test_unlimited_depth(self):
+        previous_max_depth = LayeredObject.max_depth
+        LayeredObject.max_depth = None
+        try:
+            layer = LayeredObject[ExampleType](ExampleType())
+            for _ in range(20):
+                layer = layer.new_layer()
+        finally:
+            LayeredObject.max_depth = previous_max_depth
+        self.assertEqual(20, len(layer._lower))
+
+    def test_base_type(self):
+        level0 = ExampleType()
+        level1 = LayeredObject[ExampleType](level0)
+        level2 = level1.new_layer()
+        self.assertIsInstance(level2, ExampleType)
+        self.assertIs(level0, level2.base_object())
+        self.assertNotIn('__orig_class__', level1.__dict__)
+        with self.assertRaises(TypeError):
+            level2.__class__ = LayeredObject
+
+    def test_unpickling_old_layers(self):
+        level0 = ExampleType()
+        restored = pickle.loads(pickle.dumps(_restore_layer({'_previous': level0, 'i': 5})))
+        self.assertEqual(5, restored.i)
+        self.assertEqual('1', restored.s)
+        self.assertEqual({'i': 5}, restored.__dict__)
@@ -1,5 +1,9 @@
+import dataclasses
+import pickle
 import unittest
+from copy import deepcopy
 
+from lukefi.metsi.data.layered_model import LayeredObject
 from lukefi.metsi.data.model import ForestStand, ReferenceTree, TreeStratum
 from lukefi.metsi.data.enums import internal
 
@@ -173,3 +177,47 @@ class TestForestDataModel(unittest.TestCase):
         stand = ForestStand.from_csv_row(row)
 
         self.assertEqual((6834156.23, 429291.91, None, 'EPSG:3067'), stand.geo_location)
+
+    def test_slotted_trees(self):
+        stand = ForestStand(identifier="1")
+        tree = ReferenceTree(identifier="1-1-tree", stand=stand, height=10.0,
+                             stand_origin_relative_position=(1.0, 2.0, 3.0))
+        self.assertFalse(hasattr(tree, '__weakref__'))
+        self.assertRaises(AttributeError, setattr, tree, 'not_a_field', 1)
+        self.assertFalse(hasattr(tree, '__dict__'))
+        self.assertEqual(10.0, tree.field_values()['height'])
+        copied = deepcopy(tree)
+        self.assertIsNot(tree, copied)
+        self.assertEqual(tree.field_values(), copied.field_values())
+        self.assertIs(stand, copied.stand)
+        restored = pickle.loads(pickle.dumps(tree))
+        self.assertEqual(10.0, restored.height)
+        self.assertEqual((1.0, 2.0, 3.0), restored.stand_origin_relative_position)
+
+    def test_slotted_copies_have_all_fields(self):
+        for model in [ReferenceTree, TreeStratum]:
+            original = model()
+            for i, field in enumerate(dataclasses.fields(model)):
+                setattr(original, field.name, i)
+            self.assertEqual({field.name: i for i, field in enumerate(dataclasses.fields(model))},
+                             deepcopy(original).field_values())
+
+    def test_slotted_tree_with_deleted_field(self):
+        stratum = TreeStratum(identifier="1-1-stratum", mean_height=5.0)
+        del stratum.stand
+        self.assertNotIn('stand', stratum.field_values())
+        copied = deepcopy(stratum)
+        self.assertEqual(5.0, copied.mean_height)
+        self.assertFalse(hasattr(copied, 'stand'))
+
+    def test_layered_slotted_tree(self):
+        tree = ReferenceTree(identifier="1-1-tree", height=10.0, breast_height_diameter=12.0)
+        layer = LayeredObject(tree).new_layer()
+        layer.height = 11.0
+        self.assertEqual(11.0, layer.height)
+        self.assertEqual(12.0, layer.breast_height_diameter)
+        self.assertEqual(10.0, tree.height)
+        self.assertEqual(11.0, layer.flattened_attributes()['height'])
+        fixated = layer.fixate()
+        self.assertIs(tree, fixated)
+        self.assertEqual(11.0, tree.height)
@@ -1,9 +1,11 @@
+import copy
+import pickle
 import unittest
 
 import numpy as np
 import numpy.typing as npt
 
-from lukefi.metsi.data.vector_model import VectorData
+from lukefi.metsi.data.vector_model import DTYPES_TREE, ReferenceTrees, Strata, StringTable, VectorData
 
 DUMMY_DTYPES: dict[str, npt.DTypeLike] = {
     "x": np.int32,
@@ -242,3 +244,130 @@ class VectorModelTest(unittest.TestCase):
         self.assertEqual(self.vector_data.x[2], 7)
         self.assertEqual(self.vector_data.y[2], 8)
         self.assertEqual(self.vector_data.z[2], 9.0)
+
+    def test_create_in_spare_capacity(self):
+        self.vector_data.create({"x": 1, "y": 2, "z": 3.0})
+        buffer = self.vector_data.x.base
+        self.assertIsNotNone(buffer)
+        self.assertGreater(len(buffer), 1)
+        self.vector_data.create({"x": 4, "y": 5, "z": 6.0})
+        self.vector_data.create({"x": 7}, 0)
+        self.assertIs(buffer, self.vector_data.x.base)
+        self.assertEqual([7, 1, 4], self.vector_data.x.tolist())
+        self.assertEqual(3, self.vector_data.size)
+        for i in range(100):
+            self.vector_data.create({"x": i})
+        self.assertEqual(103, len(self.vector_data.x))
+        self.assertEqual(103, len(self.vector_data.y))
+        self.assertEqual(list(range(100)), self.vector_data.x[3:].tolist())
+
+    def test_delete_in_place(self):
+        self.vector_data.create([{"x": i, "y": i, "z": float(i)} for i in range(6)])
+        buffer = self.vector_data.x.base
+        self.vector_data.delete(-1)
+        self.vector_data.delete([0, 2])
+        self.assertIs(buffer, self.vector_data.x.base)
+        self.assertEqual([1, 3, 4], self.vector_data.x.tolist())
+        self.assertEqual([1.0, 3.0, 4.0], self.vector_data.z.tolist())
+        self.assertEqual(3, self.vector_data.size)
+        self.assertRaises(IndexError, self.vector_data.delete, 3)
+
+    def test_finalize_releases_buffers(self):
+        self.vector_data.create([{"x": 1, "y": 2, "z": 3.0}, {"x": 4, "y": 5, "z": 6.0}])
+        vector_data_copy = self.vector_data.finalize()
+        self.assertEqual(2, len(vector_data_copy.x))
+        self.assertFalse(vector_data_copy.x.flags.writeable)
+        vector_data_copy.create({"x": 7})
+        self.vector_data.create({"x": 8})
+        self.vector_data.delete(0)
+        self.assertEqual([1, 4, 7], vector_data_copy.x.tolist())
+        self.assertEqual([4, 8], self.vector_data.x.tolist())
+        restored = pickle.loads(pickle.dumps(vector_data_copy))
+        self.assertNotIn('_buffers', vars(restored))
+        self.assertEqual([1, 4, 7], restored.x.tolist())
+
+    def test_copy_releases_buffers(self):
+        trees = ReferenceTrees().vectorize({"species": [1, 2, 3]})
+        trees.create({"species": 4})
+        trees_copy = copy.copy(trees)
+        trees.create({"species": 0}, index=0)
+        self.assertEqual([1, 2, 3, 4], trees_copy.species.tolist())
+        trees.delete(0)
+        trees.delete(0)
+        self.assertEqual([1, 2, 3, 4], trees_copy.species.tolist())
+        self.assertEqual([2, 3, 4], trees.species.tolist())
+        trees_copy.create({"species": 5}, index=1)
+        self.assertEqual([1, 5, 2, 3, 4], trees_copy.species.tolist())
+        self.assertEqual([2, 3, 4], trees.species.tolist())
+
+    def test_create_widens_strings_and_keeps_rows(self):
+        trees = ReferenceTrees().vectorize({"identifier": ["1"], "stand_origin_relative_position": [(1.0, 2.0, 3.0)]})
+        trees.create({"identifier": "long-identifier"})
+        trees.create({"identifier": "2", "stand_origin_relative_position": (4.0, 5.0, 6.0)}, 0)
+        self.assertEqual(["2", "1", "long-identifier"], trees.identifier.tolist())
+        self.assertEqual((3, 3), trees.stand_origin_relative_position.shape)
+        self.assertEqual([4.0, 5.0, 6.0], trees.stand_origin_relative_position[0].tolist())
+        self.assertEqual(3, trees.size)
+
+    def test_string_columns(self):
+        strings = StringTable()
+        trees = ReferenceTrees(strings).vectorize({"identifier": ["1-1", "1-2", "1-1"], "tree_type": ["a", None, "a"]})
+        strata = Strata(strings).vectorize({"identifier": ["1-1"]})
+        self.assertEqual(np.int32, trees.__dict__["identifier"].dtype)
+        self.assertEqual(["1-1", "1-2", "1-1"], trees.identifier.tolist())
+        self.assertEqual(["a", "", "a"], trees.tree_type.tolist())
+        self.assertEqual(["1-1"], strata.identifier.tolist())
+        self.assertEqual(["", "1-1", "1-2", "a"], sorted(strings.strings))
+        self.assertFalse(trees.identifier.flags.writeable)
+
+        trees_copy = trees.finalize()
+        trees_copy.update({"identifier": "1-3"}, 0)
+        trees_copy.create({"identifier": "1-4", "tree_category": "x"})
+        self.assertIs(strings, trees_copy.strings)
+        self.assertEqual(["1-3", "1-2", "1-1", "1-4"], trees_copy.identifier.tolist())
+        self.assertEqual(["1-1", "1-2", "1-1"], trees.identifier.tolist())
+        self.assertEqual("1-4", trees_copy.read(3)["identifier"])
+        self.assertEqual("x", trees_copy.string_value("tree_category", 3))
+
+        trees_copy.tree_type = np.array(["b", "b", "c", "c"])
+        self.assertEqual(["b", "b", "c", "c"], trees_copy.tree_type.tolist())
+
+        restored = pickle.loads(pickle.dumps([trees_copy, strata]))
+        self.assertIs(restored[0].strings, restored[1].strings)
+        self.assertEqual(["1-3", "1-2", "1-1", "1-4"], restored[0].identifier.tolist())
+        self.assertEqual("1-4", restored[0].strings.strings[restored[0].strings.encode("1-4")])
+
+    def test_unpickling_unencoded_string_columns(self):
+        trees = ReferenceTrees.__new__(ReferenceTrees)
+        trees.__setstate__({"dtypes": DTYPES_TREE, "size": 2, "identifier": np.array(["1-1", "1-2"]),
+                            "height": np.array([1.0, 2.0])})
+        self.assertEqual(["1-1", "1-2"], trees.identifier.tolist())
+        self.assertEqual(np.int32, trees.__dict__["identifier"].dtype)
+
+    def test_pack(self):
+        trees = ReferenceTrees().vectorize({"identifier": ["1-1", "1-2"], "height": [1.0, 5.0],
+                                            "stand_origin_relative_position": [(1.0, 2.0, 3.0), (4.0, 5.0, 6.0)]})
+        trees.pack()
+        self.assertTrue(trees.is_packed())
+        self.assertTrue(all(trees.is_contiguous(key) for key in trees.dtypes))
+        self.assertIs(trees.__dict__["height"].base, trees.__dict__["species"].base)
+        self.assertEqual([1.0, 5.0], trees.height.tolist())
+        self.assertEqual([4.0, 5.0, 6.0], trees.stand_origin_relative_position[1].tolist())
+        self.assertEqual(["1-1", "1-2"], trees.identifier.tolist())
+        trees.update({"height": 2.0}, 0)
+        self.assertTrue(trees.is_packed())
+
+        for restored in [pickle.loads(pickle.dumps(trees)), copy.deepcopy(trees)]:
+            self.assertTrue(restored.is_packed())
+            self.assertIsNot(trees.__dict__["height"].base, restored.__dict__["height"].base)
+            self.assertEqual([2.0, 5.0], restored.height.tolist())
+            self.assertEqual(["1-1", "1-2"], restored.identifier.tolist())
+
+        trees_copy = trees.finalize()
+        self.assertTrue(trees_copy.is_packed())
+        trees_copy.update({"height": 3.0}, 1)
+        self.assertFalse(trees_copy.is_packed())
+        self.assertEqual([2.0, 5.0], trees.height.tolist())
+        restored = pickle.loads(pickle.dumps(trees_copy))
+        self.assertNotIn("_block", vars(restored))
+        self.assertEqual([2.0, 3.0], restored.height.tolist())
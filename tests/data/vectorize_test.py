@@ -52,3 +52,11 @@ class TestVectorize(unittest.TestCase):
             for aso_stratum, soa_stratum_species in zip(before.tree_strata, after.tree_strata_soa.species if
                                                         after.tree_strata_soa.size > 0 else []):
                 self.assertEqual(aso_stratum.species, soa_stratum_species)
+
+    def test_packed(self):
+        after = copy.deepcopy(TestVectorize.before)
+        vectorize(after, packed=True)
+        self.assertTrue(after[1].reference_trees_soa.is_packed())
+        self.assertTrue(after[1].tree_strata_soa.is_packed())
+        self.assertIs(after[1].reference_trees_soa.strings, after[1].tree_strata_soa.strings)
+        self.assertEqual([3, 4], after[1].reference_trees_soa.species.tolist())
@@ -1,6 +1,9 @@
 from types import SimpleNamespace
 import unittest
-from lukefi.metsi.domain.utils.collectives import CollectibleNDArray, autocollective, collect_all, compile_collector, getvarfn
+from lukefi.metsi.domain.utils.collectives import CollectibleNDArray, autocollective, collect_all, compile_collector, getvarfn, \
+    collective_objective
+from lukefi.metsi.sim.collected_data import CollectedData
+from lukefi.metsi.sim.simulation_payload import SimulationPayload
 import numpy as np
 
 
@@ -50,3 +53,15 @@ class CollectivesTest(unittest.TestCase):
         getvar = getvarfn()
         with self.assertRaises(NameError):
             f(getvar)
+
+    def test_collective_objective(self):
+        collected_data = CollectedData(initial_time_point=2025)
+        collected_data.extend_list_result("npv", [SimpleNamespace(rate=1, value=10.0, time_point=2020),
+                                                  SimpleNamespace(rate=3, value=5.0, time_point=2020),
+                                                  SimpleNamespace(rate=3, value=7.0, time_point=2025)])
+        payload = SimulationPayload(computational_unit=SimpleNamespace(area=2.0), collected_data=collected_data)
+        objective = collective_objective("area * npv.value[(npv.rate == 3) & (npv.time_point == time)]")
+        self.assertEqual(14.0, objective(payload))
+        self.assertEqual(float("-inf"), collective_objective("undefined_variable")(payload))
+        self.assertEqual(float("-inf"), collective_objective("area * npv.undefined_attribute")(payload))
+        self.assertEqual(float("-inf"), collective_objective("state.undefined_attribute")(payload))
@@ -3,7 +3,7 @@ import numpy as np
 
 from lukefi.metsi.data.model import ForestStand
 from lukefi.metsi.data.vectorize import vectorize
-from lukefi.metsi.domain.natural_processes.grow_acta import grow_acta, grow_acta_vectorized
+from lukefi.metsi.domain.natural_processes.grow_acta import grow_acta, grow_acta_vectorized, grow_acta_vectorized_batch
 from lukefi.metsi.sim.collected_data import CollectedData
 from tests.test_utils import prepare_growth_test_stand
 
@@ -58,3 +58,22 @@ class GrowthOperationsTest(unittest.TestCase):
         self.assertEqual(stand.reference_trees_soa.breast_height_age[1], 15)
         self.assertEqual(stand.reference_trees_soa.breast_height_age[2], 6)
         self.assertEqual(stand.year, 2030)
+
+    def test_grow_acta_vectorized_batch(self):
+        def prepare_stands() -> list[ForestStand]:
+            stands = [prepare_growth_test_stand() for _ in range(3)]
+            stands[1].reference_trees[0].height = 25
+            stands[1].reference_trees[1].stems_per_ha = 400
+            stands[2].reference_trees = stands[2].reference_trees[2:]
+            return vectorize(stands)
+
+        expected = prepare_stands()
+        for stand in expected:
+            grow_acta_vectorized((stand, CollectedData()))
+        batched = prepare_stands()
+        grow_acta_vectorized_batch([(stand, CollectedData()) for stand in batched])
+        for result, reference in zip(batched, expected):
+            self.assertEqual(reference.year, result.year)
+            for attribute in ["breast_height_diameter", "height", "biological_age", "breast_height_age", "sapling"]:
+                np.testing.assert_allclose(getattr(reference.reference_trees_soa, attribute),
+                                           getattr(result.reference_trees_soa, attribute))
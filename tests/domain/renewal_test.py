@@ -18,13 +18,13 @@ class RenewalTest(unittest.TestCase):
         Objects are cast to dicts to avoid using the overridden __eq__ methods of the respective classes.
         """
         for t in range(len(stand1.reference_trees)):
-            trees_expected = stand1.reference_trees[t].__dict__
-            trees_actual = stand2.reference_trees[t].__dict__
+            trees_expected = stand1.reference_trees[t].field_values()
+            trees_actual = stand2.reference_trees[t].field_values()
             self.assertTrue(trees_expected == trees_actual)
 
         for s in range(len(stand1.tree_strata)):
-            strata_expected = stand1.tree_strata[s].__dict__
-            strata_actual = stand2.tree_strata[s].__dict__
+            strata_expected = stand1.tree_strata[s].field_values()
+            strata_actual = stand2.tree_strata[s].field_values()
             self.assertTrue(strata_expected == strata_actual)
 
         stands_expected = stand1.__dict__
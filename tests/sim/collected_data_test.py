@@ -0,0 +1,63 @@
+import pickle
+import unittest
+from copy import copy, deepcopy
+
+from lukefi.metsi.sim.collected_data import AppendOnlyList, CollectedData
+
+
+class CollectedDataTest(unittest.TestCase):
+    def test_list_results_are_shared_with_copies(self):
+        parent = CollectedData()
+        parent.extend_list_result("felled_trees", [1, 2])
+        first = copy(parent)
+        second = copy(parent)
+        first.extend_list_result("felled_trees", [3])
+        second.extend_list_result("felled_trees", [4, 5])
+        parent.extend_list_result("felled_trees", [6])
+        self.assertEqual([1, 2, 3], first.get_list_result("felled_trees"))
+        self.assertEqual([1, 2, 4, 5], second.get_list_result("felled_trees"))
+        self.assertEqual([1, 2, 6], parent.get_list_result("felled_trees"))
+        self.assertEqual(4, len(second.get_list_result("felled_trees")))
+        self.assertEqual([2, 4, 5], second.get_list_result("felled_trees")[1:])
+        self.assertEqual(5, second.get_list_result("felled_trees")[-1])
+        self.assertEqual(4, second.get_list_result("felled_trees")[2])
+        self.assertEqual(1, second.get_list_result("felled_trees")[-4])
+        with self.assertRaises(IndexError):
+            _ = second.get_list_result("felled_trees")[4]
+
+    def test_dict_results_are_copied_on_store(self):
+        parent = CollectedData(current_time_point=0)
+        parent.store("report_state", "a")
+        child = deepcopy(parent)
+        child.current_time_point = 5
+        child.store("report_state", "b")
+        parent.current_time_point = 5
+        self.assertEqual("a", parent.prev("report_state"))
+        self.assertEqual("b", child.prev("report_state"))
+        parent.store("report_state", "c")
+        self.assertEqual({0: "a", 5: "b"}, dict(child.operation_results["report_state"]))
+        self.assertEqual({0: "a", 5: "c"}, dict(parent.operation_results["report_state"]))
+
+    def test_dict_results_are_not_copied_on_get(self):
+        parent = CollectedData(current_time_point=0)
+        parent.store("report_state", "a")
+        child = copy(parent)
+        self.assertIs(parent.get("report_state"), child.get("report_state"))
+        child.store("report_state", "b")
+        self.assertIsNot(parent.get("report_state"), child.get("report_state"))
+
+    def test_plain_list_results(self):
+        parent = CollectedData(treatment_results={"cross_cutting": [1]})
+        child = copy(parent)
+        child.extend_list_result("cross_cutting", [2])
+        self.assertEqual([1], parent.get_list_result("cross_cutting"))
+        self.assertEqual([1, 2], child.get_list_result("cross_cutting"))
+
+    def test_pickling_uses_plain_lists(self):
+        collected_data = copy(CollectedData())
+        collected_data.extend_list_result("cross_cutting", [1, 2])
+        self.assertIsInstance(collected_data.get_list_result("cross_cutting"), AppendOnlyList)
+        result = pickle.loads(pickle.dumps(collected_data))
+        self.assertEqual([1, 2], result.operation_results["cross_cutting"])
+        self.assertIsInstance(result.operation_results["cross_cutting"], list)
+        self.assertIsInstance(pickle.loads(pickle.dumps(AppendOnlyList([1]))), list)
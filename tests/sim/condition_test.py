@@ -1,9 +1,21 @@
 import unittest
+from copy import copy, deepcopy
 
 from lukefi.metsi.sim.collected_data import CollectedData, OpTuple
 from lukefi.metsi.sim.condition import Condition
 from lukefi.metsi.sim.generators import Alternatives, Sequence, Event
-from lukefi.metsi.sim.simulation_payload import SimulationPayload
+from lukefi.metsi.sim.operations import do_nothing
+from lukefi.metsi.sim.runners import chain_evaluator, depth_first_evaluator
+from lukefi.metsi.domain.conditions import MinimumTimeInterval
+from lukefi.metsi.sim.simulation_payload import OperationHistory, SimulationPayload
+
+
+class CopyCounter:
+    copies = 0
+
+    def __deepcopy__(self, memo):
+        CopyCounter.copies += 1
+        return self
 
 
 class ConditionTest(unittest.TestCase):
@@ -68,3 +80,39 @@ class ConditionTest(unittest.TestCase):
         self.assertEqual(result[1].computational_unit, 3)
         self.assertEqual(result[2].computational_unit, 2)
         self.assertEqual(result[3].computational_unit, 2)
+
+    def test_failing_preconditions_skip_copying(self):
+        generator = Alternatives([
+            Event(do_nothing, preconditions=[Condition(lambda _, x: False)]),
+            Event(do_nothing),
+            Event(do_nothing, preconditions=[Condition(lambda t, x: t < 0)]),
+        ])
+        root = generator.compose_nested()
+        for evaluator in [depth_first_evaluator, chain_evaluator]:
+            CopyCounter.copies = 0
+            result = evaluator(SimulationPayload(computational_unit=CopyCounter(),
+                                                 collected_data=CollectedData(),
+                                                 operation_history=[]), root)
+            self.assertEqual(1, len(result))
+            self.assertEqual(1, CopyCounter.copies)
+
+    def test_operation_history_last_runs(self):
+        def other(x):
+            return x
+
+        history = OperationHistory([(0, do_nothing, {}), (5, other, {})])
+        branch = copy(history)
+        branch.append((10, do_nothing, {"a": 1}))
+        self.assertEqual(0, history.last_run(do_nothing))
+        self.assertEqual(10, branch.last_run(do_nothing))
+        self.assertEqual(10, deepcopy(branch).last_run(do_nothing))
+        self.assertIsNone(history.last_run(print))
+        self.assertEqual([(0, do_nothing, {}), (5, other, {}), (10, do_nothing, {"a": 1})], branch)
+        self.assertEqual((5, other, {}), branch[-2])
+
+        condition = MinimumTimeInterval(10, do_nothing)
+        for operation_history in [history, list(history)]:
+            payload = SimulationPayload(computational_unit=1, collected_data=CollectedData(),
+                                        operation_history=operation_history)
+            self.assertFalse(condition(5, payload))
+            self.assertTrue(condition(10, payload))
@@ -0,0 +1,55 @@
+import unittest
+
+from lukefi.metsi.sim.cost_model import CostModel, event_tree_leaves, longest_first, static_alternatives
+from lukefi.metsi.sim.generators import Alternatives, Event, Sequence
+from lukefi.metsi.sim.operations import do_nothing
+from lukefi.metsi.sim.sim_configuration import SimConfiguration
+from lukefi.metsi.sim.simulation_instruction import SimulationInstruction
+
+
+class CostModelTest(unittest.TestCase):
+    def create_config(self) -> SimConfiguration:
+        return SimConfiguration(simulation_instructions=[
+            SimulationInstruction(
+                time_points=[1, 2],
+                events=Sequence([
+                    Event(do_nothing),
+                    Alternatives([Event(do_nothing), Event(do_nothing), Event(do_nothing)])
+                ])
+            )
+        ])
+
+    def test_static_alternatives(self):
+        config = self.create_config()
+        self.assertEqual(9, event_tree_leaves(config.full_event_tree()))
+        self.assertEqual(9, static_alternatives(config))
+        self.assertEqual(4, static_alternatives(config, beam_width=4))
+
+    def test_estimates_from_statistics(self):
+        model = CostModel(9)
+        first = model.estimate("a", 10, 100)
+        self.assertEqual(9, first.alternatives)
+        self.assertEqual(90, first.cost)
+        self.assertEqual(900, first.memory_bytes)
+        self.assertIsNone(first.seconds)
+
+        model.record([first, model.estimate("b", 20, 100)], {"a": 3, "b": 6}, seconds=1.5)
+        model = CostModel(9, model.statistics())
+        self.assertEqual(3, model.estimate("a", 10, 100).alternatives)
+        self.assertEqual(4.5, model.estimate("c", 10, 100).alternatives)
+        self.assertAlmostEqual(1.5 * 45 / 150, model.estimate("c", 10, 100).seconds)
+
+    def test_statistics_accumulate_over_runs(self):
+        model = CostModel(9)
+        model.record([model.estimate("a", 10, 100), model.estimate("b", 20, 100)], {"a": 3, "b": 6}, seconds=1.5)
+        model = CostModel(9, model.statistics())
+        model.record([model.estimate("c", 10, 100)], {"c": 9}, seconds=3.0)
+        model = CostModel(9, model.statistics())
+        self.assertAlmostEqual(18 / 27, model.survival)
+        self.assertAlmostEqual(4.5 / 240, model.seconds_per_cost)
+        self.assertEqual(6, model.estimate("d", 10, 100).alternatives)
+
+    def test_longest_first(self):
+        model = CostModel(2)
+        estimates = [model.estimate(str(i), size, 1) for i, size in enumerate([1, 5, 3, 5])]
+        self.assertEqual([1, 3, 2, 0], longest_first(estimates))
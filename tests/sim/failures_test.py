@@ -0,0 +1,121 @@
+import unittest
+
+from lukefi.metsi.app.utils import ConditionFailed
+from lukefi.metsi.sim import failures
+from lukefi.metsi.sim.collected_data import CollectedData
+from lukefi.metsi.sim.event_tree import EventTree
+from lukefi.metsi.sim.condition import Condition
+from lukefi.metsi.sim.failures import BranchFailure, FailureStatistics, activate, infeasible
+from lukefi.metsi.sim.generators import Alternatives, Event, Sequence
+from lukefi.metsi.sim.operations import do_nothing
+from lukefi.metsi.sim.runners import breadth_first_evaluator, chain_evaluator, depth_first_evaluator
+from lukefi.metsi.sim.simulation_payload import SimulationPayload
+from tests.test_utils import collecting_increment
+
+
+def infeasible_increment(input_, /, **operation_parameters):
+    _ = input_, operation_parameters
+    return infeasible("not feasible")
+
+
+def raising_increment(input_, /, **operation_parameters):
+    _ = input_, operation_parameters
+    raise UserWarning("not feasible")
+
+
+def raising_condition(payload):
+    _ = payload
+    raise ConditionFailed("condition")
+
+
+class FailuresTest(unittest.TestCase):
+    def create_tree(self):
+        return Sequence([
+            Event(collecting_increment),
+            Alternatives([
+                Event(do_nothing, preconditions=[Condition(lambda t, x: False)]),
+                Event(collecting_increment, postconditions=[Condition(lambda t, x: x.computational_unit > 2)]),
+                Event(infeasible_increment),
+                Event(raising_increment),
+                Event(collecting_increment, parameters={"incrementation": 2})
+            ])
+        ], 1).compose_nested()
+
+    def test_statistics(self):
+        for evaluator in [depth_first_evaluator, chain_evaluator, breadth_first_evaluator]:
+            statistics = FailureStatistics()
+            previous = activate(statistics)
+            try:
+                results = evaluator(SimulationPayload(computational_unit=0,
+                                                      collected_data=CollectedData(),
+                                                      operation_history=[]),
+                                    self.create_tree())
+            finally:
+                activate(previous)
+            self.assertEqual(1, len(results))
+            self.assertEqual({
+                ("do_nothing", 1, failures.PRECONDITIONS): 1,
+                ("collecting_increment", 1, failures.POSTCONDITIONS): 1,
+                ("infeasible_increment", 1, failures.TREATMENT): 1,
+                ("raising_increment", 1, failures.TREATMENT): 1
+            }, statistics.counts)
+            self.assertEqual(4, statistics.total())
+
+    def test_raising_plain_treatments(self):
+        for evaluator in [depth_first_evaluator, chain_evaluator, breadth_first_evaluator]:
+            root = EventTree()
+            for treatment in [raising_condition, raising_increment, do_nothing]:
+                root.add_branch(EventTree(treatment))
+            statistics = FailureStatistics()
+            previous = activate(statistics)
+            try:
+                results = evaluator(SimulationPayload(computational_unit=0,
+                                                      collected_data=CollectedData(),
+                                                      operation_history=[]),
+                                    root)
+            finally:
+                activate(previous)
+            self.assertEqual(1, len(results))
+            self.assertEqual({
+                ("raising_condition", -1, failures.PRECONDITIONS): 1,
+                ("raising_increment", -1, failures.TREATMENT): 1
+            }, statistics.counts)
+
+    def test_all_branches_failing(self):
+        tree = Sequence([
+            Event(collecting_increment),
+            Alternatives([
+                Event(infeasible_increment),
+                Event(do_nothing, preconditions=[Condition(lambda t, x: False)])
+            ])
+        ], 1).compose_nested()
+        payload = SimulationPayload(computational_unit=0, collected_data=CollectedData(), operation_history=[])
+        self.assertRaises(UserWarning, depth_first_evaluator, payload, tree)
+        self.assertEqual([], chain_evaluator(payload, tree))
+        self.assertEqual([], breadth_first_evaluator(payload, tree))
+
+    def test_exception(self):
+        self.assertIsInstance(infeasible("reason").exception(), UserWarning)
+        failure = BranchFailure(failures.PRECONDITIONS, do_nothing, 3, "condition")
+        self.assertIsInstance(failure.exception(), ConditionFailed)
+        self.assertEqual("do_nothing aborted at time point 3 - preconditions failed: condition", str(failure))
+
+    def test_records(self):
+        first = FailureStatistics()
+        second = FailureStatistics()
+        first.record(BranchFailure(failures.TREATMENT, do_nothing, 2))
+        second.record(BranchFailure(failures.TREATMENT, do_nothing, 2))
+        second.record(BranchFailure(failures.PRECONDITIONS, do_nothing, 1))
+        first.merge(second)
+        self.assertEqual([
+            {"treatment": "do_nothing", "time_point": 1, "phase": failures.PRECONDITIONS, "failures": 1},
+            {"treatment": "do_nothing", "time_point": 2, "phase": failures.TREATMENT, "failures": 2}
+        ], first.as_records())
+        self.assertEqual(["do_nothing treatment: 2 failed branches", "do_nothing preconditions: 1 failed branches"],
+                         first.summary())
+
+    def test_inactive(self):
+        self.assertIsNone(failures.active)
+        failure = failures.failed(failures.TREATMENT, do_nothing, 1, "reason")
+        self.assertEqual((failures.TREATMENT, do_nothing, 1, "reason"),
+                         (failure.phase, failure.treatment, failure.time_point, failure.reason))
@@ -6,7 +6,9 @@ from lukefi.metsi.sim.operations import simple_processable_chain
 from lukefi.metsi.sim.simulation_instruction import SimulationInstruction
 from lukefi.metsi.sim.generators import Alternatives, Sequence, Event
 from lukefi.metsi.sim.simulation_payload import SimulationPayload
-from lukefi.metsi.sim.runners import evaluate_sequence as run_sequence, evaluate_sequence
+from lukefi.metsi.sim.processor import FusedTreatment
+from lukefi.metsi.sim.runners import evaluate_sequence as run_sequence, evaluate_sequence, chain_evaluator, \
+    depth_first_evaluator, run_full_tree_strategy
 from lukefi.metsi.sim.sim_configuration import SimConfiguration
 from tests.test_utils import inc, collecting_increment, parametrized_operation
 
@@ -137,6 +139,66 @@ class TestGenerators(unittest.TestCase):
         self.assertEqual(3, len(chain_one[0]))
         self.assertEqual(3, len(chain_two[0]))
 
+    def test_event_trees_are_composed_once(self):
+        declaration = {
+            "simulation_instructions": [
+                SimulationInstruction(
+                    time_points=[0, 1],
+                    events=Sequence([
+                        Event(inc),
+                        Alternatives([Event(inc), Event(inc)])
+                    ])
+                )
+            ]
+        }
+        config = SimConfiguration(**declaration)
+        partial_trees = config.partial_event_trees_by_time_point()
+        self.assertIs(partial_trees, config.partial_event_trees_by_time_point())
+        self.assertEqual([0, 1], list(partial_trees.keys()))
+        self.assertEqual(2, len(partial_trees[0].operation_chains()))
+        full_tree = config.full_event_tree()
+        self.assertIs(full_tree, config.full_event_tree())
+        self.assertEqual(4, len(full_tree.operation_chains()))
+
+    def test_linear_event_runs_are_fused(self):
+        def multiply(input_, **operation_params):
+            state, collected_data = input_
+            return state * operation_params["factor"], collected_data
+
+        def declaration(fuse: bool) -> SimConfiguration:
+            return SimConfiguration(
+                fuse_linear_events=fuse,
+                simulation_instructions=[
+                    SimulationInstruction(
+                        time_points=[0, 1, 2],
+                        events=Sequence([
+                            Event(collecting_increment),
+                            Event(collecting_increment, parameters={"incrementation": 2}),
+                            Alternatives([
+                                Event(collecting_increment),
+                                Event(multiply, parameters={"factor": 3},
+                                      preconditions=[MinimumTimeInterval(2, multiply)])
+                            ])
+                        ])
+                    )
+                ])
+
+        fused_tree = declaration(True).full_event_tree()
+        self.assertIsInstance(fused_tree.branches[0].processed_treatment, FusedTreatment)
+        self.assertEqual(2, len(fused_tree.branches[0].branches))
+        for evaluator in [depth_first_evaluator, chain_evaluator]:
+            results = [
+                run_full_tree_strategy(
+                    SimulationPayload(computational_unit=0, collected_data=CollectedData(), operation_history=[]),
+                    declaration(fuse),
+                    evaluator)
+                for fuse in [True, False]
+            ]
+            self.assertEqual(*[[payload.computational_unit for payload in result] for result in results])
+            self.assertEqual(*[[payload.operation_history for payload in result] for result in results])
+            self.assertEqual(*[[payload.collected_data.operation_results for payload in result]
+                               for result in results])
+
     def test_nested_tree_generators(self):
         """Create a nested generators event tree. Use simple incrementation operation with starting value 0. Sequences
         and alternatives result in 4 branches with separately incremented values."""
@@ -0,0 +1,65 @@
+import unittest
+
+from lukefi.metsi.sim import instrumentation
+from lukefi.metsi.sim.collected_data import CollectedData
+from lukefi.metsi.sim.condition import Condition
+from lukefi.metsi.sim.generators import Alternatives, Event, Sequence
+from lukefi.metsi.sim.instrumentation import Instrumentation, activate
+from lukefi.metsi.sim.operations import do_nothing
+from lukefi.metsi.sim.runners import chain_evaluator, depth_first_evaluator
+from lukefi.metsi.sim.simulation_payload import SimulationPayload
+from tests.test_utils import collecting_increment
+
+
+class InstrumentationTest(unittest.TestCase):
+    def create_tree(self):
+        return Sequence([
+            Event(collecting_increment),
+            Alternatives([
+                Event(do_nothing, preconditions=[Condition(lambda t, x: False)]),
+                Event(collecting_increment, postconditions=[Condition(lambda t, x: x.computational_unit > 2)]),
+                Event(collecting_increment, parameters={"incrementation": 2})
+            ])
+        ], 1).compose_nested()
+
+    def test_statistics(self):
+        for evaluator in [depth_first_evaluator, chain_evaluator]:
+            hooks = Instrumentation(tracing=True)
+            previous = activate(hooks)
+            try:
+                results = evaluator(SimulationPayload(computational_unit=0,
+                                                      collected_data=CollectedData(),
+                                                      operation_history=[]),
+                                    self.create_tree())
+            finally:
+                activate(previous)
+            self.assertEqual(1, len(results))
+            statistics = hooks.statistics
+            treatment = statistics[("collecting_increment", 1, instrumentation.TREATMENT)]
+            self.assertEqual(3, treatment.calls)
+            self.assertEqual(0, treatment.failures)
+            preconditions = statistics[("do_nothing", 1, instrumentation.PRECONDITIONS)]
+            self.assertEqual((1, 1), (preconditions.calls, preconditions.failures))
+            postconditions = statistics[("collecting_increment", 1, instrumentation.POSTCONDITIONS)]
+            self.assertEqual((1, 1), (postconditions.calls, postconditions.failures))
+            self.assertNotIn(("do_nothing", 1, instrumentation.TREATMENT), statistics)
+            self.assertEqual(5, len(hooks.trace_events))
+            self.assertTrue(hooks.summary()[0].startswith("collecting_increment"))
+
+    def test_inactive(self):
+        self.assertIsNone(instrumentation.active)
+        hooks = Instrumentation()
+        previous = activate(hooks)
+        self.assertIs(hooks, activate(previous))
+        self.assertIsNone(instrumentation.active)
+
+    def test_merge(self):
+        first = Instrumentation()
+        second = Instrumentation()
+        first.record(instrumentation.TREATMENT, do_nothing, 1, 0, 10, False)
+        second.record(instrumentation.TREATMENT, do_nothing, 1, 0, 5, True)
+        second.record(instrumentation.TREATMENT, do_nothing, 2, 0, 5, False)
+        first.merge(second)
+        statistics = first.statistics[("do_nothing", 1, instrumentation.TREATMENT)]
+        self.assertEqual((2, 1, 15), (statistics.calls, statistics.failures, statistics.wall_time_ns))
+        self.assertEqual(["do_nothing treatment: 0.000 s, 3 calls, 1 failed"], first.summary())
@@ -0,0 +1,47 @@
+import unittest
+from copy import copy
+
+from lukefi.metsi.sim.collected_data import CollectedData
+from lukefi.metsi.sim.payload_store import PayloadStore, shared_components
+from lukefi.metsi.sim.simulation_payload import OperationHistory, SimulationPayload
+
+
+class Unit:
+    def __init__(self, values: list[int]):
+        self.values = values
+
+
+class PayloadStoreTest(unittest.TestCase):
+    def test_spilling(self):
+        initial = SimulationPayload(computational_unit=Unit([1, 2]), collected_data=CollectedData(),
+                                    operation_history=[])
+        store = PayloadStore(2, shared_components(initial))
+        for i in range(5):
+            store.append(SimulationPayload(computational_unit=(i, initial.computational_unit),
+                                           collected_data=CollectedData(), operation_history=[]))
+        self.assertTrue(store.spilled)
+        self.assertEqual(2, len(store.payloads))
+        self.assertEqual(5, len(store))
+        payloads = list(store)
+        self.assertEqual([0, 1, 2, 3, 4], [payload.computational_unit[0] for payload in payloads])
+        # the shared initial state is referred to instead of copied
+        self.assertTrue(all(payload.computational_unit[1] is initial.computational_unit for payload in payloads))
+        self.assertEqual(5, len(list(store)))
+        store.close()
+        self.assertEqual(0, len(store))
+
+    def test_without_budget(self):
+        store = PayloadStore()
+        store.extend(SimulationPayload(computational_unit=i) for i in range(3))
+        self.assertFalse(store.spilled)
+        self.assertEqual([0, 1, 2], [payload.computational_unit for payload in store])
+
+    def test_event_table_kept_in_memory(self):
+        history = OperationHistory([(0, print, {})])
+        store = PayloadStore(1)
+        for i in range(3):
+            store.append(SimulationPayload(computational_unit=i, collected_data=CollectedData(),
+                                           operation_history=copy(history)))
+        restored = [payload.operation_history for payload in store]
+        self.assertTrue(all(restored_history.table is history.table for restored_history in restored))
+        self.assertEqual([[(0, print, {})]] * 3, [list(restored_history) for restored_history in restored])
@@ -1,13 +1,75 @@
+import json
+import tempfile
 import unittest
 from pathlib import Path
+from unittest.mock import patch
+import numpy as np
+from lukefi.metsi.app.utils import MetsiException, SimulationAborted
+from lukefi.metsi.data.layered_model import LayeredObject
+from lukefi.metsi.data.model import ForestStand, ReferenceTree
 from lukefi.metsi.sim.collected_data import CollectedData
+from lukefi.metsi.sim.condition import Condition
 from lukefi.metsi.sim.simulation_payload import SimulationPayload
 from lukefi.metsi.sim.runners import evaluate_sequence, run_full_tree_strategy, run_partial_tree_strategy, \
-    chain_evaluator, depth_first_evaluator
+    chain_evaluator, depth_first_evaluator, default_runner, process_pool_runner, _run_chains_iteratively, \
+    run_beam_search_strategy, select_best_payloads, instrumented_runner, breadth_first_evaluator, stream_units, \
+    failure_counting_runner
+from lukefi.metsi.sim.generators import Alternatives, Event, Sequence
+from lukefi.metsi.sim.operations import do_nothing, with_batch_entrypoint
 from lukefi.metsi.sim.sim_configuration import SimConfiguration
-from tests.test_utils import raises, identity, none, collect_results, collecting_increment
+from lukefi.metsi.sim.simulation_instruction import SimulationInstruction
+from tests.test_utils import raises, identity, none, inc, collect_results, collecting_increment
 from lukefi.metsi.app.file_io import read_control_module
 
+def runner_keyed_by_unit(units, config, formation_strategy, evaluation_strategy, offset=0):
+    results = default_runner(units, config, formation_strategy, evaluation_strategy, offset)
+    return {f"unit_{unit}": schedules for unit, schedules in zip(units, results.values())}
+
+
+def layered_stand(year: int) -> LayeredObject[ForestStand]:
+    stand = ForestStand(identifier=str(year), year=year)
+    stand.reference_trees = [ReferenceTree(identifier=f"{year}-1", height=1.0)]
+    layered = LayeredObject[ForestStand](stand)
+    layered.reference_trees = [LayeredObject[ReferenceTree](tree) for tree in stand.reference_trees]
+    return layered
+
+
+def record_stand(input_, **operation_parameters):
+    stand, collected_data = input_
+    collected_data.store("record_stand", (stand.year, [tree.height for tree in stand.reference_trees]))
+    return stand, collected_data
+
+
+def overwrite_stand(input_, **operation_parameters):
+    stand, collected_data = input_
+    stand.year = 999
+    for tree in stand.reference_trees:
+        tree.height = 99.0
+    return stand, collected_data
+
+
+def layered_stand_results(payloads):
+    return [(payload.computational_unit.year, payload.collected_data.operation_results.get("record_stand"))
+            for payload in payloads]
+
+
+def in_place_branching_config(block_size=None):
+    return SimConfiguration(
+        block_size=block_size,
+        simulation_instructions=[
+            SimulationInstruction(
+                time_points=[0],
+                events=Sequence([
+                    Event(do_nothing),
+                    Alternatives([
+                        Event(record_stand),
+                        Event(overwrite_stand)
+                    ])
+                ])
+            )
+        ])
+
+
 class RunnersTest(unittest.TestCase):
     def test_sequence_success(self):
         payload = SimulationPayload(computational_unit=1)
@@ -28,6 +90,31 @@ class RunnersTest(unittest.TestCase):
         )
         self.assertRaises(Exception, prepared_function)
 
+    def test_chains_share_prefixes(self):
+        calls = []
+
+        def op(name):
+            def fn(x):
+                calls.append(name)
+                return x + [name]
+            return fn
+
+        a, b, c, d, e = op("a"), op("b"), op("c"), op("d"), op("e")
+        chains = [[a, b, c], [e], [a, b, d], [a], [a, b, c]]
+        results = _run_chains_iteratively([], chains)
+        self.assertEqual([["a", "b", "c"], ["e"], ["a", "b", "d"], ["a"], ["a", "b", "c"]], results)
+        self.assertEqual(["a", "b", "c", "d", "e"], sorted(calls))
+
+    def test_chains_failing_prefix(self):
+        def aborts(x):
+            raise UserWarning("aborted")
+
+        chains = [[identity, aborts, identity], [identity, aborts, inc], [identity, inc]]
+        payload = SimulationPayload(computational_unit=1)
+        results = _run_chains_iteratively(payload, chains)
+        self.assertEqual([2], collect_results(results))
+        self.assertEqual(1, payload.computational_unit)
+
     def test_event_tree_formation_strategies_by_comparison(self):
         control_path = str(Path("tests",
                                 "resources",
@@ -138,6 +225,28 @@ class RunnersTest(unittest.TestCase):
         )
         self.assertEqual(9, results[0])
 
+    def test_select_best_payloads(self):
+        payloads = [SimulationPayload(computational_unit=x) for x in [3, float("nan"), 5, 1, 5]]
+        result = select_best_payloads(payloads, lambda payload: payload.computational_unit, 3)
+        self.assertEqual([3, 5, 5], collect_results(result))
+
+    def test_beam_search_strategy(self):
+        control_path = str(Path("tests",
+                                "resources",
+                                "runners_test",
+                                "parameters_branching.py").resolve())
+        declaration = read_control_module(control_path)
+        config = SimConfiguration(**declaration)
+        config.beam_width = 2
+        config.beam_objective = lambda payload: -payload.computational_unit
+        initial = SimulationPayload(
+            computational_unit=1,
+            collected_data=CollectedData(),
+            operation_history=[]
+        )
+        results = collect_results(run_beam_search_strategy(initial, config, depth_first_evaluator))
+        self.assertEqual([1, 2], results)
+
     def test_parameters_branching(self):
         control_path = str(Path("tests",
                                 "resources",
@@ -166,3 +275,341 @@ class RunnersTest(unittest.TestCase):
         # inc#2, inc#2           = 5
         expected = [1, 2, 3, 2, 3, 4, 3, 4, 5]
         self.assertEqual(expected, results)
+
+    def test_process_pool_runner(self):
+        control_path = str(Path("tests",
+                                "resources",
+                                "runners_test",
+                                "branching.py").resolve())
+        declaration = read_control_module(control_path)
+        config = SimConfiguration(**declaration)
+        units = [5, 1, 3, 2]
+        expected = default_runner(units, config, run_partial_tree_strategy, depth_first_evaluator)
+        pooled_runner = process_pool_runner(default_runner, workers=2)
+        results = pooled_runner(units, config, run_partial_tree_strategy, depth_first_evaluator)
+        self.assertEqual(["0", "1", "2", "3"], list(results.keys()))
+        for key, schedules in expected.items():
+            self.assertEqual(collect_results(schedules), collect_results(results[key]))
+            self.assertEqual([s.operation_history for s in schedules], [s.operation_history for s in results[key]])
+
+    def test_runner_offset(self):
+        config = SimConfiguration(simulation_instructions=[
+            SimulationInstruction(time_points=[1], events=Sequence([Event(collecting_increment)]))
+        ])
+        units = [5, 1, 3]
+        for runner in [default_runner,
+                       failure_counting_runner(default_runner),
+                       instrumented_runner(failure_counting_runner(default_runner)),
+                       process_pool_runner(failure_counting_runner(default_runner), workers=2)]:
+            results = runner(units, config, run_full_tree_strategy, depth_first_evaluator, 10)
+            self.assertEqual(["10", "11", "12"], list(results.keys()))
+            self.assertEqual([[6], [2], [4]], [collect_results(schedules) for schedules in results.values()])
+
+    def test_process_pool_runner_requires_fork(self):
+        with patch("lukefi.metsi.sim.runners.multiprocessing.get_all_start_methods", return_value=["spawn"]):
+            with self.assertRaises(MetsiException):
+                process_pool_runner(default_runner, workers=2)
+
+    def test_instrumented_process_pool_runner(self):
+        control_path = str(Path("tests",
+                                "resources",
+                                "runners_test",
+                                "branching.py").resolve())
+        declaration = read_control_module(control_path)
+        config = SimConfiguration(**declaration)
+        units = [5, 1, 3]
+        expected = default_runner(units, config, run_partial_tree_strategy, depth_first_evaluator)
+        pooled_runner = process_pool_runner(instrumented_runner(default_runner), workers=2)
+        results = pooled_runner(units, config, run_partial_tree_strategy, depth_first_evaluator)
+        self.assertEqual(["0", "1", "2"], list(results.keys()))
+        for key, schedules in expected.items():
+            self.assertEqual(collect_results(schedules), collect_results(results[key]))
+
+    def test_instrumented_runner(self):
+        control_path = str(Path("tests",
+                                "resources",
+                                "runners_test",
+                                "branching.py").resolve())
+        declaration = read_control_module(control_path)
+        config = SimConfiguration(**declaration)
+        units = [5, 1]
+        expected = runner_keyed_by_unit(units, config, run_partial_tree_strategy, depth_first_evaluator)
+        with tempfile.TemporaryDirectory() as trace_directory:
+            runner = instrumented_runner(runner_keyed_by_unit, trace_directory)
+            results = runner(units, config, run_partial_tree_strategy, depth_first_evaluator)
+            with open(Path(trace_directory, "unit_5.trace.json"), encoding="utf-8") as file:
+                trace = json.load(file)
+        self.assertEqual(list(expected.keys()), list(results.keys()))
+        for key, schedules in expected.items():
+            self.assertEqual(collect_results(schedules), collect_results(results[key]))
+        self.assertTrue(len(trace["traceEvents"]) > 0)
+        self.assertTrue(all(event["ph"] == "X" for event in trace["traceEvents"]))
+
+    def test_failure_counting_runner(self):
+        control_path = str(Path("tests",
+                                "resources",
+                                "runners_test",
+                                "branching.py").resolve())
+        declaration = read_control_module(control_path)
+        config = SimConfiguration(**declaration)
+        units = [5, 1]
+        expected = runner_keyed_by_unit(units, config, run_partial_tree_strategy, depth_first_evaluator)
+        with tempfile.TemporaryDirectory() as target_directory:
+            runner = failure_counting_runner(runner_keyed_by_unit, target_directory)
+            results = runner(units, config, run_partial_tree_strategy, depth_first_evaluator)
+            with open(Path(target_directory, "unit_5.failures.json"), encoding="utf-8") as file:
+                records = json.load(file)
+        self.assertEqual(list(expected.keys()), list(results.keys()))
+        for key, schedules in expected.items():
+            self.assertEqual(collect_results(schedules), collect_results(results[key]))
+        self.assertTrue(len(records) > 0)
+        self.assertTrue(all(record["phase"] == "preconditions" for record in records))
+
+    def test_failure_summary_logged_once(self):
+        control_path = str(Path("tests",
+                                "resources",
+                                "runners_test",
+                                "branching.py").resolve())
+        declaration = read_control_module(control_path)
+        config = SimConfiguration(**declaration)
+        units = [5, 1, 3]
+        runners = [
+            failure_counting_runner(default_runner),
+            instrumented_runner(failure_counting_runner(default_runner)),
+            process_pool_runner(failure_counting_runner(default_runner), workers=2)
+        ]
+        summaries = []
+        for runner in runners:
+            with patch("lukefi.metsi.sim.runners.print_logline") as log:
+                runner(units, config, run_partial_tree_strategy, depth_first_evaluator)
+            summaries.append([call.args[0] for call in log.call_args_list if "failed branches" in call.args[0]])
+        self.assertEqual(1, len(summaries[0]))
+        self.assertEqual([summaries[0]] * 3, summaries)
+
+    def test_instrumentation_merged_in_parent(self):
+        control_path = str(Path("tests",
+                                "resources",
+                                "runners_test",
+                                "branching.py").resolve())
+        declaration = read_control_module(control_path)
+        config = SimConfiguration(**declaration)
+        units = [5, 1, 3]
+        summaries = []
+        for runner in [instrumented_runner(default_runner),
+                       process_pool_runner(instrumented_runner(default_runner), workers=2)]:
+            with patch("lukefi.metsi.sim.runners.print_logline") as log:
+                runner(units, config, run_partial_tree_strategy, depth_first_evaluator)
+            # wall times differ between the runs, the call and failure counts do not
+            summaries.append(sorted(call.args[0].split(":", 1)[0] + call.args[0].split(" s,", 1)[1]
+                                    for call in log.call_args_list if " calls, " in call.args[0]))
+        self.assertTrue(len(summaries[0]) > 0)
+        self.assertEqual(summaries[0], summaries[1])
+
+    def test_breadth_first_evaluator(self):
+        control_path = str(Path("tests",
+                                "resources",
+                                "runners_test",
+                                "branching.py").resolve())
+        declaration = read_control_module(control_path)
+        config = SimConfiguration(**declaration)
+        for strategy in [run_full_tree_strategy, run_partial_tree_strategy]:
+            expected = strategy(SimulationPayload(computational_unit=1, collected_data=CollectedData(),
+                                                  operation_history=[]), config, depth_first_evaluator)
+            results = strategy(SimulationPayload(computational_unit=1, collected_data=CollectedData(),
+                                                 operation_history=[]), config, breadth_first_evaluator)
+            self.assertEqual(8, len(results))
+            self.assertEqual(collect_results(expected), collect_results(results))
+            self.assertEqual([s.operation_history for s in expected], [s.operation_history for s in results])
+
+    def test_breadth_first_evaluator_batches_treatments(self):
+        batch_sizes = []
+
+        def add_batch(inputs, **operation_parameters):
+            batch_sizes.append(len(inputs))
+            if any(state < 0 for state, _ in inputs):
+                raise UserWarning("negative state")
+            return [(state + operation_parameters["amount"], collected_data) for state, collected_data in inputs]
+
+        @with_batch_entrypoint(add_batch)
+        def add(input_, **operation_parameters):
+            state, collected_data = input_
+            if state < 0:
+                raise UserWarning("negative state")
+            return state + operation_parameters["amount"], collected_data
+
+        config = SimConfiguration(simulation_instructions=[
+            SimulationInstruction(
+                time_points=[1],
+                events=Sequence([
+                    Alternatives([
+                        Event(add, parameters={"amount": 1}),
+                        Event(add, parameters={"amount": -10}),
+                        Event(add, parameters={"amount": 2}),
+                    ]),
+                    Event(add, parameters={"amount": 100})
+                ])
+            )
+        ])
+        expected = run_full_tree_strategy(SimulationPayload(computational_unit=0, collected_data=CollectedData(),
+                                                            operation_history=[]), config, depth_first_evaluator)
+        results = run_full_tree_strategy(SimulationPayload(computational_unit=0, collected_data=CollectedData(),
+                                                           operation_history=[]), config, breadth_first_evaluator)
+        self.assertEqual([101, 102], [payload.computational_unit for payload in expected])
+        self.assertEqual([101, 102], [payload.computational_unit for payload in results])
+        self.assertEqual([s.operation_history for s in expected], [s.operation_history for s in results])
+        # the second level is batched, and processed separately after the batch fails for the negative state
+        self.assertEqual([3], batch_sizes)
+
+    def test_breadth_first_evaluator_batches_array_parameters(self):
+        batch_sizes = []
+
+        def add_batch(inputs, **operation_parameters):
+            batch_sizes.append(len(inputs))
+            return [(state + int(operation_parameters["amounts"].sum()), collected_data)
+                    for state, collected_data in inputs]
+
+        @with_batch_entrypoint(add_batch)
+        def add(input_, **operation_parameters):
+            state, collected_data = input_
+            return state + int(operation_parameters["amounts"].sum()), collected_data
+
+        # events sharing their conditions are batched when their parameters are equal
+        conditions = {"preconditions": [], "postconditions": []}
+        config = SimConfiguration(simulation_instructions=[
+            SimulationInstruction(
+                time_points=[1],
+                events=Sequence([
+                    Alternatives([
+                        Event(add, parameters={"amounts": np.array([1, 2])}, **conditions),
+                        Event(add, parameters={"amounts": np.array([1, 3])}, **conditions),
+                        Event(add, parameters={"amounts": np.array([1, 2])}, **conditions),
+                    ]),
+                    Event(add, parameters={"amounts": np.array([50, 50])})
+                ])
+            )
+        ])
+        results = run_full_tree_strategy(SimulationPayload(computational_unit=0, collected_data=CollectedData(),
+                                                           operation_history=[]), config, breadth_first_evaluator)
+        self.assertEqual([103, 104, 103], [payload.computational_unit for payload in results])
+        # the alternatives with equal arrays are batched, the differing one is processed separately
+        self.assertEqual([2, 3], batch_sizes)
+
+    def test_breadth_first_evaluator_layered_states(self):
+        config = in_place_branching_config()
+        for strategy in [run_full_tree_strategy, run_partial_tree_strategy]:
+            expected = strategy(SimulationPayload(computational_unit=layered_stand(1), collected_data=CollectedData(),
+                                                  operation_history=[]), config, depth_first_evaluator)
+            results = strategy(SimulationPayload(computational_unit=layered_stand(1), collected_data=CollectedData(),
+                                                 operation_history=[]), config, breadth_first_evaluator)
+            self.assertEqual([(1, {0: (1, [1.0])}), (999, None)], layered_stand_results(expected))
+            self.assertEqual(layered_stand_results(expected), layered_stand_results(results))
+
+    def test_block_runner(self):
+        batch_sizes = []
+
+        def scale_batch(inputs, **operation_parameters):
+            batch_sizes.append(len(inputs))
+            return [(state * operation_parameters["factor"], collected_data) for state, collected_data in inputs]
+
+        @with_batch_entrypoint(scale_batch)
+        def scale(input_, **operation_parameters):
+            state, collected_data = input_
+            return state * operation_parameters["factor"], collected_data
+
+        def create_config(block_size):
+            return SimConfiguration(
+                block_size=block_size,
+                beam_width=2,
+                beam_objective=lambda payload: payload.computational_unit,
+                simulation_instructions=[
+                    SimulationInstruction(
+                        time_points=[1, 2],
+                        events=Sequence([
+                            Alternatives([
+                                Event(collecting_increment),
+                                Event(scale, parameters={"factor": 3})
+                            ]),
+                            Event(scale, parameters={"factor": 2})
+                        ])
+                    )
+                ])
+
+        units = [1, 2, 3, 4, 5]
+        for strategy in [run_full_tree_strategy, run_partial_tree_strategy, run_beam_search_strategy]:
+            expected = list(stream_units(units, create_config(None), strategy, depth_first_evaluator))
+            for evaluator in [depth_first_evaluator, breadth_first_evaluator]:
+                batch_sizes.clear()
+                results = list(stream_units(units, create_config(2), strategy, evaluator))
+                self.assertEqual([key for key, _ in expected], [key for key, _ in results])
+                for (_, expected_schedules), (_, schedules) in zip(expected, results):
+                    self.assertEqual(collect_results(expected_schedules), collect_results(schedules))
+                    self.assertEqual([s.operation_history for s in expected_schedules],
+                                     [s.operation_history for s in schedules])
+                if evaluator is breadth_first_evaluator:
+                    # the trailing event is batched over the alternatives of both units of a block
+                    self.assertIn(4, batch_sizes)
+
+    def test_block_runner_layered_states(self):
+        expected = list(stream_units([layered_stand(1), layered_stand(2)], in_place_branching_config(),
+                                     run_full_tree_strategy, depth_first_evaluator))
+        for evaluator in [depth_first_evaluator, breadth_first_evaluator]:
+            results = list(stream_units([layered_stand(1), layered_stand(2)], in_place_branching_config(2),
+                                        run_full_tree_strategy, evaluator))
+            self.assertEqual([layered_stand_results(schedules) for _, schedules in expected],
+                             [layered_stand_results(schedules) for _, schedules in results])
+
+    def test_spilled_payloads(self):
+        def create_config(**kwargs):
+            return SimConfiguration(
+                beam_objective=lambda payload: -payload.computational_unit,
+                **kwargs,
+                simulation_instructions=[
+                    SimulationInstruction(
+                        time_points=[1, 2, 3],
+                        events=Alternatives([
+                            Event(collecting_increment, parameters={"incrementation": incrementation})
+                            for incrementation in [1, 2, 3]
+                        ])
+                    )
+                ])
+
+        def schedules(payloads):
+            return sorted((payload.computational_unit, [(t, o.__name__, sorted(p.items()))
+                                                        for t, o, p in payload.operation_history])
+                          for payload in payloads)
+
+        for strategy, options in [(run_partial_tree_strategy, {}),
+                                  (run_partial_tree_strategy, {"merge_duplicate_states": True}),
+                                  (run_beam_search_strategy, {"beam_width": 5})]:
+            for evaluator in [depth_first_evaluator, breadth_first_evaluator]:
+                expected = strategy(SimulationPayload(computational_unit=0, collected_data=CollectedData(),
+                                                      operation_history=[]),
+                                    create_config(**options), evaluator)
+                spilled = strategy(SimulationPayload(computational_unit=0, collected_data=CollectedData(),
+                                                     operation_history=[]),
+                                   create_config(alternatives_budget=4, **options), evaluator)
+                self.assertEqual(schedules(expected), schedules(spilled))
+                self.assertEqual([payload.collected_data.prev('collecting_increment') for payload in expected],
+                                 [payload.collected_data.prev('collecting_increment') for payload in spilled])
+
+    def test_alternatives_limit(self):
+        config = SimConfiguration(
+            block_size=3,
+            alternatives_limit=3,
+            simulation_instructions=[
+                SimulationInstruction(
+                    time_points=[1, 2],
+                    events=Alternatives([
+                        Event(collecting_increment),
+                        Event(collecting_increment, parameters={"incrementation": 2},
+                              preconditions=[Condition(lambda _, payload: payload.computational_unit > 10)])
+                    ])
+                )
+            ])
+        results = list(stream_units([1, 20, 2], config, run_partial_tree_strategy, depth_first_evaluator))
+        self.assertEqual(["0", "2"], [key for key, _ in results])
+        self.assertEqual([[3], [4]], [collect_results(schedules) for _, schedules in results])
+        with self.assertRaises(SimulationAborted):
+            run_partial_tree_strategy(SimulationPayload(computational_unit=20, collected_data=CollectedData(),
+                                                        operation_history=[]),
+                                      config, depth_first_evaluator)
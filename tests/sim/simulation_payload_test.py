@@ -0,0 +1,58 @@
+import pickle
+import unittest
+from copy import copy, deepcopy
+
+from lukefi.metsi.sim.collected_data import CollectedData
+from lukefi.metsi.sim.operations import do_nothing
+from lukefi.metsi.sim.simulation_payload import EventTable, OperationHistory, SimulationPayload
+from tests.test_utils import collecting_increment
+
+
+class OperationHistoryTest(unittest.TestCase):
+    def test_event_table(self):
+        parameters = {"incrementation": 2}
+        table = EventTable()
+        first = table.event_id((1, collecting_increment, parameters))
+        self.assertEqual(first, table.event_id((1, collecting_increment, parameters)))
+        self.assertEqual(first, table.event_id((1, collecting_increment, {"incrementation": 2})))
+        self.assertNotEqual(first, table.event_id((2, collecting_increment, parameters)))
+        self.assertNotEqual(first, table.event_id((1, do_nothing, parameters)))
+        unhashable = {"limits": [1, 2]}
+        self.assertEqual(table.event_id((1, do_nothing, unhashable)), table.event_id((1, do_nothing, unhashable)))
+        self.assertEqual(4, len(table))
+        self.assertIs(parameters, table.entries[first][2])
+        typed = [table.event_id((3, do_nothing, {"x": value})) for value in [1, True, 1.0, (1,), (True,), 1]]
+        self.assertEqual(5, len(set(typed)))
+        self.assertEqual(typed[0], typed[-1])
+
+    def test_copies_share_entries(self):
+        history = OperationHistory([(0, do_nothing, {})])
+        branches = [copy(history) for _ in range(3)]
+        for i, branch in enumerate(branches):
+            branch.append((1, collecting_increment, {"incrementation": i % 2}))
+        self.assertTrue(all(branch.table is history.table for branch in branches))
+        self.assertEqual(3, len(history.table))
+        self.assertIs(branches[0][1], branches[2][1])
+        self.assertEqual([(0, do_nothing, {}), (1, collecting_increment, {"incrementation": 1})], branches[1])
+        self.assertEqual([0, 2], branches[1].event_ids())
+        self.assertIs(history.table, deepcopy(branches[0]).table)
+
+    def test_pickling(self):
+        history = OperationHistory([(0, do_nothing, {})])
+        payloads = []
+        for i in range(100):
+            branch = copy(history)
+            for time_point in range(1, 20):
+                branch.append((time_point, collecting_increment, {"incrementation": i % 2}))
+            payloads.append(SimulationPayload(computational_unit=i, collected_data=CollectedData(),
+                                              operation_history=branch))
+        data = pickle.dumps(payloads, protocol=5)
+        restored = pickle.loads(data)
+        for original, loaded in zip(payloads, restored):
+            self.assertEqual(list(original.operation_history), list(loaded.operation_history))
+            self.assertEqual(original.operation_history.last_runs(), loaded.operation_history.last_runs())
+        self.assertTrue(all(payload.operation_history.table is restored[0].operation_history.table
+                            for payload in restored))
+        compact = pickle.dumps([payload.operation_history for payload in payloads], protocol=5)
+        plain = pickle.dumps([[(t, o, p) for t, o, p in payload.operation_history] for payload in payloads], protocol=5)
+        self.assertLess(len(compact), len(plain) / 2)
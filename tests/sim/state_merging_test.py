@@ -0,0 +1,132 @@
+import unittest
+
+from lukefi.metsi.data.layered_model import LayeredObject
+from lukefi.metsi.data.model import ForestStand, ReferenceTree
+from lukefi.metsi.domain.conditions import MinimumTimeInterval
+from lukefi.metsi.sim.collected_data import CollectedData
+from lukefi.metsi.sim.generators import Alternatives, Event, Sequence
+from lukefi.metsi.sim.operations import do_nothing
+from lukefi.metsi.sim.runners import run_partial_tree_strategy, depth_first_evaluator, chain_evaluator
+from lukefi.metsi.sim.sim_configuration import SimConfiguration
+from lukefi.metsi.sim.simulation_instruction import SimulationInstruction
+from lukefi.metsi.sim.simulation_payload import SimulationPayload
+from lukefi.metsi.sim.state_merging import payload_fingerprint, merge_duplicate_payloads, expand_merged_payloads
+from tests.test_utils import collecting_increment
+
+
+def add(input_, **operation_params):
+    state, collected_data = input_
+    return state + operation_params.get("amount", 0), collected_data
+
+
+def schedules(payloads: list[SimulationPayload]) -> list:
+    return sorted(
+        (payload.computational_unit, [(t, o.__name__, sorted(p.items())) for t, o, p in payload.operation_history])
+        for payload in payloads)
+
+
+class StateMergingTest(unittest.TestCase):
+    def create_config(self, merge: bool) -> SimConfiguration:
+        return SimConfiguration(
+            merge_duplicate_states=merge,
+            simulation_instructions=[
+                SimulationInstruction(
+                    time_points=[1, 2, 3],
+                    events=Sequence([
+                        Alternatives([
+                            Event(do_nothing),
+                            Event(add, parameters={"amount": 0}),
+                            Event(add, parameters={"amount": 1}),
+                            Event(collecting_increment, preconditions=[MinimumTimeInterval(2, collecting_increment)])
+                        ])
+                    ])
+                )
+            ])
+
+    def create_payload(self) -> SimulationPayload:
+        return SimulationPayload(computational_unit=1, collected_data=CollectedData(), operation_history=[])
+
+    def test_merging_preserves_schedules(self):
+        for evaluator in [depth_first_evaluator, chain_evaluator]:
+            unmerged = run_partial_tree_strategy(self.create_payload(), self.create_config(False), evaluator)
+            merged = run_partial_tree_strategy(self.create_payload(), self.create_config(True), evaluator)
+            self.assertEqual(len(unmerged), len(merged))
+            self.assertEqual(schedules(unmerged), schedules(merged))
+
+    def test_fingerprint_history_sensitivity(self):
+        payload1 = SimulationPayload(computational_unit=1, collected_data=CollectedData(),
+                                     operation_history=[(1, do_nothing, {})])
+        payload2 = SimulationPayload(computational_unit=1, collected_data=CollectedData(),
+                                     operation_history=[(1, add, {"amount": 0})])
+        payload3 = SimulationPayload(computational_unit=1, collected_data=CollectedData(),
+                                     operation_history=[(1, add, {"amount": 1})])
+        self.assertNotEqual(payload_fingerprint(payload1), payload_fingerprint(payload2))
+        self.assertEqual(payload_fingerprint(payload2), payload_fingerprint(payload3))
+
+    def test_fingerprint_collected_data_tags(self):
+        payload1 = SimulationPayload(computational_unit=1, collected_data=CollectedData(), operation_history=[])
+        payload2 = SimulationPayload(computational_unit=1, collected_data=CollectedData(), operation_history=[])
+        payload1.collected_data.store("relevant", 1)
+        payload2.collected_data.store("relevant", 1)
+        payload2.collected_data.store("irrelevant", 2)
+        self.assertNotEqual(payload_fingerprint(payload1), payload_fingerprint(payload2))
+        self.assertEqual(payload_fingerprint(payload1, ["relevant"]), payload_fingerprint(payload2, ["relevant"]))
+
+    def test_fingerprint_layered_state(self):
+        stand = ForestStand(identifier="1")
+        stand.reference_trees = [ReferenceTree(identifier="1-1", height=1.0)]
+        layered1 = LayeredObject[ForestStand](stand)
+        layered1.reference_trees = [LayeredObject[ReferenceTree](tree) for tree in stand.reference_trees]
+        layered1.reference_trees[0].height = 2.0
+        layered2 = layered1.new_layer()
+        layered2.reference_trees = [tree.new_layer() for tree in layered1.reference_trees]
+        layered3 = layered1.new_layer()
+        layered3.reference_trees = [tree.new_layer() for tree in layered1.reference_trees]
+        layered3.reference_trees[0].height = 3.0
+
+        def fingerprint(unit):
+            return payload_fingerprint(SimulationPayload(computational_unit=unit,
+                                                         collected_data=CollectedData(),
+                                                         operation_history=[]))
+        self.assertEqual(fingerprint(layered1), fingerprint(layered2))
+        self.assertNotEqual(fingerprint(layered1), fingerprint(layered3))
+
+    def test_merge_and_expand(self):
+        payloads = [
+            SimulationPayload(computational_unit=1, collected_data=CollectedData(),
+                              operation_history=[(1, add, {"amount": 0})]),
+            SimulationPayload(computational_unit=2, collected_data=CollectedData(),
+                              operation_history=[(1, add, {"amount": 1})]),
+            SimulationPayload(computational_unit=1, collected_data=CollectedData(),
+                              operation_history=[(0, add, {}), (1, add, {"amount": 0})])
+        ]
+        merged = merge_duplicate_payloads(payloads)
+        self.assertEqual([1, 2], [payload.computational_unit for payload in merged])
+        merged[0].operation_history.append((2, do_nothing, {}))
+        expanded = expand_merged_payloads(merged)
+        self.assertEqual([1, 1, 2], [payload.computational_unit for payload in expanded])
+        self.assertEqual([(0, add, {}), (1, add, {"amount": 0}), (2, do_nothing, {})], expanded[1].operation_history)
+        self.assertEqual([(1, add, {"amount": 0}), (2, do_nothing, {})], expanded[0].operation_history)
+
+    def test_merge_and_expand_with_collected_data_tags(self):
+        payloads = []
+        for amount in [1, 2]:
+            payload = SimulationPayload(computational_unit=1, collected_data=CollectedData(initial_time_point=1),
+                                        operation_history=[(1, add, {"amount": amount})])
+            payload.collected_data.store("relevant", 1)
+            payload.collected_data.store("other", amount)
+            payload.collected_data.extend_list_result("list", [amount])
+            payloads.append(payload)
+        merged = merge_duplicate_payloads(payloads, ["relevant"])
+        self.assertEqual(1, len(merged))
+        merged[0].operation_history.append((2, do_nothing, {}))
+        merged[0].collected_data.current_time_point = 2
+        merged[0].collected_data.store("other", 3)
+        merged[0].collected_data.extend_list_result("list", [3])
+        expanded = expand_merged_payloads(merged)
+        self.assertEqual([(1, add, {"amount": 2}), (2, do_nothing, {})], expanded[1].operation_history)
+        self.assertEqual([{1: 1, 2: 3}, {1: 2, 2: 3}],
+                         [payload.collected_data.operation_results["other"] for payload in expanded])
+        self.assertEqual([[1, 3], [2, 3]],
+                         [list(payload.collected_data.operation_results["list"]) for payload in expanded])
+        self.assertEqual([2, 2], [payload.collected_data.current_time_point for payload in expanded])
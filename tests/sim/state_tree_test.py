@@ -3,7 +3,16 @@ from pathlib import Path
 import unittest
 
 from lukefi.metsi.app import file_io
-from lukefi.metsi.sim.state_tree import StateTree
+from lukefi.metsi.data.layered_model import LayeredObject
+from lukefi.metsi.data.model import ForestStand, ReferenceTree
+from lukefi.metsi.data.vector_model import ReferenceTrees, Strata
+from lukefi.metsi.sim.collected_data import CollectedData
+from lukefi.metsi.sim.generators import Alternatives, Event, Sequence
+from lukefi.metsi.sim.runners import recording_depth_first_evaluator, run_full_tree_strategy
+from lukefi.metsi.sim.sim_configuration import SimConfiguration
+from lukefi.metsi.sim.simulation_instruction import SimulationInstruction
+from lukefi.metsi.sim.simulation_payload import SimulationPayload
+from lukefi.metsi.sim.state_tree import StateTree, capture_state
 
 
 def dummy_operation(op_tuple: tuple[list[int], list[int]], **params) -> tuple[list[int], list[int]]:
@@ -14,6 +23,18 @@ def dummy_operation(op_tuple: tuple[list[int], list[int]], **params) -> tuple[li
     return state, collected_data
 
 
+def grow_first_tree(op_tuple, **params):
+    stand, collected_data = op_tuple
+    stand.reference_trees[0].height += params.get("amount", 1.0)
+    return stand, collected_data
+
+
+def grow_first_vector(op_tuple, **params):
+    stand, collected_data = op_tuple
+    stand.reference_trees_soa.update({"height": stand.reference_trees_soa.height[0] + params.get("amount", 1.0)}, 0)
+    return stand, collected_data
+
+
 class StateTreeTest(unittest.TestCase):
     def test_init(self):
         state_tree: StateTree[list[int]] = StateTree()
@@ -93,3 +114,89 @@ class StateTreeTest(unittest.TestCase):
         self.assertDictEqual(read_tree.branches[0].treatment_params, {"increment": 1, "mult": 1})
 
         os.remove(output_file)
+
+    def test_recording_evaluator(self):
+        stand = ForestStand(identifier="1")
+        stand.reference_trees = [ReferenceTree(identifier="1-1", height=1.0),
+                                 ReferenceTree(identifier="1-2", height=5.0)]
+        root = Sequence([
+            Event(grow_first_tree),
+            Alternatives([Event(grow_first_tree, parameters={"amount": 1.0}),
+                          Event(grow_first_tree, parameters={"amount": 2.0})])
+        ]).compose_nested()
+        state_trees = []
+        evaluator = recording_depth_first_evaluator(state_trees)
+        evaluator(SimulationPayload(computational_unit=stand, collected_data=CollectedData(), operation_history=[]),
+                  root)
+        self.assertEqual(1, len(state_trees))
+        grown = state_trees[0].branches[0]
+        self.assertEqual(2.0, grown.state.reference_trees[0].height)
+        self.assertEqual([3.0, 4.0], [branch.state.reference_trees[0].height for branch in grown.branches])
+        for branch in grown.branches:
+            self.assertIsInstance(branch.state, LayeredObject)
+            self.assertIs(grown.state.reference_trees[1], branch.state.reference_trees[1])
+            self.assertEqual(5.0, branch.state.reference_trees[1].height)
+
+    def test_recording_fused_events(self):
+        def outline(state_tree):
+            height = state_tree.state.reference_trees[0].height if state_tree.state is not None else None
+            return (state_tree.time_point, getattr(state_tree.done_treatment, "__name__", None),
+                    state_tree.treatment_params, height, [outline(branch) for branch in state_tree.branches])
+
+        def recorded(fuse):
+            stand = ForestStand(identifier="1")
+            stand.reference_trees = [ReferenceTree(identifier="1-1", height=1.0)]
+            config = SimConfiguration(
+                fuse_linear_events=fuse,
+                simulation_instructions=[
+                    SimulationInstruction(
+                        time_points=[0, 1],
+                        events=Sequence([
+                            Event(grow_first_tree),
+                            Event(grow_first_tree, parameters={"amount": 2.0}),
+                            Alternatives([Event(grow_first_tree, parameters={"amount": 1.0}),
+                                          Event(grow_first_tree, parameters={"amount": 3.0})])
+                        ])
+                    )
+                ])
+            state_trees = []
+            run_full_tree_strategy(SimulationPayload(computational_unit=stand, collected_data=CollectedData(),
+                                                     operation_history=[]),
+                                   config, recording_depth_first_evaluator(state_trees))
+            return outline(state_trees[0])
+
+        self.assertEqual(recorded(False), recorded(True))
+        # a state for each event of the linear run at the start of the first time point
+        first_event = recorded(True)[4][0]
+        self.assertEqual((0, "grow_first_tree", {}, 2.0), first_event[:4])
+        self.assertEqual((0, "grow_first_tree", {"amount": 2.0}, 4.0), first_event[4][0][:4])
+
+    def test_capture_shares_finalized_vectors(self):
+        stand = ForestStand(identifier="1")
+        stand.reference_trees_soa = ReferenceTrees().vectorize({"identifier": ["1-1", "1-2"], "height": [1.0, 5.0]})
+        stand.tree_strata_soa = Strata().vectorize({})
+        stand.finalize()
+        parent = capture_state(stand)
+        grow_first_vector((stand, None))
+        stand.finalize()
+        child = capture_state(stand, parent)
+        self.assertIs(parent.reference_trees_soa.species, child.reference_trees_soa.species)
+        self.assertIs(parent.tree_strata_soa, child.tree_strata_soa)
+        self.assertEqual([1.0, 5.0], list(parent.reference_trees_soa.height))
+        self.assertEqual([2.0, 5.0], list(child.reference_trees_soa.height))
+
+    def test_capture_changed_string_columns(self):
+        trees = ReferenceTrees().vectorize({"identifier": ["1-1", "1-2"], "height": [1.0, 5.0]}).finalize()
+        parent = capture_state(trees)
+        trees.create({"identifier": "1-3", "height": 2.0})
+        trees = trees.finalize()
+        child = capture_state(trees, parent)
+        self.assertIsInstance(child, ReferenceTrees)
+        self.assertEqual(["1-1", "1-2", "1-3"], child.identifier.tolist())
+        self.assertEqual(["1-1", "1-2"], parent.identifier.tolist())
+
+    def test_capture_plain_state(self):
+        state = [1, 2, 3]
+        captured = capture_state(state)
+        state.append(4)
+        self.assertEqual([1, 2, 3], captured)